@@ -4,7 +4,7 @@
     'description': '''
         Create, manage and delete meeting rooms, assign their ID and match it to its respective Ink Display ID.
     ''',
-    'version': '1.0.0',
+    'version': '1.0.1',
     'category': 'Productivity',
     'license': 'LGPL-3', 
     'author': 'PSE Abilium Team 2025',
@@ -17,8 +17,12 @@
     ],
     'images': ['static/description/icon.png'],
     'data': [
+        'security/room_booker_security.xml',
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
+        'data/res_users_data.xml',
         'views/connection_configuration_views.xml',
+        'views/room_finder_views.xml',
         'views/calendar_event_views.xml',
     ],
     
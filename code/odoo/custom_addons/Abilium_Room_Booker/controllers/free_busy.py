@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timezone
+
+from odoo import http
+from odoo.exceptions import AccessDenied, ValidationError
+from odoo.http import request
+
+
+class RoomBookerFreeBusy(http.Controller):
+    """
+    Free/busy endpoint for kiosks and integrations
+
+    Answers which rooms are free in a time window for all matching rooms with one
+    (cached) query instead of loading the calendar views.
+    """
+
+    @http.route('/room_booker/free_busy', type='json', auth='user', methods=['POST'])
+    def free_busy(self, start, stop, min_capacity=0, city=None, floor=None):
+        """
+        Get the free and busy intervals of all rooms matching the filters
+
+        Example request (JSON-RPC):
+            {"jsonrpc": "2.0", "method": "call", "params": {
+                "start": "2025-06-02T08:00:00Z", "stop": "2025-06-02T18:00:00Z",
+                "min_capacity": 6, "city": "Bern"}}
+
+        Args:
+            start (str): Start of the window, ISO 8601 (UTC if no offset is given)
+            stop (str): End of the window, ISO 8601 (UTC if no offset is given)
+            min_capacity (int): Only rooms with at least this capacity
+            city (str): Only rooms in this city
+            floor (str): Only rooms on this floor
+
+        Returns:
+            dict: 'start' and 'stop' of the window and 'rooms', each with 'id', 'name',
+            'partner_id', 'capacity', 'city', 'floor', 'busy' and 'free' intervals as
+            [start, stop] pairs in UTC ('YYYY-MM-DD HH:MM:SS')
+        """
+        if not request.env.user._is_internal():
+            raise AccessDenied()
+        start, stop = self._parse_datetime(start), self._parse_datetime(stop)
+        rooms = request.env['rasproom.connection'].get_free_busy(start, stop, min_capacity, city, floor)
+        return {
+            'start': start.replace(second=0, microsecond=0).strftime('%Y-%m-%d %H:%M:%S'),
+            'stop': stop.replace(second=0, microsecond=0).strftime('%Y-%m-%d %H:%M:%S'),
+            'rooms': rooms,
+        }
+
+    @staticmethod
+    def _parse_datetime(value):
+        """Parse an ISO 8601 string into a naive UTC datetime"""
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValidationError(f"Invalid date and time: {value!r}, expected ISO 8601.")
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    """
+    Events booked before meeting_room was kept in line with the attendees get
+    their first attending room, so the room displays and availability lookups,
+    which only look at meeting_room, find them as well.
+
+    Runs once when updating from a version before 1.0.1.
+    """
+    if not version:
+        return
+    cr.execute("""
+        UPDATE calendar_event event
+           SET meeting_room = rooms.partner_id
+          FROM (SELECT DISTINCT ON (rel.calendar_event_id)
+                       rel.calendar_event_id AS event_id, rel.res_partner_id AS partner_id
+                  FROM calendar_event_res_partner_rel rel
+                  JOIN res_partner partner ON partner.id = rel.res_partner_id AND partner.is_room
+              ORDER BY rel.calendar_event_id, rel.res_partner_id) rooms
+         WHERE rooms.event_id = event.id
+           AND event.meeting_room IS NULL
+    """)
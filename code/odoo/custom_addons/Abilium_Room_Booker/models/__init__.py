@@ -3,9 +3,10 @@
 # when someone imports this package
 
 # Import all submodules to make them available when the package is imported
-from . import connection_configuration, calendar_event, partner_extension, mqtt_connector
+from . import connection_configuration, calendar_event, partner_extension, mqtt_connector, room_finder
 
 # connection_configuration       # Module for handling connection settings and configuration
 # calendar_event                 # Module for calendar event management and operations
 # partner_extension              # Module for partner/third-party extensions and integrations
-# import mqtt_connector          # Module for MQTT (Message Queuing Telemetry Transport) connectivity
\ No newline at end of file
+# import mqtt_connector          # Module for MQTT (Message Queuing Telemetry Transport) connectivity
+# room_finder                    # Module for the room finder wizard over slot bitmaps
\ No newline at end of file
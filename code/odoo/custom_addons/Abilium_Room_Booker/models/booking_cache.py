@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import OrderedDict
+
+# Most values kept per database, the least recently used values are dropped first
+MAX_ENTRIES = 256
+# Seconds the booking version read from the database is trusted, so lookups within that
+# time (e.g. every keystroke of a form) need no query; changes of other processes may be
+# seen that much later
+VERSION_TTL = 2.0
+
+
+class BookingCache:
+    """
+    Process-wide cache of values derived from the bookings, e.g. the room interval index
+
+    Every value is stored with the booking version it was computed at (see calendar.event
+    _room_version()). Changing a booking increments the version after commit, which turns
+    all values of the database stale at once in every process, while the other caches of
+    the registry stay untouched.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, version_ttl=VERSION_TTL):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries (int): Most values kept per database
+            version_ttl (float): Seconds a version read by current_version() is reused
+        """
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self._databases = {}    # db name -> (version, OrderedDict of key -> value)
+        self._versions = {}     # db name -> (version, monotonic time it was read)
+        self._lock = threading.Lock()
+
+    def current_version(self, db_name, read_version):
+        """
+        Get the booking version, reading it at most once per `version_ttl` seconds
+
+        Args:
+            db_name (str): Database of the bookings
+            read_version (callable): Reads the version from the database
+
+        Returns:
+            int: The booking version, at most `version_ttl` seconds old
+        """
+        now = time.monotonic()
+        with self._lock:
+            version, read_at = self._versions.get(db_name, (None, None))
+        if version is not None and now - read_at < self.version_ttl:
+            return version
+        version = read_version()
+        with self._lock:
+            self._versions[db_name] = (version, now)
+        return version
+
+    def expire_version(self, db_name):
+        """
+        Read the version again on the next lookup, e.g. after this process changed a booking
+
+        Args:
+            db_name (str): Database of the bookings
+        """
+        with self._lock:
+            self._versions.pop(db_name, None)
+
+    def get(self, db_name, version, key):
+        """
+        Look up a value computed at the given version
+
+        Args:
+            db_name (str): Database the value belongs to
+            version (int): Current booking version
+            key (hashable): Identifies the value, e.g. ('free_busy', start, stop, ...)
+
+        Returns:
+            object: The cached value, or None if it is missing or stale
+        """
+        with self._lock:
+            cached_version, values = self._databases.get(db_name, (None, None))
+            if cached_version != version or key not in values:
+                return None
+            values.move_to_end(key)
+            return values[key]
+
+    def put(self, db_name, version, key, value):
+        """
+        Store a value computed at the given version
+
+        Values of an older version are dropped; a value computed at an older version
+        than the cached ones (a slow computation overtaken by a change) is not stored.
+
+        Args:
+            db_name (str): Database the value belongs to
+            version (int): Booking version the value was computed at
+            key (hashable): Identifies the value
+            value (object): The value, shared by all callers and never modified
+        """
+        with self._lock:
+            cached_version, values = self._databases.get(db_name, (None, None))
+            if cached_version is not None and version < cached_version:
+                return
+            if cached_version != version:
+                values = OrderedDict()
+                self._databases[db_name] = (version, values)
+            values[key] = value
+            values.move_to_end(key)
+            while len(values) > self.max_entries:
+                values.popitem(last=False)
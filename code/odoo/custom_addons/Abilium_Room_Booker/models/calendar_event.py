@@ -1,5 +1,32 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+from odoo.exceptions import ValidationError
+from datetime import timedelta
+from functools import partial
 import json
+from .booking_cache import BookingCache
+from .room_intervals import RoomIntervalIndex
+
+# Maximum number of double bookings listed in the error message of one batch
+MAX_REPORTED_CONFLICTS = 10
+
+# Days of past bookings kept in the in-memory room interval index, availability queries
+# starting before that fall back to the database
+ROOM_INDEX_PAST_DAYS = 30
+
+# Database sequence counting the booking changes, the version of the cached booking data
+ROOM_VERSION_SEQUENCE = 'calendar_event_room_version_seq'
+
+# Values derived from the bookings, shared by all registries of the process
+_booking_cache = BookingCache()
+
+
+def _bump_room_version(registry):
+    """Increments the booking version after commit, with a cursor of its own"""
+    with registry.cursor() as cr:
+        cr.execute(f"SELECT nextval('{ROOM_VERSION_SEQUENCE}')")
+    # This process sees its own changes right away, other processes within VERSION_TTL
+    _booking_cache.expire_version(registry.db_name)
+
 
 class CalendarEvent(models.Model):
     """
@@ -18,6 +45,7 @@ class CalendarEvent(models.Model):
     meeting_room = fields.Many2one(
         "res.partner", compute="_compute_room",
         store=True,
+        readonly=False,
         string='Room',
         help="Select a room (a partner marked as is_room)."
     )
@@ -41,6 +69,166 @@ class CalendarEvent(models.Model):
         store=False
     )
 
+    def init(self):
+        """
+        Creates the index behind the upcoming events lookups of a room (publisher,
+        availability checks), which filter on meeting_room and the event time range.
+        Only events with a room are indexed, so the index stays small.
+
+        Events booked before meeting_room was kept in line with the attendees are
+        given their room once by the 1.0.1 migration, not on every module update.
+
+        Also creates the sequence versioning the cached booking data, see _room_version().
+        """
+        super().init()
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {ROOM_VERSION_SEQUENCE}")
+        tools.create_index(
+            self.env.cr, 'calendar_event_meeting_room_stop_start_index', self._table,
+            ['meeting_room', 'stop', 'start'], where='meeting_room IS NOT NULL',
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """
+        Pushes the room data of the booked rooms to their displays after commit.
+        """
+        events = super().create(vals_list)
+        events._get_room_connections()._mark_rooms_dirty()
+        if events.meeting_room:
+            events._invalidate_room_interval_index()
+        return events
+
+    def write(self, vals):
+        """
+        Pushes the room data of the rooms booked before and after the update
+        to their displays after commit.
+        """
+        # Only fields that are shown on the room displays matter
+        display_fields = {
+            'name', 'start', 'stop', 'duration', 'allday', 'user_id',
+            'partner_ids', 'meeting_room', 'active',
+        }
+        if not display_fields.intersection(vals):
+            return super().write(vals)
+
+        connections = self._get_room_connections()
+        had_rooms = bool(self.meeting_room)
+        result = super().write(vals)
+        (connections | self._get_room_connections())._mark_rooms_dirty()
+        if had_rooms or self.meeting_room:
+            self._invalidate_room_interval_index()
+        return result
+
+    def unlink(self):
+        """
+        Pushes the room data of the freed rooms to their displays after commit.
+        """
+        connections = self._get_room_connections()
+        had_rooms = bool(self.meeting_room)
+        result = super().unlink()
+        connections._mark_rooms_dirty()
+        if had_rooms:
+            self._invalidate_room_interval_index()
+        return result
+
+    @api.model
+    def _room_interval_index(self):
+        """
+        Returns the bookings of all rooms as an in-memory interval index, built with
+        one query and cached in the process until a booking changes, see _room_cached().
+        """
+        return self._room_cached(('room_interval_index',), lambda env: env['calendar.event']._build_room_interval_index())
+
+    @api.model
+    def _build_room_interval_index(self):
+        """
+        Builds the interval index of the bookings ending at most ROOM_INDEX_PAST_DAYS ago.
+        """
+        since = fields.Datetime.now() - timedelta(days=ROOM_INDEX_PAST_DAYS)
+        self.env.cr.execute("""
+            SELECT meeting_room, start, stop, id
+              FROM calendar_event
+             WHERE active
+               AND meeting_room IS NOT NULL
+               AND stop > %s
+        """, [since])
+        return RoomIntervalIndex(since, self.env.cr.fetchall())
+
+    @api.model
+    def _room_version(self):
+        """
+        Returns the current version of the bookings. The sequence is read outside of
+        the transaction snapshot, so every process sees a change as soon as it is
+        counted, see _invalidate_room_interval_index().
+        """
+        self.env.cr.execute(f"SELECT last_value FROM {ROOM_VERSION_SEQUENCE}")
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _room_cached(self, key, compute):
+        """
+        Returns a value derived from the bookings, computed once per booking version.
+
+        The version is read at most every VERSION_TTL seconds (see booking_cache), so
+        repeated lookups such as the onchange of every keystroke need no query; a
+        booking saved by another process is seen up to that many seconds late.
+        Missing values are computed with a cursor of their own, so they never contain
+        uncommitted changes of the current transaction. Its snapshot starts after the
+        version was read, so a cached value is never older than its version.
+
+        Args:
+            key (tuple): Identifies the value, e.g. ('free_busy', start, stop, ...)
+            compute (callable): Computes the value from an environment
+
+        Returns:
+            object: The value, shared by all callers and never modified
+        """
+        db_name = self.env.cr.dbname
+        version = _booking_cache.current_version(db_name, self._room_version)
+        value = _booking_cache.get(db_name, version, key)
+        if value is None:
+            with self.env.registry.cursor() as cr:
+                value = compute(self.env(cr=cr))
+            _booking_cache.put(db_name, version, key, value)
+        return value
+
+    def _invalidate_room_interval_index(self):
+        """
+        Counts a booking change once the transaction is committed, which turns the
+        cached interval index and free/busy answers of rasproom.connection stale in
+        all processes (see _room_cached()). Other caches of the registry are kept.
+        A rolled back transaction changed nothing, so its values stay valid.
+        """
+        data = self.env.cr.postcommit.data
+        if not data.get('calendar.event.room_version'):
+            data['calendar.event.room_version'] = True
+            self.env.cr.postcommit.add(partial(_bump_room_version, self.env.registry))
+
+    def _get_room_connections(self):
+        """
+        Returns the rasproom.connection records of the meeting rooms of these events.
+
+        Only meeting_room counts, like on the displays: a room attending without
+        being the meeting room shows nothing there (the form keeps one room per
+        event, see _onchange_meeting_room()).
+        """
+        rooms = self.meeting_room
+        if not rooms:
+            return self.env['rasproom.connection']
+        # Connections are restricted to administrators, but every user may book rooms
+        return self.env['rasproom.connection'].sudo().search([('partner_id', 'in', rooms.ids)])
+
+    @api.depends('partner_ids', 'partner_ids.is_room')
+    def _compute_room(self):
+        """
+        Keeps meeting_room in line with the attendees: the selected room stays as
+        long as it attends, otherwise the first attending room becomes the meeting room.
+        """
+        for event in self:
+            rooms = event.partner_ids.filtered('is_room')
+            if event.meeting_room not in rooms:
+                event.meeting_room = rooms[:1]
+
     @api.depends('filter_room_by_capacity', 'partner_ids', 'booked_room_ids')
     def _compute_meeting_room_domain(self):
         """
@@ -140,20 +328,49 @@ class CalendarEvent(models.Model):
     @api.constrains('meeting_room', 'start', 'stop')
     def _check_meeting_room_availability(self):
         """
-        raises error if the meeting_room of this event is
-        already booked during a timeframe
+        raises error if the meeting_room of any of these events is
+        already booked during its timeframe
+
+        The whole batch (e.g. all occurrences of a recurrence or an import) is
+        checked with one query joining the events against all other active events
+        of the same room with an overlapping interval, and all conflicts are
+        reported together. Events the user cannot see still block the room.
         """
-        for event in self:
-            if not event.meeting_room:
-                continue
-            overlapping = self.search([
-                ('id', '!=', event.id),
-                ('meeting_room', '=', event.meeting_room.id),
-                ('start', '<', event.stop),
-                ('stop', '>', event.start),
-            ])
-            if overlapping:
-                raise ValidationError(f"Room {event.meeting_room.name} is already booked.")
+        if not self.ids:
+            return
+        self.flush_model(['meeting_room', 'start', 'stop', 'active'])
+        self.env.cr.execute("""
+            SELECT DISTINCT LEAST(event.id, other.id), GREATEST(event.id, other.id)
+              FROM calendar_event event
+              JOIN calendar_event other
+                ON other.meeting_room = event.meeting_room
+               AND other.id != event.id
+               AND other.active
+               AND other.start < event.stop
+               AND other.stop > event.start
+             WHERE event.id = ANY(%s)
+               AND event.meeting_room IS NOT NULL
+          ORDER BY 1, 2
+        """, [list(self.ids)])
+        conflicts = self.env.cr.fetchall()
+        if not conflicts:
+            return
+
+        # Other events may be private, only the times of those are shown
+        events = {event.id: event for event in self.sudo().browse({event_id for pair in conflicts for event_id in pair})}
+        own = set(self.ids)
+
+        def describe(event):
+            name = f'"{event.name}"' if event.id in own else "another booking"
+            return f"{name} ({event.start} - {event.stop})"
+
+        lines = []
+        for first_id, second_id in conflicts[:MAX_REPORTED_CONFLICTS]:
+            first, second = events[first_id], events[second_id]
+            lines.append(f"- {first.meeting_room.name}: {describe(first)} overlaps {describe(second)}")
+        if len(conflicts) > MAX_REPORTED_CONFLICTS:
+            lines.append(f"... and {len(conflicts) - MAX_REPORTED_CONFLICTS} more")
+        raise ValidationError("Room is already booked:\n" + "\n".join(lines))
 
 
     @api.onchange('meeting_room', 'start', 'stop')
@@ -164,8 +381,13 @@ class CalendarEvent(models.Model):
         saves it in booked_room_ids.
         """
         if self.start and self.stop:
+            index = self._room_interval_index()
+            if index.covers(self.start):
+                # Answered from memory, no query per change in the form
+                self.booked_room_ids = index.busy_rooms(self.start, self.stop, self._origin.id)
+                return
             overlapping_events = self.env['calendar.event'].search([
-                ('id', '!=', self.id),
+                ('id', '!=', self._origin.id),
                 ('meeting_room', '!=', False),
                 ('start', '<', self.stop),
                 ('stop', '>', self.start),
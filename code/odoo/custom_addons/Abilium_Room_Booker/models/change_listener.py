@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import selectors
+import socket
+import threading
+import odoo.sql_db
+
+# Get logger instance for this module
+_logger = logging.getLogger(__name__)
+
+# Seconds the listener waits for notifications before checking whether it must stop
+POLL_TIMEOUT = 5.0
+# Seconds before the listener connects again after losing its database connection
+RETRY_DELAY = 10.0
+
+
+def process_id():
+    """
+    Identify the current process among all Odoo processes using the database
+
+    Computed on every call, because the workers of a prefork server are forked from
+    one parent process.
+
+    Returns:
+        str: Host name and process id, e.g. 'odoo-1:4711'
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ChangeListener:
+    """
+    Background thread receiving the room changes of other Odoo processes
+
+    Bookings are saved by whichever worker serves the request, but the room data is only
+    published by the process holding the MQTT clients. Transactions changing rooms send a
+    Postgres NOTIFY on commit (see rasproom.connection _mark_rooms_dirty()), the listener
+    LISTENs on the channel with a connection of its own and hands the changed rooms to
+    its callback. Notifications sent while the listener was not connected are lost, so
+    the callback is called with None (all rooms) whenever the listener (re)connects.
+    """
+
+    def __init__(self, db_name, channel, callback):
+        """
+        Initialize the listener (the thread is started by start())
+
+        Args:
+            db_name (str): Database whose notifications are received
+            channel (str): Notification channel, a plain identifier
+            callback (callable): Called with (connection ids or None, origin, sync) per notification
+        """
+        self.db_name = db_name
+        self.channel = channel
+        self.callback = callback
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the listener thread"""
+        self._thread = threading.Thread(target=self._run, name=f'mqtt_change_listener_{self.db_name}')
+        self._thread.daemon = True  # Exit together with the Odoo process
+        self._thread.start()
+
+    def stop(self, timeout=POLL_TIMEOUT + 1):
+        """
+        Stop the listener thread
+
+        Args:
+            timeout (float): Seconds to wait for the thread to exit
+
+        Returns:
+            bool: True if the thread exited within the timeout
+        """
+        self._stop_event.set()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def _run(self):
+        """Main loop of the listener thread: LISTEN, wait for notifications and reconnect on errors"""
+        while not self._stop_event.is_set():
+            try:
+                with odoo.sql_db.db_connect(self.db_name).cursor() as cr, \
+                        selectors.DefaultSelector() as selector:
+                    cr.execute(f'LISTEN "{self.channel}"')
+                    cr.commit()
+                    connection = cr._cnx
+                    selector.register(connection, selectors.EVENT_READ)
+                    # Catch up on the changes missed while not listening
+                    self.callback(None, None)
+                    while not self._stop_event.is_set():
+                        if selector.select(POLL_TIMEOUT):
+                            connection.poll()
+                            while connection.notifies:
+                                self._dispatch(connection.notifies.pop(0).payload)
+            except Exception as e:
+                _logger.warning("Room change listener of %s lost its connection: %s", self.db_name, e)
+                self._stop_event.wait(RETRY_DELAY)
+
+    def _dispatch(self, payload):
+        """Hand one notification to the callback, skipping the ones sent by this process"""
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            _logger.debug("Invalid room change notification: %s", payload)
+            return
+        # The sending process has published the change itself after its commit
+        if change.get('sender') == process_id():
+            return
+        try:
+            self.callback(change.get('ids'), change.get('origin'), bool(change.get('sync')))
+        except Exception as e:
+            _logger.error("Failed to handle room change notification: %s", e)
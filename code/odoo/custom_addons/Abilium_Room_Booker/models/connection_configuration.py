@@ -1,21 +1,92 @@
 # -*- coding: utf-8 -*-
 # Python standard library imports
 import traceback                         # For detailed error stack traces
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 import logging                           # Logging setup
-import threading                         # For creating background threads
 import time                              # For time-related operations and delays
 import ssl                               # For secure socket layer connections
 from contextlib import contextmanager    # For creating context managers
 import json                              # For JSON data serialization/deserialization
+from datetime import datetime, timedelta, timezone  # For the display event horizon and liveness times
+from functools import partial            # For binding post-commit callbacks
 # ValidationError import is needed for constraints
 from odoo.exceptions import ValidationError     # type: ignore For custom validation errors
 from odoo.exceptions import AccessError         # type: ignore For access control errors
 from . import mqtt_connector                    # Local MQTT connection manager module
+from . import metrics                           # Counters and histograms of the metrics endpoint
+from .log_throttle import LogThrottle           # Rate limited logging of the publisher
+from .change_listener import process_id         # Sender of the room change notifications
+from .room_payload import (                      # Room data payload helpers
+    COMPACT_CAPABILITY, DELTA_CAPABILITY, diff_payloads, encode_compact, payload_digest,
+)
 
 # Logger instance for this module
 _logger = logging.getLogger(__name__)
 
+# The publisher logs one summary per minute instead of lines per room and cycle. Per room
+# details and the diagnostic queries only run with DEBUG enabled for this logger, e.g.
+# --log-handler=odoo.addons.Abilium_Room_Booker.models.connection_configuration:DEBUG
+PUBLISH_LOG_INTERVAL = 60
+_publish_log = LogThrottle(_logger, PUBLISH_LOG_INTERVAL)
+
+# Seconds between two periodic reconciliation publishes of a room's data. Booking
+# changes are pushed immediately, also when they are saved by another Odoo process,
+# see _mark_rooms_dirty()
+PUBLISH_INTERVAL = 300
+
+# Longest room change notification in bytes (Postgres allows just under 8000)
+MAX_NOTIFY_PAYLOAD = 7000
+
+# Number of delta updates after which a full (retained) snapshot is published again
+SNAPSHOT_INTERVAL = 20
+
+# System parameter selecting the MQTT engine of new clients: 'thread' (default, one
+# network thread per broker) or 'asyncio' (one event loop thread for all brokers)
+MQTT_ENGINE_PARAM = 'abilium_room_booker.mqtt_engine'
+
+# System parameters of the Prometheus metrics server of the MQTT host process: the TCP port
+# and the bearer token of the scraper, the server is disabled while either is not set
+METRICS_PORT_PARAM = 'abilium_room_booker.metrics_port'
+METRICS_TOKEN_PARAM = 'abilium_room_booker.metrics_token'
+
+# Seconds connection state changes are buffered before they are written in one batch
+STATE_FLUSH_DELAY = 3
+
+# Seconds inbound messages of the displays are collected before they are processed in one batch
+INBOUND_BATCH_INTERVAL = 1
+
+# Subtopics Odoo publishes to the displays, the broker echoes them back to our subscription
+DISPLAY_TOPICS = frozenset(('data', 'delta', 'heartbeat', 'events', 'test', 'clear'))
+
+# Handler method per subtopic published by the displays (None: nothing to process)
+INBOUND_HANDLERS = {
+    'status': '_handle_status_messages',
+    'snapshot': '_handle_snapshot_messages',
+    'capabilities': '_handle_capabilities_messages',
+    'ping': '_handle_ping_messages',
+    'ack': '_handle_ack_messages',
+}
+
+# Above this number of rooms changing state in one flush (e.g. a broker restart) the
+# changes are written without chatter tracking and summarized in the log instead
+STATE_TRACKING_LIMIT = 10
+
+# Longest time window of a free/busy query in days
+MAX_FREE_BUSY_DAYS = 31
+
+# Shown on the displays instead of the title of private and confidential meetings
+PRIVATE_EVENT_NAME = 'Busy'
+
+# Upper bound of events per display (a full day of 15 minute slots) and events per page,
+# matching the 2x2 grid of the display's events screen
+MAX_DISPLAY_EVENTS = 96
+EVENTS_PAGE_SIZE = 4
+MAX_EVENT_PAGES = -(-MAX_DISPLAY_EVENTS // EVENTS_PAGE_SIZE)
+
+# Subtopics of a room holding retained messages besides the event pages: room data
+# (published by Odoo), capabilities and status (published by the display)
+RETAINED_TOPICS = ('data', 'capabilities', 'status')
+
 # Optional MQTT library import with fallback handling
 try:
     import paho.mqtt.client as mqtt # MQTT client library
@@ -25,6 +96,11 @@ except ImportError:
     _logger.warning("paho-mqtt library not installed. MQTT functionality disabled")
 
 
+def _epoch_to_datetime(timestamp):
+    """Converts epoch seconds to a naive UTC datetime as stored by Odoo."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+
 class RoomRaspConnection(models.Model):
     """
         Model for managing Raspberry Pi connections to meeting rooms.
@@ -124,6 +200,39 @@ class RoomRaspConnection(models.Model):
         ('2', 'Exactly once (2)')   # Assured delivery
     ], string='QoS Level', default='0')
     mqtt_keep_alive = fields.Integer(string='Keep Alive', default=60)
+    mqtt_heartbeat = fields.Boolean(
+        string='Send Heartbeat', default=True,
+        help="Publish a small heartbeat instead of the room data when the room data did not change. "
+             "Without heartbeat the unchanged room data is published again in full, so the display "
+             "knows that Odoo is alive"
+    )
+    mqtt_payload_format = fields.Selection([
+        ('json', 'JSON'),
+        ('compact', 'Compact Binary'),
+    ], string='Payload Format', default='json',
+        help="Compact binary payloads are only sent once the display announced that it can decode them, "
+             "otherwise JSON is used")
+
+    # === DISPLAY CONFIGURATION FIELDS ===
+    # Which events are sent to the display
+    display_event_limit = fields.Integer(
+        string='Events on Display', default=5,
+        help="Maximum number of upcoming events sent to the display. Events beyond the first page "
+             "are sent as additional pages the display rotates through."
+    )
+    display_horizon_hours = fields.Integer(
+        string='Event Horizon (Hours)', default=0,
+        help="Only send events starting within this many hours. 0 means no time limit."
+    )
+
+    @api.constrains('display_event_limit', 'display_horizon_hours')
+    def _check_display_events(self):
+        """Ensure that the display event limit and horizon are within bounds."""
+        for record in self:
+            if not 1 <= record.display_event_limit <= MAX_DISPLAY_EVENTS:
+                raise ValidationError(f"The number of events on the display must be between 1 and {MAX_DISPLAY_EVENTS}.")
+            if record.display_horizon_hours < 0:
+                raise ValidationError("The event horizon cannot be negative.")
 
     # === MQTT CONNECTION STATUS FIELDS ===
     # Read-only fields that track connection state
@@ -137,6 +246,35 @@ class RoomRaspConnection(models.Model):
     mqtt_error_message = fields.Char(string='Last Error', readonly=True)
     connection_state_display = fields.Char(string='Connection State Display', compute='_compute_connection_state_display')
 
+    # === DISPLAY LIVENESS FIELDS ===
+    # The display reports itself on /status (online/offline) and /ping (send timestamp). Only
+    # transitions of the online flag are stored, the live values come from the MQTT manager
+    display_state = fields.Selection([
+        ('online', 'Online'),
+        ('offline', 'Offline'),
+    ], string='Display State', readonly=True)
+    display_state_changed = fields.Datetime(string='Display State Since', readonly=True)
+    display_online = fields.Boolean(string='Display Online', compute='_compute_display_liveness')
+    display_last_seen = fields.Datetime(string='Display Last Seen', compute='_compute_display_liveness')
+    display_latency_ms = fields.Float(
+        string='Display Ping Delay (ms)', compute='_compute_display_liveness', digits=(16, 1),
+        help="Smoothed delay of the display's pings to Odoo, includes the clock offset of the display")
+
+    # === DISPLAY LATENCY FIELDS ===
+    # Booking saved until the display acknowledged showing it, over the recent acks kept in the
+    # memory of the MQTT host process. Stored by the host's connection monitor, so every worker
+    # rendering the views shows them (see _store_display_latency())
+    display_latency_samples = fields.Integer(string='Latency Samples', readonly=True)
+    display_latency_p50 = fields.Float(string='Booking to Display p50 (ms)', readonly=True, digits=(16, 0))
+    display_latency_p95 = fields.Float(string='Booking to Display p95 (ms)', readonly=True, digits=(16, 0))
+    display_latency_p99 = fields.Float(string='Booking to Display p99 (ms)', readonly=True, digits=(16, 0))
+    display_publish_p95 = fields.Float(
+        string='Publish to Display p95 (ms)', readonly=True, digits=(16, 0),
+        help="Also covers publishes not caused by a booking (reconciliation, reconnects)")
+    display_refresh_p95 = fields.Float(
+        string='Render and Refresh p95 (ms)', readonly=True, digits=(16, 0),
+        help="Time the display needs to draw the screen and refresh the e-paper")
+
 
     @property
     def mqtt_manager(self):
@@ -145,22 +283,21 @@ class RoomRaspConnection(models.Model):
 
     @contextmanager
     def _get_new_cursor(self):
-        """Context manager for acquiring a new database cursor (thread-safe).
+        """Context manager for borrowing a background database cursor (thread-safe).
+
+        Cursors come from the bounded pool of the MQTT manager, which reuses open
+        cursors instead of opening one per callback. Uncommitted work is rolled
+        back when the block ends, nested use in one thread shares the cursor and
+        runs in a savepoint of the outer transaction (see CursorPool.cursor()).
     
         Used internally by:
-            - _update_connection_status()
-            - _on_connect()
-            - _on_disconnect()
-            - _on_message()
+            - _process_inbound_messages()
             - _mqtt_loop_start()
-            - _reconnect_mqtt()
-            - _start_data_publisher()
+            - _publish_room_data()
+            - _flush_connection_states()
         """
-        new_cr = self.pool.cursor()
-        try:
+        with self.mqtt_manager.cursor_pool(self.pool).cursor() as new_cr:
             yield new_cr
-        finally:
-            new_cr.close()
 
     @api.depends('mqtt_connection_state')
     def _compute_connection_state_display(self):
@@ -179,33 +316,113 @@ class RoomRaspConnection(models.Model):
         for record in self:
             record.connection_state_display = state_mapping.get(record.mqtt_connection_state, 'text-muted')
 
+    @api.depends('display_state', 'display_state_changed')
+    def _compute_display_liveness(self):
+        """Computes the liveness of the displays from the in-memory table of the MQTT manager.
+
+        Rooms whose display was not heard of since the server started fall back to
+        the last stored transition.
+        """
+        for record in self:
+            liveness = self.mqtt_manager.display_liveness(record.id) if record.id else None
+            if liveness:
+                record.display_online = liveness['online']
+                record.display_last_seen = _epoch_to_datetime(liveness['last_seen'])
+                record.display_latency_ms = liveness['latency'] * 1000 if liveness['latency'] is not None else 0.0
+            else:
+                record.display_online = record.display_state == 'online'
+                record.display_last_seen = record.display_state_changed
+                record.display_latency_ms = 0.0
+
+    def _store_display_latency(self):
+        """Stores the latency percentiles of the displays from the acks kept by the MQTT manager.
+
+        The acks only exist in the memory of the process hosting the MQTT clients, the
+        views are rendered by any worker. Only changed values are written.
+
+        Called by:
+            - _cron_mqtt_connection_monitor() (in the MQTT host process)
+        """
+        manager = self.mqtt_manager
+        for record in self:
+            samples, booking = manager.latency_percentiles(record.id, 'booking_ms')
+            _count, publish = manager.latency_percentiles(record.id, 'publish_ms', (95,))
+            _count, refresh = manager.latency_percentiles(record.id, 'refresh_ms', (95,))
+            vals = {
+                'display_latency_samples': samples,
+                'display_latency_p50': booking.get(50, 0.0),
+                'display_latency_p95': booking.get(95, 0.0),
+                'display_latency_p99': booking.get(99, 0.0),
+                'display_publish_p95': publish.get(95, 0.0),
+                'display_refresh_p95': refresh.get(95, 0.0),
+            }
+            changed = {name: value for name, value in vals.items() if record[name] != value}
+            if changed:
+                record.write(changed)
+
     def _update_connection_status(self, connection_id, state, error_msg=False):
         """Thread-safe update of MQTT connection status in the database.
-        This method uses a separate database cursor to safely update status
-        from background threads without interfering with the main thread.
+        The change is buffered in the MQTT manager and written together with the
+        changes of all other rooms by _flush_connection_states() a few seconds
+        later, so a broker restart does not cause one write and commit per room.
         Called by:
             - _on_connect()
             - _on_disconnect()
             - _mqtt_loop_start()
-            - _reconnect_mqtt()
         """
+        vals = {'mqtt_connection_state': state}
+        if error_msg:
+            vals['mqtt_error_message'] = error_msg
+        self.mqtt_manager.buffer_connection_state(
+            connection_id, vals, self.browse()._flush_connection_states, STATE_FLUSH_DELAY)
+
+    def _flush_connection_states(self, keys=None):
+        """Writes the buffered connection states of all rooms in one batch.
+
+        Rooms ending up with the same values are updated by a single write, rooms
+        whose state did not change are skipped. Intermediate states of flapping
+        rooms are never written, so they do not show up in the chatter either.
+
+        Called by:
+            - Publish scheduler (one-shot job scheduled by _update_connection_status())
+
+        Calls:
+            - mqtt_manager.pop_connection_states()
+            - _get_new_cursor()
+        """
+        pending = self.mqtt_manager.pop_connection_states()
+        if not pending:
+            return
         try:
             with self._get_new_cursor() as cr:
-                # Create new environment with separate cursor
                 env = api.Environment(cr, self.env.uid, {})
-                connection = env['rasproom.connection'].browse(connection_id)
-
-                # Verify record still exists
-                if not connection.exists():
-                    return
-                # Prepare update values
-                vals = {'mqtt_connection_state': state}
-                if state == 'connected':
-                    vals['mqtt_last_connection'] = fields.Datetime.now()
-                if error_msg:
-                    vals['mqtt_error_message'] = error_msg
-                # Update record and commit immediately
-                connection.write(vals)
+                connections = env['rasproom.connection'].browse(list(pending)).exists()
+                now = fields.Datetime.now()
+
+                # Group the rooms by the values to write
+                groups = {}
+                for connection in connections:
+                    vals = dict(pending[connection.id]['vals'])
+                    if vals['mqtt_connection_state'] == 'connected':
+                        # Also covers rooms that flapped and are connected again
+                        vals['mqtt_last_connection'] = now
+                    elif all(connection[name] == value for name, value in vals.items()):
+                        continue
+                    groups.setdefault(tuple(sorted(vals.items())), []).append(connection.id)
+
+                changed = sum(len(ids) for ids in groups.values())
+                if changed > STATE_TRACKING_LIMIT:
+                    connections = connections.with_context(tracking_disable=True)
+                    summary = {}
+                    for vals, ids in groups.items():
+                        state = dict(vals)['mqtt_connection_state']
+                        summary[state] = summary.get(state, 0) + len(ids)
+                    _logger.warning("MQTT connection state of %d rooms changed (%d transitions): %s",
+                                    changed, sum(p['transitions'] for p in pending.values()),
+                                    ", ".join("%d %s" % (count, state) for state, count in sorted(summary.items())))
+
+                for vals, ids in groups.items():
+                    connections.browse(ids).write(dict(vals))
                 cr.commit()
         except Exception as e:
             _logger.error("Failed to update connection status: %s", e)
@@ -213,34 +430,36 @@ class RoomRaspConnection(models.Model):
     def _on_connect(self, client, userdata, flags, rc):
         """MQTT on_connect callback. Handles subscription and status update.
 
-        This callback is triggered when the MQTT client connects to the broker.
-        It updates the connection status and subscribes to relevant topics.
+        This callback is triggered when a shared MQTT client connects to the broker.
+        It updates the connection status of all rooms multiplexed over the client
+        and subscribes to their topics in one request.
 
         Registered by:
-            - _mqtt_loop_start()
+            - _create_mqtt_client()
 
         Calls:
+            - mqtt_manager.client_connected()
+            - mqtt_manager.client_rooms()
             - _update_connection_status()
-            - _get_new_cursor()
         """
-        connection_id = userdata.get('connection_id')
-        
-        if not connection_id:
+        rooms = self.mqtt_manager.client_rooms(userdata.get('client_key'), client)
+
+        if not rooms:
             return
-            
+
         try:
             if rc == 0:
                 # Connection successful
-                self._update_connection_status(connection_id, 'connected')
-                
-                # Subscribe to topics
-                with self._get_new_cursor() as cr:
-                    env = api.Environment(cr, self.env.uid, {})
-                    connection = env['rasproom.connection'].browse(connection_id)
-                    if connection.exists():
-                        topic = f"{connection.mqtt_topic_prefix}{connection.raspName}/#"
-                        client.subscribe(topic, int(connection.mqtt_qos or 0))
-                        _logger.info("Subscribed to %s", topic)
+                self.mqtt_manager.client_connected(userdata.get('client_key'), client)
+                for connection_id in rooms:
+                    self._update_connection_status(connection_id, 'connected')
+
+                # Subscribe to the topics of all rooms
+                client.subscribe(sorted(set(rooms.values())))
+                _logger.info("Subscribed to the topics of %d rooms", len(rooms))
+
+                # Send the current room data right away instead of waiting for the next sweep
+                self.mqtt_manager.trigger_publish(list(rooms))
             else:
                 # Connection failed - map error codes to human-readable messages
                 errors = {
@@ -251,45 +470,46 @@ class RoomRaspConnection(models.Model):
                     5: "Not authorized"
                 }
                 error_msg = errors.get(rc, f"Unknown error: {rc}")
-                self._update_connection_status(connection_id, 'error', error_msg)
-                
+                for connection_id in rooms:
+                    self._update_connection_status(connection_id, 'error', error_msg)
+
         except Exception as e:
             _logger.error("Error in on_connect callback: %s", e)
 
     def _on_disconnect(self, client, userdata, rc):
         """MQTT on_disconnect callback. Manages reconnection and error handling.
 
-        This callback is triggered when the MQTT client disconnects from the broker.
-        It handles both planned and unexpected disconnections.
+        This callback is triggered when a shared MQTT client disconnects from the
+        broker. It handles both planned and unexpected disconnections for all rooms
+        of the client. After an unexpected disconnection the manager reconnects the
+        client with an exponential backoff and on_connect subscribes the rooms again.
 
         Registered by:
-            - _mqtt_loop_start()
+            - _create_mqtt_client()
 
         Calls:
+            - mqtt_manager.client_lost()
+            - mqtt_manager.client_rooms()
             - _update_connection_status()
-            - _reconnect_mqtt()
         """
-        connection_id = userdata.get('connection_id')
-        
-        if not connection_id:
+        if rc != 0:
+            self.mqtt_manager.client_lost(userdata.get('client_key'), client)
+
+        rooms = self.mqtt_manager.client_rooms(userdata.get('client_key'), client)
+
+        if not rooms:
             return
-            
+
         try:
-            if rc == 0:
-                # Normal disconnection
-                self._update_connection_status(connection_id, 'disconnected')
-            else:
-                # Unexpected disconnection
-                error_msg = f"Unexpected disconnect (code {rc})"
-                self._update_connection_status(connection_id, 'error', error_msg)
-                
-                # Schedule reconnection attempt
-                with self._get_new_cursor() as cr:
-                    env = api.Environment(cr, self.env.uid, {})
-                    connection = env['rasproom.connection'].browse(connection_id)
-                    if connection.exists() and connection.active and connection.use_mqtt:
-                        threading.Timer(5.0, lambda: self._reconnect_mqtt(connection_id)).start()
-                        
+            for connection_id in rooms:
+                if rc == 0:
+                    # Normal disconnection
+                    self._update_connection_status(connection_id, 'disconnected')
+                else:
+                    # Unexpected disconnection
+                    error_msg = f"Unexpected disconnect (code {rc})"
+                    self._update_connection_status(connection_id, 'error', error_msg)
+
         except Exception as e:
             _logger.error("Error in on_disconnect callback: %s", e)
 
@@ -298,51 +518,190 @@ class RoomRaspConnection(models.Model):
         Callback when MQTT message is received
 
         This callback is triggered when a message is received on a subscribed topic.
-        Currently logs the message - extend this method to handle specific message types.
+        It runs in the network thread, so it only routes the message to its room and
+        queues it; _process_inbound_messages() handles the queue in batches.
     
         Registered by:
-            - _mqtt_loop_start()
+            - _create_mqtt_client()
+
+        Calls:
+            - mqtt_manager.route_topic()
+            - mqtt_manager.enqueue_inbound()
         """
-        connection_id = userdata.get('connection_id')
+        # The client is shared by several rooms, find the room by the topic
+        connection_id, subtopic = self.mqtt_manager.route_topic(userdata.get('client_key'), message.topic)
         
         if not connection_id:
             return
-            
+
+        kind = subtopic.split('/', 1)[0]
+        # Our own publishes to the display are echoed back as well
+        if kind in DISPLAY_TOPICS:
+            return
+
+        self.mqtt_manager.enqueue_inbound(
+            connection_id, kind, message.payload, bool(message.retain),
+            self.browse()._process_inbound_messages, INBOUND_BATCH_INTERVAL,
+        )
+
+    def _process_inbound_messages(self, keys=None):
+        """Processes a batch of queued inbound messages in one transaction.
+
+        The messages are grouped by their subtopic and handed to the handler
+        of the subtopic (see INBOUND_HANDLERS) together, so each handler can
+        aggregate the messages of all rooms, e.g. only act on the latest status
+        of a room. Messages of deleted rooms are dropped.
+
+        Called by:
+            - Publish scheduler (one-shot job scheduled by _on_message())
+
+        Calls:
+            - mqtt_manager.drain_inbound()
+            - _handle_<subtopic>_messages()
+        """
+        messages, dropped = self.mqtt_manager.drain_inbound(self.browse()._process_inbound_messages)
+        if dropped:
+            metrics.INBOUND_DROPPED.inc(dropped)
+            _logger.warning("Inbound MQTT queue full, dropped %d messages", dropped)
+        if not messages:
+            return
+
+        # Group by subtopic, keeping the order in which the messages arrived
+        by_kind = {}
+        for connection_id, kind, payload, received, retained in messages:
+            by_kind.setdefault(kind, []).append(
+                (connection_id, payload.decode('utf-8', errors='replace'), received, retained))
+
         try:
             with self._get_new_cursor() as cr:
                 env = api.Environment(cr, self.env.uid, {})
-                connection = env['rasproom.connection'].browse(connection_id)
-                
-                if not connection.exists():
-                    return
-                    
-                topic = message.topic
-                payload = message.payload.decode('utf-8')
-                _logger.info("Received message: %s - %s", topic, payload)
-                
-                # Process message (implement your message handling logic here)
-                
+                connections = env['rasproom.connection'].browse({message[0] for message in messages}).exists()
+                existing = set(connections.ids)
+                for kind, items in by_kind.items():
+                    metrics.INBOUND_MESSAGES.inc(len(items), kind=kind if kind in INBOUND_HANDLERS else 'other')
+                    if kind not in INBOUND_HANDLERS:
+                        _logger.debug("Ignoring %d messages on unknown subtopic %r", len(items), kind)
+                        continue
+                    handler = INBOUND_HANDLERS[kind]
+                    items = [item for item in items if item[0] in existing]
+                    if handler and items:
+                        getattr(connections, handler)(items)
+                cr.commit()
         except Exception as e:
-            _logger.error("Error in on_message callback: %s", e)
+            _logger.error("Failed to process inbound MQTT messages: %s", e)
+
+    def _handle_status_messages(self, messages):
+        """Handles /status messages: a (re)started display has no data yet.
+
+        The retained status is redelivered by the broker whenever Odoo (re)subscribes,
+        it tells nothing about the display now and is ignored.
+
+        Args:
+            messages (list): (connection_id, payload, received, retained) tuples in arrival order
+        """
+        latest = {connection_id: (payload, received)
+                  for connection_id, payload, received, retained in messages if not retained}
+        online = [connection_id for connection_id, (payload, _received) in latest.items() if payload == 'online']
+        for connection_id in online:
+            self.mqtt_manager.forget_payload(connection_id)
+        self.mqtt_manager.trigger_publish(online)
+
+        changed = [connection_id for connection_id, (payload, received) in latest.items()
+                   if payload in ('online', 'offline')
+                   and self.mqtt_manager.record_display_status(connection_id, payload == 'online', received)]
+        self._write_display_states(changed)
+
+    def _handle_ping_messages(self, messages):
+        """Handles /ping messages: the display is alive, its send timestamp estimates the delay.
+
+        Only the liveness table of the MQTT manager is updated, the database is only
+        written when a display comes back online.
+
+        Args:
+            messages (list): (connection_id, payload, received, retained) tuples in arrival order
+        """
+        changed = set()
+        for connection_id, payload, received, _retained in messages:
+            try:
+                sent = float(payload)
+            except ValueError:
+                sent = None
+            if self.mqtt_manager.record_display_ping(connection_id, sent, received):
+                changed.add(connection_id)
+        self._write_display_states(changed)
+
+    def _handle_ack_messages(self, messages):
+        """Handles /ack messages: the display shows the payload with the acknowledged sequence number.
+
+        Args:
+            messages (list): (connection_id, payload, received, retained) tuples in arrival order
+        """
+        for connection_id, payload, received, _retained in messages:
+            try:
+                ack = json.loads(payload)
+            except ValueError:
+                _logger.debug("Invalid ack of connection %s: %s", connection_id, payload)
+                continue
+            if isinstance(ack, dict):
+                self.mqtt_manager.record_ack(connection_id, ack, received)
+
+    def _write_display_states(self, connection_ids):
+        """Stores the current online flag of displays whose liveness changed.
+
+        Called by:
+            - _handle_status_messages()
+            - _handle_ping_messages()
+            - _cron_mqtt_connection_monitor()
+        """
+        now = fields.Datetime.now()
+        by_state = {}
+        for connection_id in connection_ids:
+            liveness = self.mqtt_manager.display_liveness(connection_id)
+            if liveness:
+                by_state.setdefault('online' if liveness['online'] else 'offline', []).append(connection_id)
+        for state, ids in by_state.items():
+            self.browse(ids).write({'display_state': state, 'display_state_changed': now})
+
+    def _handle_snapshot_messages(self, messages):
+        """Handles /snapshot messages: the display missed a delta update and needs the full room data.
+
+        Args:
+            messages (list): (connection_id, payload, received, retained) tuples in arrival order
+        """
+        rooms = {connection_id for connection_id, _payload, _received, _retained in messages}
+        for connection_id in rooms:
+            self.mqtt_manager.forget_payload(connection_id)
+        self.mqtt_manager.trigger_publish(rooms)
+
+    def _handle_capabilities_messages(self, messages):
+        """Handles /capabilities messages: the display announced the payload formats it can decode.
+
+        Args:
+            messages (list): (connection_id, payload, received, retained) tuples in arrival order
+        """
+        latest = {connection_id: payload for connection_id, payload, _received, _retained in messages}
+        for connection_id, payload in latest.items():
+            capabilities = {part.strip() for part in payload.split(',') if part.strip()}
+            self.mqtt_manager.set_display_capabilities(connection_id, capabilities)
+            self.mqtt_manager.forget_payload(connection_id)
+        self.mqtt_manager.trigger_publish(latest)
 
     def _mqtt_loop_start(self, connection_id):
-        """Initializes and starts the MQTT client and its event loop in a thread.
+        """Attaches a room to the shared MQTT client of its broker and starts publishing.
 
-        This is the main method that sets up the MQTT client with all its
-        configuration and starts the background connection loop.
+        Rooms with identical broker settings share one client (see _mqtt_client_key()),
+        the client and its network loop are only created for the first of them. Only
+        the process hosting the MQTT clients of the database attaches rooms.
 
         Called by:
             - connect_mqtt()
-            - _reconnect_mqtt()
-
-        Registers callbacks:
-            - _on_connect
-            - _on_disconnect
-            - _on_message
 
         Calls:
-            - mqtt_manager.register()
+            - _acquire_mqtt_host()
+            - mqtt_manager.attach_room()
+            - _create_mqtt_client()
             - _start_data_publisher()
+            - _update_connection_status()
         """
         try:
             with self._get_new_cursor() as cr:
@@ -351,81 +710,109 @@ class RoomRaspConnection(models.Model):
                 
                 if not connection.exists() or not connection.active or not connection.use_mqtt:
                     return
-                    
-                client = mqtt.Client(
-                    client_id=connection.mqtt_client_id or f'odoo-{connection_id}-{int(time.time())}'[:23],
-                    userdata={'connection_id': connection_id},
-                    protocol=mqtt.MQTTv311
+                if not connection._acquire_mqtt_host():
+                    # The host was taken over since connect_mqtt(), it attaches the room itself
+                    _logger.info("Connection %s is attached by the MQTT host process", connection_id)
+                    return
+
+                # Buffered first, so a quick on_connect of a new client is not overwritten
+                self._update_connection_status(connection_id, 'connecting')
+
+                topic = f"{connection.mqtt_topic_prefix}{connection.raspName}/#"
+                qos = int(connection.mqtt_qos or 0)
+                engine = env['ir.config_parameter'].sudo().get_param(MQTT_ENGINE_PARAM, 'thread')
+                client, created = self.mqtt_manager.attach_room(
+                    connection_id, connection._mqtt_client_key(), topic, qos,
+                    partial(self._create_mqtt_client, connection), engine,
                 )
-                
-                # Configure client
-                client.on_connect = self._on_connect
-                client.on_disconnect = self._on_disconnect
-                client.on_message = self._on_message
-                client.enable_logger(_logger)
-                
-                if connection.mqtt_username:
-                    client.username_pw_set(connection.mqtt_username, connection.mqtt_password)
-                    
-                if connection.mqtt_use_tls:
-                    client.tls_set(cert_reqs=ssl.CERT_NONE)
-                    client.tls_insecure_set(True)
-                
-                # Connect asynchronously
-                client.connect_async(connection.mqtt_broker, connection.mqtt_port, 
-                                    keepalive=connection.mqtt_keep_alive)
-                client.loop_start()
-                
-                # Register client
-                self.mqtt_manager.register(connection_id, client)
-                
-                # Start periodic publisher
+
+                # Add the room to the shared periodic publisher
                 self._start_data_publisher(connection_id, client)
-                
-                # Update status
-                connection.write({'mqtt_connection_state': 'connecting'})
-                cr.commit()
+
+                if not created and client.is_connected():
+                    # The shared client is up already, only this room's subscription is missing
+                    client.subscribe(topic, qos)
+                    self._update_connection_status(connection_id, 'connected')
+                    self.mqtt_manager.trigger_publish([connection_id])
                 
         except Exception as e:
             _logger.error("Failed to start MQTT loop: %s", e)
             self._update_connection_status(connection_id, 'error', str(e))
 
-    def _reconnect_mqtt(self, connection_id):
-        """Attempts to reconnect to the MQTT broker after a disconnection.
-        This method handles automatic reconnection by cleaning up the old
-        connection and starting a new one.
+    def _mqtt_client_key(self):
+        """Returns the broker settings that decide which rooms can share an MQTT client.
+
+        Rooms with an explicit client id get a client of their own, because the
+        broker only allows one session per client id.
+        """
+        self.ensure_one()
+        return (
+            self.mqtt_broker, self.mqtt_port, self.mqtt_username or '', self.mqtt_password or '',
+            bool(self.mqtt_use_tls), self.mqtt_keep_alive, self.mqtt_client_id or '',
+        )
+
+    def _create_mqtt_client(self, connection):
+        """Creates a shared MQTT client for the broker settings of a room.
+
+        The client is only prepared with connect_async(), the MQTT manager connects
+        it and reconnects it after an unexpected disconnection. Its MQTT engine serves
+        the network I/O: the 'thread' engine runs a network loop thread per client,
+        the 'asyncio' engine serves all clients from one event loop thread.
 
         Called by:
-            - _on_disconnect() via Timer
+            - mqtt_manager.attach_room() (through _mqtt_loop_start())
+
+        Registers callbacks:
+            - _on_connect
+            - _on_disconnect
+            - _on_message
         """
-        try:
-            with self._get_new_cursor() as cr:
-                env = api.Environment(cr, self.env.uid, {})
-                connection = env['rasproom.connection'].browse(connection_id)
-                
-                if not connection.exists() or not connection.active or not connection.use_mqtt:
-                    return
-                    
-                _logger.info("Attempting to reconnect MQTT for %s", connection.name)
-                
-                # Force disconnect and clean up
-                self.mqtt_manager.unregister(connection_id)
-                
-                # Start new connection
-                self._mqtt_loop_start(connection_id)
-                
-        except Exception as e:
-            _logger.error("Reconnection attempt failed: %s", e)
+        client = mqtt.Client(
+            client_id=connection.mqtt_client_id or f'odoo-{connection.id}-{int(time.time())}'[:23],
+            userdata={'client_key': connection._mqtt_client_key()},
+            protocol=mqtt.MQTTv311,
+            # Reconnects are scheduled by the MQTT manager with backoff and jitter
+            reconnect_on_failure=False,
+        )
+
+        # Configure client
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+        client.enable_logger(_logger)
+
+        if connection.mqtt_username:
+            client.username_pw_set(connection.mqtt_username, connection.mqtt_password)
+
+        if connection.mqtt_use_tls:
+            client.tls_set(cert_reqs=ssl.CERT_NONE)
+            client.tls_insecure_set(True)
+
+        # Only store the broker address, the engine connects asynchronously
+        client.connect_async(connection.mqtt_broker, connection.mqtt_port,
+                             keepalive=connection.mqtt_keep_alive)
+        return client
 
     # === PUBLIC API METHODS ===
     # These methods are called from UI buttons and other parts of the system
     def connect_mqtt(self):
         """Public method to initiate MQTT connection (connect to MQTT broker).
         This is the main entry point for establishing MQTT connectivity.
+        Only the process hosting the MQTT clients of the database connects rooms, other
+        processes ask the host to connect the room once their transaction commits.
+
         Called by:
             - action_connect()
             - create()
             - write()
+            - _cron_mqtt_connection_monitor()
+            - _sync_host_rooms()
+
+        Calls:
+            - _acquire_mqtt_host()
+            - _request_host_sync()
+            - disconnect_mqtt()
+            - _mqtt_loop_start()
         """
         self.ensure_one()
         # Check if MQTT library is available
@@ -438,7 +825,12 @@ class RoomRaspConnection(models.Model):
         # Check if MQTT is enabled for this connection
         if not self.use_mqtt:
             return False
-            
+
+        if not self._acquire_mqtt_host():
+            # Another process hosts the MQTT clients, it (re)connects the room after commit
+            self._request_host_sync()
+            return True
+
         # Disconnect any existing connection
         self.disconnect_mqtt()
         
@@ -453,14 +845,19 @@ class RoomRaspConnection(models.Model):
         Called by:
             - connect_mqtt()
             - write()
-            - unlink()
             - action_disconnect()
+            - _sync_host_rooms()
         """
         self.ensure_one()
         
         # Unregister from manager (handles client disconnection)
         if self.mqtt_manager.unregister(self.id):
+            # Written directly, buffered states of the old client are outdated
+            self.mqtt_manager.discard_connection_state(self.id)
             self.write({'mqtt_connection_state': 'disconnected'})
+        elif not self.mqtt_manager.is_host(self.env.cr.dbname):
+            # The room may be attached in the host process, which disconnects it after commit
+            self._request_host_sync()
             
         return True
 
@@ -641,6 +1038,8 @@ class RoomRaspConnection(models.Model):
             if record.use_mqtt and record.active:
                 record.connect_mqtt()
 
+        # Cached free/busy answers do not know the new rooms yet
+        self.env['calendar.event']._invalidate_room_interval_index()
         return records
 
 
@@ -654,12 +1053,24 @@ class RoomRaspConnection(models.Model):
         Calls:
             - disconnect_mqtt()
             - connect_mqtt()
+            - _clear_renamed_topics() (after commit)
         """
         # Normalize 'status' to 'active' if present
         if 'status' in vals:
             vals['active'] = vals.pop('status')
-            
+
+        # Topics the rooms published to before a rename
+        old_topics = {}
+        if {'raspName', 'mqtt_topic_prefix'}.intersection(vals):
+            old_topics = {record.id: f"{record.mqtt_topic_prefix}{record.raspName}" for record in self}
+
         result = super().write(vals)
+
+        renamed = [(record.id, old_topics[record.id]) for record in self
+                   if record.id in old_topics and old_topics[record.id] != f"{record.mqtt_topic_prefix}{record.raspName}"]
+        if renamed:
+            # The old retained messages would stay on the broker forever
+            self.env.cr.postcommit.add(partial(self.browse()._clear_renamed_topics, renamed))
         
         # Check if any relevant fields changed
         mqtt_fields = {
@@ -667,7 +1078,12 @@ class RoomRaspConnection(models.Model):
             'mqtt_topic_prefix', 'mqtt_use_tls', 'mqtt_client_id', 'mqtt_keep_alive',
             'raspName', 'active'
         }
-        
+        # Fields that are part of the published room data
+        room_data_fields = {
+            'name', 'capacity', 'partner_id', 'mqtt_payload_format',
+            'display_event_limit', 'display_horizon_hours',
+        }
+
         if mqtt_fields.intersection(vals.keys()):
             for record in self:
                 if record.use_mqtt and record.active:
@@ -675,7 +1091,14 @@ class RoomRaspConnection(models.Model):
                     record.connect_mqtt()
                 else:
                     record.disconnect_mqtt()
-                    
+        elif room_data_fields.intersection(vals.keys()):
+            # Reconnecting publishes anyway, otherwise push the changed room data
+            self._mark_rooms_dirty()
+
+        # Fields the free/busy answers are filtered by or return
+        if {'name', 'capacity', 'city', 'floor', 'partner_id', 'active'}.intersection(vals):
+            self.env['calendar.event']._invalidate_room_interval_index()
+
         return result
 
     def unlink(self):
@@ -686,20 +1109,22 @@ class RoomRaspConnection(models.Model):
             - ORM when RoomRaspConnection records are deleted.
 
         Calls:
-            - disconnect_mqtt()
+            - _retire_rooms() (after commit)
         """
         CalendarEvent = self.env['calendar.event']
         CalendarFilter = self.env['calendar.filters']
 
-        for record in self:
-            record.disconnect_mqtt()
+        # The displays are only cleared and disconnected once the deletion is committed
+        retired = [(record.id, f"{record.mqtt_topic_prefix}{record.raspName}") for record in self]
+        self.env.cr.postcommit.add(partial(self.browse()._retire_rooms, retired))
 
+        for record in self:
             partner = record.partner_id
             if partner:
-                # Remove partner from all calendar events
-                events = CalendarEvent.search([('partner_ids', 'in', partner.id)])
-                for event in events:
-                    event.partner_ids = [(3, partner.id)]
+                # Remove partner from the calendar events booking the room (its attendee
+                # rows of other events are removed with the partner)
+                events = CalendarEvent.search([('meeting_room', '=', partner.id)])
+                events.write({'partner_ids': [(3, partner.id)]})
 
                 # Remove from calendar filters (to avoid FK constraint failure)
                 filters = CalendarFilter.search([('partner_id', '=', partner.id)])
@@ -708,38 +1133,414 @@ class RoomRaspConnection(models.Model):
                 # Now safe to delete partner
                 partner.unlink()
 
+        CalendarEvent._invalidate_room_interval_index()
         return super().unlink()
 
+    def _mark_rooms_dirty(self):
+        """Publish the room data of the connections in self once the transaction commits.
+
+        Changes are collected per transaction and pushed in one go by a post-commit
+        hook, so a booking reaches the display right away instead of waiting for the
+        periodic reconciliation sweep, and rolled back changes are never published.
+        The rooms may be attached to an MQTT client of another Odoo process (e.g. the
+        booking is saved by an HTTP worker), so the transaction also sends a Postgres
+        notification, which is only delivered if it commits (see ChangeListener).
+
+        Called by:
+            - write()
+            - calendar.event create(), write() and unlink()
+
+        Calls:
+            - _notify_rooms_dirty() (before commit)
+            - mqtt_manager.trigger_publish() (after commit)
+        """
+        if not self:
+            return
+        cr = self.env.cr
+        dirty = cr.postcommit.data.setdefault('rasproom.connection.dirty', set())
+        if not dirty:
+            # The first change of the transaction starts the booking-to-display latency
+            cr.postcommit.data['rasproom.connection.origin'] = time.time()
+            cr.postcommit.add(partial(self.mqtt_manager.trigger_publish, dirty,
+                                      origin=cr.postcommit.data['rasproom.connection.origin']))
+        dirty.update(self.ids)
+        # Pre-commit hooks also run (and are dropped) when a savepoint flushes, so
+        # changes after a savepoint register the notification again
+        notify = cr.precommit.data.setdefault('rasproom.connection.notify', set())
+        if not notify:
+            cr.precommit.add(partial(self.browse()._notify_rooms_dirty, notify,
+                                     cr.postcommit.data['rasproom.connection.origin']))
+        notify.update(self.ids)
+
+    def _notify_rooms_dirty(self, connection_ids, origin):
+        """Announces the changed rooms of the transaction to the other Odoo processes.
+
+        Called by:
+            - Pre-commit hook registered by _mark_rooms_dirty()
+        """
+        change = {'sender': process_id(), 'ids': sorted(connection_ids), 'origin': origin}
+        payload = json.dumps(change)
+        if len(payload) > MAX_NOTIFY_PAYLOAD:
+            # Too many rooms for one notification, the receivers publish all their rooms
+            payload = json.dumps(dict(change, ids=None))
+        self.env.cr.execute("SELECT pg_notify(%s, %s)", [mqtt_connector.CHANGE_CHANNEL, payload])
+
+    def _acquire_mqtt_host(self):
+        """Makes this process the host of the MQTT clients of the database, unless another process is.
+
+        The host also serves the Prometheus metrics, which only it has, if the metrics
+        port and token are configured.
+
+        Returns:
+            bool: True if this process hosts the MQTT clients and may attach rooms
+
+        Called by:
+            - connect_mqtt()
+            - _mqtt_loop_start()
+            - _cron_mqtt_connection_monitor()
+
+        Calls:
+            - mqtt_manager.acquire_host()
+            - mqtt_manager.serve_metrics()
+        """
+        if not self.mqtt_manager.acquire_host(
+                self.env.cr.dbname, self.browse()._sync_host_rooms, self.browse()._monitor_host_rooms):
+            return False
+        params = self.env['ir.config_parameter'].sudo()
+        try:
+            port = int(params.get_param(METRICS_PORT_PARAM) or 0)
+        except ValueError:
+            _logger.warning("Invalid %s, the metrics are not served", METRICS_PORT_PARAM)
+            port = 0
+        self.mqtt_manager.serve_metrics(port, params.get_param(METRICS_TOKEN_PARAM) or '')
+        return True
+
+    def _request_host_sync(self):
+        """Asks the MQTT host process to connect or disconnect the rooms in self once the transaction commits.
+
+        Called by:
+            - connect_mqtt()
+            - disconnect_mqtt()
+
+        Calls:
+            - _notify_host_sync() (before commit)
+        """
+        cr = self.env.cr
+        # Registered again after savepoints, like the room changes (see _mark_rooms_dirty())
+        pending = cr.precommit.data.setdefault('rasproom.connection.sync', set())
+        if not pending:
+            cr.precommit.add(partial(self.browse()._notify_host_sync, pending))
+        pending.update(self.ids)
+
+    def _notify_host_sync(self, connection_ids):
+        """Sends the sync request of the transaction to the MQTT host process.
+
+        Called by:
+            - Pre-commit hook registered by _request_host_sync()
+        """
+        request = {'sender': process_id(), 'ids': sorted(connection_ids), 'sync': True}
+        payload = json.dumps(request)
+        if len(payload) > MAX_NOTIFY_PAYLOAD:
+            # Too many rooms for one notification, the host checks all of its rooms
+            payload = json.dumps(dict(request, ids=None))
+        self.env.cr.execute("SELECT pg_notify(%s, %s)", [mqtt_connector.CHANGE_CHANNEL, payload])
+
+    def _sync_host_rooms(self, connection_ids):
+        """Connects or disconnects the rooms other processes asked the host to sync.
+
+        Every requested room is reconnected with its current settings, or disconnected
+        if it was deleted, archived or had MQTT turned off.
+
+        Called by:
+            - mqtt_manager (one-shot job, see mqtt_manager.acquire_host())
+
+        Calls:
+            - connect_mqtt()
+            - disconnect_mqtt()
+            - _cron_mqtt_connection_monitor()
+
+        Args:
+            connection_ids (list or None): Requested rooms, None to check all rooms
+        """
+        with self._get_new_cursor() as cr:
+            env = api.Environment(cr, self.env.uid, {})
+            Connection = env['rasproom.connection']
+            if connection_ids is None:
+                Connection._cron_mqtt_connection_monitor()
+            else:
+                connections = Connection.browse(connection_ids).exists()
+                for connection_id in set(connection_ids) - set(connections.ids):
+                    self.mqtt_manager.unregister(connection_id)
+                for connection in connections:
+                    if connection.use_mqtt and connection.active:
+                        connection.connect_mqtt()
+                    else:
+                        connection.disconnect_mqtt()
+            cr.commit()
+
+    def _monitor_host_rooms(self, keys):
+        """Checks the MQTT clients of the host process periodically.
+
+        The cron job runs in whichever process the Odoo scheduler picks, the host's
+        own clients are checked by this job of the host.
+
+        Called by:
+            - mqtt_manager (periodic job, see mqtt_manager.acquire_host())
+
+        Calls:
+            - _cron_mqtt_connection_monitor()
+        """
+        with self._get_new_cursor() as cr:
+            env = api.Environment(cr, self.env.uid, {})
+            env['rasproom.connection']._cron_mqtt_connection_monitor()
+            cr.commit()
+
+    def _retire_rooms(self, rooms):
+        """Clears the retained messages of deleted rooms and detaches them from their MQTT client.
+
+        Called by:
+            - Post-commit hook registered by unlink()
+
+        Calls:
+            - _clear_retained_topics()
+            - mqtt_manager.unregister()
+
+        Args:
+            rooms (list): (connection id, topic base) of the deleted rooms
+        """
+        for connection_id, topic_base in rooms:
+            client = self.mqtt_manager.get_client(connection_id)
+            if client and client.is_connected():
+                # Give the network loop a moment to send them before disconnecting
+                self._clear_retained_topics(client, topic_base, wait=True)
+            self.mqtt_manager.unregister(connection_id)
+            self.mqtt_manager.discard_connection_state(connection_id)
+
+    def _clear_renamed_topics(self, rooms):
+        """Clears the retained messages left on the topics of renamed rooms.
+
+        The room's current client is used, so topics on a broker the room moved away
+        from at the same time are not reached. Clearing messages are queued if the
+        client is still connecting.
+
+        Called by:
+            - Post-commit hook registered by write()
+
+        Args:
+            rooms (list): (connection id, old topic base) of the renamed rooms
+        """
+        for connection_id, topic_base in rooms:
+            client = self.mqtt_manager.get_client(connection_id)
+            if client:
+                self._clear_retained_topics(client, topic_base)
+
+    @staticmethod
+    def _clear_retained_topics(client, topic_base, wait=False):
+        """Remove all retained messages of a room from the broker.
+
+        An empty retained message deletes the retained message of its topic. Covers
+        the room data, every possible event page and the topics the display retains.
+
+        Called by:
+            - _retire_rooms()
+            - _clear_renamed_topics()
+
+        Args:
+            client (mqtt.Client): Client connected to the room's broker
+            topic_base (str): Topic prefix and Raspberry ID of the room
+            wait (bool): Wait until the broker received the messages
+        """
+        topics = [f"{topic_base}/{subtopic}" for subtopic in RETAINED_TOPICS]
+        topics += [f"{topic_base}/events/{number}" for number in range(2, MAX_EVENT_PAGES + 1)]
+        infos = [client.publish(topic, b'', qos=1, retain=True) for topic in topics]
+        if not wait:
+            return
+        try:
+            for info in infos:
+                info.wait_for_publish(2)
+        except (RuntimeError, ValueError) as e:
+            _logger.warning("Could not clear the retained messages of %s: %s", topic_base, e)
+
+    # === FREE/BUSY QUERIES ===
+    @api.model
+    def get_free_busy(self, start, stop, min_capacity=0, city=None, floor=None):
+        """Returns the free and busy intervals of all matching rooms within a time window.
+
+        The window is truncated to whole minutes so that polling clients (kiosks,
+        integrations) share the cached answer, see _free_busy(). Raises a
+        ValidationError for invalid windows or a non-numeric minimum capacity.
+
+        Called by:
+            - /room_booker/free_busy controller
+
+        Calls:
+            - _free_busy()
+
+        Args:
+            start (datetime): Start of the window (UTC)
+            stop (datetime): End of the window (UTC)
+            min_capacity (int): Only rooms with at least this capacity, a number or numeric string
+            city (str): Only rooms in this city (case-insensitive)
+            floor (str): Only rooms on this floor (case-insensitive)
+
+        Returns:
+            list: One dict per room, see _free_busy()
+        """
+        start = start.replace(second=0, microsecond=0)
+        stop = stop.replace(second=0, microsecond=0)
+        if stop <= start:
+            raise ValidationError("The end of the time window must be after its start.")
+        if stop - start > timedelta(days=MAX_FREE_BUSY_DAYS):
+            raise ValidationError(f"The time window cannot be longer than {MAX_FREE_BUSY_DAYS} days.")
+        try:
+            min_capacity = int(min_capacity or 0)
+        except (TypeError, ValueError):
+            raise ValidationError(f"Invalid minimum capacity: {min_capacity!r}, expected a whole number.")
+        return self._free_busy(start, stop, min_capacity, (city or '').lower() or None,
+                               (floor or '').lower() or None)
+
+    @api.model
+    def _free_busy(self, start, stop, min_capacity, city, floor):
+        """Returns the free/busy intervals of the matching rooms, cached per window and filters.
+
+        The answers are cached with the bookings version until a booking or room
+        changes, see calendar.event _room_cached() and _invalidate_room_interval_index().
+
+        Called by:
+            - get_free_busy()
+
+        Calls:
+            - _query_free_busy()
+
+        Returns:
+            list: See _query_free_busy(); the cached result is shared and must not be modified
+        """
+        return self.env['calendar.event']._room_cached(
+            ('free_busy', start, stop, min_capacity, city, floor),
+            lambda env: env['rasproom.connection']._query_free_busy(start, stop, min_capacity, city, floor),
+        )
+
+    @api.model
+    def _query_free_busy(self, start, stop, min_capacity, city, floor):
+        """Computes the free/busy intervals of the matching rooms with a single query.
+
+        The bookings overlapping the window are joined to the rooms through the
+        indexed meeting_room column. Only times are returned, never the names of
+        the bookings.
+
+        Called by:
+            - _free_busy()
+
+        Returns:
+            list: Dicts with 'id', 'name', 'partner_id', 'capacity', 'city', 'floor',
+            'busy' and 'free' (lists of [start, stop] in UTC server format)
+        """
+        self.env.cr.execute("""
+            SELECT conn.id, conn.name, conn.partner_id, conn.capacity, conn.city, conn.floor,
+                   event.start, event.stop
+              FROM rasproom_connection conn
+         LEFT JOIN calendar_event event
+                ON event.meeting_room = conn.partner_id
+               AND event.active
+               AND event.start < %(stop)s
+               AND event.stop > %(start)s
+             WHERE conn.active
+               AND COALESCE(conn.capacity, 0) >= %(min_capacity)s
+               AND (%(city)s IS NULL OR lower(conn.city) = %(city)s)
+               AND (%(floor)s IS NULL OR lower(conn.floor) = %(floor)s)
+          ORDER BY conn.name, conn.id, event.start
+        """, {'start': start, 'stop': stop, 'min_capacity': min_capacity, 'city': city, 'floor': floor})
+
+        rooms = {}
+        for conn_id, name, partner_id, capacity, room_city, room_floor, event_start, event_stop in self.env.cr.fetchall():
+            room = rooms.setdefault(conn_id, {
+                'id': conn_id,
+                'name': name,
+                'partner_id': partner_id,
+                'capacity': capacity,
+                'city': room_city or '',
+                'floor': room_floor or '',
+                'busy': [],
+            })
+            if event_start is None:
+                continue
+            # Merge overlapping bookings, clipped to the window
+            event_start, event_stop = max(event_start, start), min(event_stop, stop)
+            if room['busy'] and event_start <= room['busy'][-1][1]:
+                room['busy'][-1][1] = max(room['busy'][-1][1], event_stop)
+            else:
+                room['busy'].append([event_start, event_stop])
+
+        to_string = fields.Datetime.to_string
+        result = []
+        for room in rooms.values():
+            free, cursor = [], start
+            for busy_start, busy_stop in room['busy']:
+                if busy_start > cursor:
+                    free.append([cursor, busy_start])
+                cursor = max(cursor, busy_stop)
+            if cursor < stop:
+                free.append([cursor, stop])
+            room['busy'] = [[to_string(a), to_string(b)] for a, b in room['busy']]
+            room['free'] = [[to_string(a), to_string(b)] for a, b in free]
+            result.append(room)
+        return result
+
     # === SCHEDULED TASKS ===
     @api.model
     def _cron_mqtt_connection_monitor(self):
         """Cron job that checks MQTT connections and attempts reconnection if needed.
-        This scheduled task runs periodically to monitor MQTT connection health
-        and automatically reconnect any dropped connections.
+        This scheduled task runs periodically to monitor MQTT connection health.
+        All rooms are checked in one pass against the connection state machine of
+        the MQTT manager: sessions that are connected, connecting or waiting for
+        their next backoff attempt are left alone, only stale sessions get a new
+        connection attempt. Rooms without a client (e.g. after a server restart)
+        are attached again.
+
+        Only the process hosting the MQTT clients monitors them: the first process
+        running the job after a server restart becomes the host, in other processes
+        the job does nothing (and detaches rooms left over from a lost host role).
 
         Called by:
-            - Odoo scheduler (cron job).
+            - Odoo scheduler (cron job, see data/ir_cron_data.xml).
+            - _monitor_host_rooms()
+            - _sync_host_rooms()
 
         Calls:
-            - mqtt_manager.get_client()
-            - mqtt_manager.is_connected()
-            - _reconnect_mqtt()
+            - _acquire_mqtt_host()
+            - mqtt_manager.check_connections()
+            - mqtt_manager.expire_liveness()
+            - _write_display_states()
+            - _store_display_latency()
+            - connect_mqtt()
         """
-        connections = self.search([
+        if not self._acquire_mqtt_host():
+            detached = self.mqtt_manager.unregister_all()
+            if detached:
+                _logger.warning("Another process hosts the MQTT clients now, detached %d rooms", len(detached))
+            return
+
+        connection_ids = self.search([
             ('use_mqtt', '=', True),
             ('active', '=', True)
-        ])
+        ]).ids
         
-        manager = mqtt_connector.MqttConnectionManager()
+        missing = self.mqtt_manager.check_connections(connection_ids)
+
+        # Displays that stopped pinging without a last will (e.g. network outage)
+        expired = self.mqtt_manager.expire_liveness()
+        if expired:
+            _logger.info("%d displays stopped reporting and are offline", len(expired))
+            existing = self.browse(expired).exists()
+            existing._write_display_states(existing.ids)
+
+        # Latency samples only exist for the rooms attached in this process
+        self.browse(sorted(set(connection_ids) - set(missing)))._store_display_latency()
         
-        for connection in connections:
+        for connection in self.browse(missing):
             try:
-                client = manager.get_client(connection.id)
-                
-                if not client or not client.is_connected():
-                    _logger.info("(Re)connecting %s", connection.name)
-                    connection.disconnect_mqtt()
-                    connection.connect_mqtt()
+                _logger.info("Connecting %s", connection.name)
+                connection.connect_mqtt()
                     
             except Exception as e:
                 _logger.error("Monitor error for %s: %s", connection.name, e)
@@ -781,149 +1582,421 @@ class RoomRaspConnection(models.Model):
             return self._show_notification("MQTT Connection", "Failed to disconnect", 'danger')
         
     def _start_data_publisher(self, connection_id, client):
-        """Start a periodic data publisher thread for sending room data to MQTT broker"""
-        """Starts a background thread to publish periodic data to a topic.
+        """Add the connection to the shared publisher schedule of the MQTT manager.
+
+        All rooms are published by a single scheduler thread with a bounded worker
+        pool (see publish_scheduler.PublishScheduler), so thread and cursor count
+        stay constant as the number of rooms grows.
 
         Called by:
             - _mqtt_loop_start()
 
+        Calls:
+            - mqtt_manager.publisher_callback()
+            - mqtt_manager.schedule_publisher()
+        """
+        # The scheduler groups the due rooms by callback, all rooms of the database must
+        # get the same callback object to be processed together in one pass per tick
+        callback = self.mqtt_manager.publisher_callback(self.pool, self.browse()._publish_room_data)
+        self.mqtt_manager.schedule_publisher(connection_id, callback, PUBLISH_INTERVAL)
+        _logger.info(f"Scheduled data publisher for connection {connection_id}")
+
+    def _publish_room_data(self, connection_ids):
+        """Publish the current room data of a batch of connections to the MQTT broker.
+
+        Runs in a worker of the shared publisher scheduler and processes all due
+        connections with a single database cursor. The payloads of the whole batch
+        are built by _build_room_payloads() with a constant number of queries.
+
+        Called by:
+            - PublishScheduler (via _start_data_publisher())
+
         Calls:
             - _get_new_cursor()
+            - _publisher_uid()
+            - _build_room_payloads()
         """
-        def publish_loop():
-            t = threading.current_thread()
-            while getattr(t, "do_run", True):
+        cycle_start = time.monotonic()
+        with self._get_new_cursor() as cr:
+            env = api.Environment(cr, self.env.uid, {})
+            # Publish as the technical publisher user, whose rights are evaluated once
+            env = env(user=env['rasproom.connection']._publisher_uid())
+            connections = env['rasproom.connection'].browse(connection_ids).exists()
+
+            # Rooms that are gone or archived stop publishing
+            for connection_id in set(connection_ids) - set(connections.filtered('active').ids):
+                self.mqtt_manager.unregister(connection_id)
+            connections = connections.filtered('active')
+
+            results = {'published': 0, 'unchanged': 0, 'failed': 0}
+            try:
+                build_start = time.monotonic()
+                payloads, next_changes = connections._build_room_payloads()
+                metrics.PAYLOAD_BUILD_SECONDS.observe(time.monotonic() - build_start)
+                metrics.PAYLOAD_ROOMS.inc(len(connections))
+            except Exception as e:
+                if _publish_log.log(logging.ERROR, 'build_error', "Error building room data for %d rooms: %s",
+                                    len(connections), e):
+                    _logger.error(traceback.format_exc())
+                # None of the rooms got their data, they count as failed in the summary
+                results['failed'] = len(connections)
+                connections = connections.browse()
+            for connection in connections:
+                client = self.mqtt_manager.get_client(connection.id)
+                if not client:
+                    continue
                 try:
-                    with self._get_new_cursor() as cr:
-                        env = api.Environment(cr, self.env.uid, {})
-                        connection = env['rasproom.connection'].browse(connection_id)
-                        
-                        if not connection.exists() or not connection.active:
-                            break
-                        
-                        # Diagnostic logging
-                        _logger.info(f"MQTT Publisher: Processing connection ID {connection_id} - {connection.name}")
-                        
-                        # Get the partner associated with this room
-                        partner = connection.partner_id
-                        current_time = fields.Datetime.now()
-                        
-                        # Debug partner info
-                        if partner:
-                            _logger.info(f"Room partner: ID={partner.id}, Name={partner.name}, is_room={getattr(partner, 'is_room', False)}")
-                        else:
-                            _logger.warning(f"No partner associated with room {connection.name}")
-                        
-                        # Basic room data
-                        room_data = {
-                            'room': connection.name,
-                            'raspberry': connection.raspName,
-                            'timestamp': fields.Datetime.to_string(current_time),
-                            'capacity': connection.capacity,
-                            'is_occupied': False  # Default value
-                        }
-                        
-                        # Fetch calendar events for this room
-                        if partner and getattr(partner, 'is_room', False):
-                            # Get current and next upcoming events
-                            CalendarEvent = env['calendar.event']
-                            
-                            # Debug access rights
-                            try:
-                                CalendarEvent.check_access('read')
-                                has_access = True
-                            except AccessError:
-                                has_access = False
-                            _logger.info(f"Calendar event read access: {has_access}")
-                            
-                            # Search for events where this room is an attendee
-                            domain = [
-                                ('partner_ids', 'in', partner.id),
-                                ('stop', '>=', fields.Datetime.now())  # Only future or current events
-                            ]
-                            
-                            # Debug: Count total events for this partner regardless of date
-                            all_events_count = CalendarEvent.search_count([('partner_ids', 'in', partner.id)])
-                            _logger.info(f"Total events for partner {partner.id}: {all_events_count}")
-                            
-                            # Order by start date and limit to next 5 events
-                            upcoming_events = CalendarEvent.search(domain, order='start', limit=5)
-                            _logger.info(f"Found {len(upcoming_events)} upcoming events for room {connection.name}")
-                            
-                            if upcoming_events:
-                                events_data = []
-                                current_event = None
-                                
-                                for event in upcoming_events:
-                                    # Format event data - use Odoo's serialization to ensure correct timezone handling
-                                    event_data = {
-                                        'name': event.name,
-                                        'start': fields.Datetime.to_string(event.start),
-                                        'stop': fields.Datetime.to_string(event.stop),
-                                        'duration': event.duration,  # in hours
-                                        'is_current': False
-                                    }
-                                    
-                                    # Get organizer information
-                                    if event.user_id:  # The user who created the event
-                                        event_data['organizer'] = event.user_id.partner_id.name
-                                    else:
-                                        event_data['organizer'] = "Unknown"
-                                    
-                                    # Check if this is the current event
-                                    if event.start <= current_time <= event.stop:
-                                        event_data['is_current'] = True
-                                        current_event = event_data
-                                        room_data['is_occupied'] = True
-                                    
-                                    events_data.append(event_data)
-                                
-                                # Add events data to room data
-                                room_data['events'] = events_data
-                                
-                                # Add current event to top level for easier access
-                                if current_event:
-                                    room_data['current_event'] = current_event
-
-                        topic = f"{connection.mqtt_topic_prefix}{connection.raspName}/data"
-                        payload = json.dumps(room_data)
-                        qos = int(connection.mqtt_qos or 0)
-
-                        result = client.publish(topic, payload, qos=qos)
-                        _logger.info("Published room data to %s", topic)
-                        _logger.debug("Payload: %s", payload)
+                    results[self._send_room_data(connection, client, payloads[connection.id])] += 1
+
+                    # Publish again exactly when the next meeting starts or ends
+                    next_change = next_changes.get(connection.id)
+                    if next_change:
+                        # One extra second so the meeting has really started or ended
+                        delay = (next_change - fields.Datetime.now()).total_seconds() + 1
+                        self.mqtt_manager.schedule_publish_in(connection.id, delay)
 
                 except Exception as e:
-                    _logger.error("Error in data publishing thread: %s", e)
-                    _logger.error(traceback.format_exc())
+                    self.mqtt_manager.forget_payload(connection.id)
+                    metrics.PUBLISHES.inc(result='failed')
+                    results['failed'] += 1
+                    if _publish_log.log(logging.ERROR, 'publish_error',
+                                        "Error publishing data for connection %s: %s", connection.id, e):
+                        _logger.error(traceback.format_exc())
+        duration = time.monotonic() - cycle_start
+        metrics.PUBLISH_CYCLE_SECONDS.observe(duration)
+        # Totals of all cycles since the last summary, so no failure is lost to the throttling
+        _publish_log.log_totals(
+            logging.INFO, 'publish_cycle',
+            "Publish cycles: cycles=%(cycles)d rooms=%(rooms)d published=%(published)d "
+            "unchanged=%(unchanged)d failed=%(failed)d duration=%(duration).3fs",
+            cycles=1, rooms=sum(results.values()), duration=duration, **results)
+
+    def _send_room_data(self, connection, client, room_data):
+        """Send room data to the display of a connection.
+
+        Depending on what the display already has, this publishes nothing but a
+        heartbeat (data unchanged, a full snapshot again if heartbeats are off), a delta against the last sent data on the /delta
+        topic (display announced delta support) or a full retained snapshot on /data.
+        Snapshots carry the first EVENTS_PAGE_SIZE events, further events are sent as
+        retained pages on /events/<page>, pages left over from a longer event list are
+        deleted. Every SNAPSHOT_INTERVAL deltas a full snapshot refreshes the retained
+        messages.
 
-                # Sleep for 30 seconds before next update
-                time.sleep(30)
-        
-        # Create the publisher thread
-        publisher_thread = threading.Thread(
-            target=publish_loop,
-            name=f"mqtt_publisher_{connection_id}"
-        )
-        publisher_thread.daemon = True  # Make thread daemon so it exits when main thread exits
-        publisher_thread.do_run = True  # Flag to control the loop
-        
-        # Start the thread
-        publisher_thread.start()
-        
-        # Update the connection in the manager to include this publisher thread
-        existing_conn = self.mqtt_manager._connections.get(connection_id, {})
-        existing_client = existing_conn.get('client', client)
-        existing_thread = existing_conn.get('thread')
-        
-        # Register with updated information
-        self.mqtt_manager.register(
-            connection_id,
-            existing_client,
-            existing_thread,
-            publisher_thread
-        )
-        
-        _logger.info(f"Started publisher thread for connection {connection_id}")
-        
-        return publisher_thread
\ No newline at end of file
+        Called by:
+            - _publish_room_data()
+
+        Returns:
+            str: 'published', 'unchanged' or 'failed'
+
+        Calls:
+            - mqtt_manager.pop_change_origin()
+            - mqtt_manager.payload_changed()
+            - mqtt_manager.last_snapshot() / store_snapshot()
+            - mqtt_manager.start_trace()
+        """
+        manager = self.mqtt_manager
+        topic_base = f"{connection.mqtt_topic_prefix}{connection.raspName}"
+        # Start of the booking-to-display latency, consumed even if nothing changed
+        origin = manager.pop_change_origin(connection.id)
+        qos = int(connection.mqtt_qos or 0)
+
+        # Compact payloads are only used once the display announced support
+        payload_format = 'json'
+        if connection.mqtt_payload_format == 'compact' and \
+                manager.display_supports(connection.id, COMPACT_CAPABILITY):
+            payload_format = 'compact'
+
+        digest = (payload_format, payload_digest(room_data))
+        changed = manager.payload_changed(connection.id, digest)
+        if not changed and connection.mqtt_heartbeat:
+            # Room data unchanged, only tell the display that Odoo is alive. The sequence
+            # number of the last publish lets the display notice a lost update
+            previous = manager.last_snapshot(connection.id)
+            topic = f"{topic_base}/heartbeat"
+            client.publish(topic, json.dumps({
+                'timestamp': room_data['timestamp'],
+                'seq': previous[0] if previous else None,
+            }), qos=0)
+            _logger.debug("Room data unchanged, published heartbeat to %s", topic)
+            metrics.PUBLISHES.inc(result='unchanged')
+            return 'unchanged'
+        # Without heartbeat unchanged room data is sent again as full snapshot, otherwise
+        # the display runs into its data timeout although Odoo is healthy
+
+        room_data['seq'] = manager.next_sequence()
+        # Send time, echoed by the display's ack for latency tracing
+        room_data['sent'] = round(time.time(), 3)
+        previous = manager.last_snapshot(connection.id)
+        if changed and previous and previous[2] < SNAPSHOT_INTERVAL and \
+                manager.display_supports(connection.id, DELTA_CAPABILITY):
+            # Only send what changed since the last publish
+            previous_seq, previous_data, deltas = previous
+            delta = diff_payloads(previous_data, room_data)
+            delta.update({'seq': room_data['seq'], 'base': previous_seq, 'sent': room_data['sent']})
+            topic = f"{topic_base}/delta"
+            payload = json.dumps(delta)
+            result = client.publish(topic, payload, qos=qos)
+            metrics.PAYLOAD_BYTES.observe(len(payload), topic='delta')
+            deltas += 1
+        else:
+            # The first page of events goes with the room data, the others are published
+            # as separate pages so no single message grows with the event limit
+            events = room_data.get('events', [])
+            pages = [events[i:i + EVENTS_PAGE_SIZE] for i in range(0, len(events), EVENTS_PAGE_SIZE)]
+            first_page = dict(room_data, pages=max(len(pages), 1))
+            if pages:
+                first_page['events'] = pages[0]
+
+            topic = f"{topic_base}/data"
+            if payload_format == 'compact':
+                payload = encode_compact(first_page)
+            else:
+                payload = json.dumps(first_page)
+            # Retained, so a (re)booting display gets the state immediately
+            result = client.publish(topic, payload, qos=qos, retain=True)
+            metrics.PAYLOAD_BYTES.observe(len(payload), topic='data')
+            for number, page_events in enumerate(pages[1:], start=2):
+                page_payload = json.dumps({
+                    'seq': room_data['seq'],
+                    'page': number,
+                    'pages': len(pages),
+                    'events': page_events,
+                })
+                client.publish(f"{topic_base}/events/{number}", page_payload, qos=qos, retain=True)
+                metrics.PAYLOAD_BYTES.observe(len(page_payload), topic='events')
+            # Delete the retained pages the previous snapshot had beyond the new page count,
+            # all possible pages if the previous snapshot is unknown (e.g. after a restart)
+            previous_pages = -(-len(previous[1].get('events', [])) // EVENTS_PAGE_SIZE) if previous \
+                else MAX_EVENT_PAGES
+            for number in range(max(len(pages), 1) + 1, previous_pages + 1):
+                client.publish(f"{topic_base}/events/{number}", b'', qos=qos, retain=True)
+            deltas = 0
+
+        if result.rc != mqtt.MQTT_ERR_SUCCESS:
+            # Not delivered, make sure the next run sends a full snapshot again
+            manager.forget_payload(connection.id)
+            metrics.PUBLISHES.inc(result='failed')
+            return 'failed'
+        manager.store_snapshot(connection.id, room_data['seq'], room_data, deltas)
+        manager.start_trace(connection.id, room_data['seq'], origin, room_data['sent'])
+        metrics.PUBLISHES.inc(result='published')
+        _logger.debug("Published room data to %s: %s", topic, payload)
+        return 'published'
+
+    def _build_room_payloads(self):
+        """Build the room data payloads of all connections in self.
+
+        The upcoming events of all rooms are fetched with a single query: a lateral
+        subquery keeps the next display_event_limit events within the horizon of
+        each room and the organizer names are joined in, so the number of queries
+        does not depend on the number of rooms or events.
+
+        The displays hang in public hallways, so the title and organizer of meetings
+        that are not public are masked in the query, like calendar.event does for
+        private meetings of other users ("Busy").
+
+        Called by:
+            - _publish_room_data()
+
+        Returns:
+            tuple: (payloads, next_changes) where payloads maps connection id -> room
+            data dictionary and next_changes maps connection id -> datetime of the next
+            meeting start or end, i.e. when the payload becomes outdated
+        """
+        current_time = fields.Datetime.now()
+        debug = _logger.isEnabledFor(logging.DEBUG)
+
+        room_partners = self.mapped('partner_id').filtered('is_room')
+        if debug:
+            self._log_publisher_diagnostics(room_partners)
+
+        events_by_partner = {}
+        if room_partners and not self._calendar_read_allowed():
+            # The events are read with SQL below, which skips the ORM. Without read access
+            # on the model no event is published at all.
+            _publish_log.log(logging.WARNING, 'calendar_access',
+                             "User %s may not read calendar events, publishing rooms without events", self.env.uid)
+        elif room_partners:
+
+            # Event limit and horizon of every room partner
+            limits, horizons = {}, {}
+            for connection in self.filtered(lambda c: c.partner_id.is_room):
+                partner_id = connection.partner_id.id
+                limits[partner_id] = max(limits.get(partner_id, 0), connection.display_event_limit or 1)
+                horizons[partner_id] = connection.display_horizon_hours and \
+                    current_time + timedelta(hours=connection.display_horizon_hours)
+            partner_ids = list(limits)
+
+            # Next current or future events per room within its horizon, ordered by
+            # start date. The lateral subquery stops after `event_limit` rows, so large
+            # horizons never materialize all future events of a room. Filtering on the
+            # stored meeting_room uses the (meeting_room, stop, start) index, so past
+            # events of the room are never read (see calendar.event init()).
+            # Events without privacy of their own use the organizer's default privacy.
+            self.env.cr.execute("""
+                SELECT room.partner_id, upcoming.id, upcoming.name, upcoming.start,
+                       upcoming.stop, upcoming.duration, upcoming.organizer
+                  FROM unnest(%(partner_ids)s::int[], %(limits)s::int[], %(horizons)s::timestamp[])
+                       AS room(partner_id, event_limit, horizon_end)
+            CROSS JOIN LATERAL (
+                        SELECT event.id, event.start, event.stop, event.duration,
+                               CASE WHEN visible.public THEN event.name ELSE %(private_name)s END AS name,
+                               CASE WHEN visible.public THEN organizer.name END AS organizer
+                          FROM calendar_event event
+                     LEFT JOIN res_users users ON users.id = event.user_id
+                     LEFT JOIN res_partner organizer ON organizer.id = users.partner_id
+                     LEFT JOIN res_users_settings settings ON settings.user_id = event.user_id
+                    CROSS JOIN LATERAL (
+                               SELECT COALESCE(event.privacy, settings.calendar_default_privacy, 'public') = 'public'
+                                      AS public
+                               ) visible
+                         WHERE event.meeting_room = room.partner_id
+                           AND event.active
+                           AND event.stop >= %(now)s
+                           AND (room.horizon_end IS NULL OR event.start < room.horizon_end)
+                      ORDER BY event.start, event.id
+                         LIMIT room.event_limit
+                       ) upcoming
+              ORDER BY room.partner_id, upcoming.start, upcoming.id
+            """, {
+                'partner_ids': partner_ids,
+                'limits': [limits[partner_id] for partner_id in partner_ids],
+                'horizons': [horizons[partner_id] or None for partner_id in partner_ids],
+                'now': current_time,
+                'private_name': PRIVATE_EVENT_NAME,
+            })
+            for partner_id, event_id, name, start, stop, duration, organizer in self.env.cr.fetchall():
+                events_by_partner.setdefault(partner_id, []).append({
+                    'id': event_id,
+                    'name': name,
+                    'start': start,
+                    'stop': stop,
+                    'duration': duration,  # in hours
+                    'organizer': organizer or "Unknown",
+                })
+
+        payloads = {}
+        next_changes = {}
+        for connection in self:
+            partner = connection.partner_id
+            if not partner:
+                _publish_log.log(logging.WARNING, ('no_partner', connection.id),
+                                 "No partner associated with room %s", connection.name)
+
+            # Basic room data
+            room_data = {
+                'room': connection.name,
+                'raspberry': connection.raspName,
+                'timestamp': fields.Datetime.to_string(current_time),
+                'capacity': connection.capacity,
+                'is_occupied': False  # Default value
+            }
+
+            upcoming_events = events_by_partner.get(partner.id, []) if partner else []
+            if debug:
+                _logger.debug("Room %s (partner %s): %d upcoming events",
+                              connection.name, partner.id, len(upcoming_events))
+
+            if upcoming_events:
+                events_data = []
+                current_event = None
+
+                for event in upcoming_events:
+                    # Format event data - use Odoo's serialization to ensure correct timezone handling
+                    event_data = {
+                        'id': event['id'],
+                        'name': event['name'],
+                        'start': fields.Datetime.to_string(event['start']),
+                        'stop': fields.Datetime.to_string(event['stop']),
+                        'duration': event['duration'],  # in hours
+                        'is_current': False,
+                        'organizer': event['organizer'],
+                    }
+
+                    # Check if this is the current event
+                    if event['start'] <= current_time <= event['stop']:
+                        event_data['is_current'] = True
+                        current_event = event_data
+                        room_data['is_occupied'] = True
+
+                    events_data.append(event_data)
+
+                # The payload becomes outdated when the next meeting starts or ends
+                next_changes[connection.id] = min(
+                    event['start'] if event['start'] > current_time else event['stop']
+                    for event in upcoming_events
+                )
+
+                # Add events data to room data
+                room_data['events'] = events_data
+
+                # Add current event to top level for easier access
+                if current_event:
+                    room_data['current_event'] = current_event
+
+            payloads[connection.id] = room_data
+
+        return payloads, next_changes
+
+    @api.model
+    @tools.ormcache()
+    def _publisher_uid(self):
+        """Returns the id of the technical user the publisher runs as.
+
+        Falls back to the superuser if the user was deleted. Cached until the
+        registry caches are cleared (e.g. on module update).
+
+        Called by:
+            - _publish_room_data()
+        """
+        user = self.env.ref('Abilium_Room_Booker.user_room_booker_publisher', raise_if_not_found=False)
+        return user.id if user else api.SUPERUSER_ID
+
+    @api.model
+    @tools.ormcache('self.env.uid')
+    def _calendar_read_allowed(self):
+        """Checks once per user whether it may read calendar events.
+
+        Only the access rights of the calendar.event model are checked. The
+        events are then read with SQL, so record rules are not applied to them;
+        names and organizers of non-public events are masked in the query of
+        _build_room_payloads() instead.
+
+        The decision is cached per uid instead of being evaluated per room and
+        publish. Odoo clears the cache whenever access rights, record rules,
+        groups or the groups of a user change.
+
+        Called by:
+            - _build_room_payloads()
+            - _log_publisher_diagnostics()
+        """
+        try:
+            self.env['calendar.event'].check_access('read')
+            return True
+        except AccessError:
+            return False
+
+    def _log_publisher_diagnostics(self, room_partners):
+        """Logs the access rights and event counts behind the room data (DEBUG only).
+
+        These queries are not needed to build the payloads, so they only run
+        when debug logging is enabled for this module.
+
+        Called by:
+            - _build_room_payloads()
+        """
+        _logger.debug("Calendar event read access of user %s: %s", self.env.uid, self._calendar_read_allowed())
+
+        if not room_partners:
+            return
+        # Count total events per room partner regardless of date
+        self.env.cr.execute("""
+            SELECT meeting_room, COUNT(*)
+              FROM calendar_event
+             WHERE meeting_room = ANY(%s)
+          GROUP BY meeting_room
+        """, [room_partners.ids])
+        all_events_counts = dict(self.env.cr.fetchall())
+        for partner in room_partners:
+            _logger.debug("Room partner %s (%s): %d events in total",
+                          partner.id, partner.name, all_events_counts.get(partner.id, 0))
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from psycopg2.pool import PoolError
+from .metrics import CURSOR_WAIT_SECONDS
+
+# Get logger instance for this module
+_logger = logging.getLogger(__name__)
+
+
+class CursorPool:
+    """
+    Bounded pool of long-lived database cursors for the MQTT background threads
+
+    MQTT callbacks, reconnect timers and publisher workers all need a cursor of their own,
+    because they run outside of any Odoo request. Opening a new cursor for each of them
+    makes a reconnect storm open and close a database connection per callback. The pool
+    keeps a small number of cursors open and hands them out one thread at a time:
+
+    - At most `size` cursors exist, further callers wait (and fail after `timeout`)
+    - A thread that already holds a cursor of the pool gets the same cursor again inside
+      a savepoint, so a nested block never deadlocks the pool; it shares the transaction
+      of the outer block and must leave committing to it
+    - Every release rolls back what was not committed, so the next user starts clean
+    - Cursors that were idle for a while are checked with a cheap query before reuse
+    """
+
+    def __init__(self, registry, size=8, timeout=10.0, check_after=30.0):
+        """
+        Initialize the pool (cursors are opened lazily on first use)
+
+        Args:
+            registry (odoo.modules.registry.Registry): Registry of the database
+            size (int): Maximum number of cursors held by the pool
+            timeout (float): Seconds to wait for a free cursor before giving up
+            check_after (float): Idle seconds after which a cursor is checked before reuse
+        """
+        self.registry = registry
+        self.size = size
+        self.timeout = timeout
+        self.check_after = check_after
+        self._idle = []                 # (cursor, released at) stack, most recent last
+        self._in_use = 0                # Number of cursors handed out to threads
+        self._closed = False            # Set by close(), released cursors are closed as well
+        self._local = threading.local() # Cursor and nesting depth of the current thread
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,             # Cursors handed out
+            'reused': 0,                # Nested checkouts served by the thread's own cursor
+            'created': 0,               # Cursors opened on the database
+            'discarded': 0,             # Cursors closed because they were broken
+            'health_check_failures': 0,
+            'exhausted': 0,             # Checkouts that had to wait for a free cursor
+            'timeouts': 0,              # Checkouts that gave up waiting
+            'wait_time_total': 0.0,     # Seconds spent waiting for a free cursor
+            'wait_time_max': 0.0,
+        }
+
+    @contextmanager
+    def cursor(self):
+        """
+        Borrow a cursor from the pool for the duration of a `with` block
+
+        Work is only persisted if the block commits it explicitly, like with a fresh
+        cursor. If the block raises, its uncommitted work is rolled back.
+
+        A block nested in another block of the same thread runs in a savepoint of the
+        outer transaction: if it raises, only its own work is rolled back. It must not
+        commit, committing is up to the outermost block.
+
+        Yields:
+            odoo.sql_db.Cursor: Cursor reserved for the current thread
+
+        Raises:
+            PoolError: If no cursor became available within the timeout
+        """
+        local = self._local
+        if getattr(local, 'depth', 0):
+            # Nested use in the same thread: share the cursor already held, in a
+            # savepoint so a failing nested block does not undo the outer one
+            local.depth += 1
+            with self._cond:
+                self._stats['reused'] += 1
+            try:
+                with local.cr.savepoint(flush=False):
+                    yield local.cr
+            finally:
+                local.depth -= 1
+            return
+
+        cr = self._acquire()
+        local.cr, local.depth = cr, 1
+        try:
+            yield cr
+        finally:
+            local.cr, local.depth = None, 0
+            self._release(cr)
+
+    def stats(self):
+        """
+        Get usage statistics of the pool
+
+        Returns:
+            dict: Counters (see __init__) plus the current 'size', 'in_use' and 'idle'
+        """
+        with self._cond:
+            return dict(self._stats, size=self.size, in_use=self._in_use, idle=len(self._idle))
+
+    def close(self):
+        """
+        Close the pool: idle cursors are closed now, cursors in use when released
+
+        A closed pool hands out no cursors anymore, MqttConnectionManager.cursor_pool()
+        creates a new pool on the next use.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for cr, _released in idle:
+            self._close(cr)
+
+    def _acquire(self):
+        """Take an idle cursor or open a new one, waiting while the pool is exhausted"""
+        with self._cond:
+            if self._closed:
+                raise PoolError("The MQTT cursor pool is closed")
+            start = time.monotonic()
+            if not self._idle and self._in_use >= self.size:
+                self._stats['exhausted'] += 1
+            while not self._idle and self._in_use >= self.size:
+                remaining = start + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    _logger.warning("MQTT cursor pool exhausted: no cursor free after %.1fs (%d in use)",
+                                    self.timeout, self._in_use)
+                    raise PoolError("The MQTT cursor pool is full")
+                self._cond.wait(remaining)
+                if self._closed:
+                    raise PoolError("The MQTT cursor pool is closed")
+            waited = time.monotonic() - start
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+            CURSOR_WAIT_SECONDS.observe(waited)
+            self._stats['checkouts'] += 1
+            self._in_use += 1
+            idle = self._idle.pop() if self._idle else None
+
+        try:
+            if idle:
+                cr, released = idle
+                if time.monotonic() - released < self.check_after or self._healthy(cr):
+                    return cr
+            return self._open()
+        except Exception:
+            # The slot reserved above is free again
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, cr):
+        """End the transaction of a cursor and put it back on the idle stack (closed if the pool is closed)"""
+        try:
+            cr.rollback()
+            broken = cr.closed
+        except Exception as e:
+            _logger.warning("Discarding broken MQTT cursor: %s", e)
+            broken = True
+        with self._cond:
+            self._in_use -= 1
+            close = broken or self._closed
+            if broken:
+                self._stats['discarded'] += 1
+            elif not self._closed:
+                self._idle.append((cr, time.monotonic()))
+            self._cond.notify()
+        if close:
+            self._close(cr)
+
+    def _open(self):
+        """Open a new cursor on the database of the registry"""
+        cr = self.registry.cursor()
+        with self._cond:
+            self._stats['created'] += 1
+        return cr
+
+    def _healthy(self, cr):
+        """Check that an idle cursor can still talk to the database, closing it if not"""
+        try:
+            cr.execute("SELECT 1")
+            cr.rollback()
+            return True
+        except Exception as e:
+            _logger.info("Idle MQTT cursor failed its health check, reopening: %s", e)
+            with self._cond:
+                self._stats['health_check_failures'] += 1
+                self._stats['discarded'] += 1
+            self._close(cr)
+            return False
+
+    @staticmethod
+    def _close(cr):
+        """Close a cursor, ignoring errors of already broken connections"""
+        try:
+            cr.close()
+        except Exception:
+            pass
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import odoo.sql_db
+
+# Get logger instance for this module
+_logger = logging.getLogger(__name__)
+
+# Key of the Postgres advisory lock held by the process hosting the MQTT clients
+# (advisory locks are per database, so one key serves all databases)
+HOST_LOCK_KEY = 0x526f6f6d  # 'Room'
+
+
+class HostLock:
+    """
+    Elects the one Odoo process hosting the MQTT clients of a database
+
+    With several Odoo processes (prefork workers, cron workers, several hosts) every
+    process would otherwise attach its own clients for the same rooms: the rooms are
+    published twice with unrelated sequence numbers and clients with an explicit client
+    id take over each other's broker session. The process holding a session-level
+    advisory lock on a connection of its own is the host; the lock is released when
+    the host releases it or its connection (or process) dies, and the next process
+    trying to attach a room takes over.
+    """
+
+    def __init__(self, db_name, key=HOST_LOCK_KEY):
+        """
+        Initialize the lock (nothing is acquired yet)
+
+        Args:
+            db_name (str): Database whose MQTT clients are hosted
+            key (int): Advisory lock key
+        """
+        self.db_name = db_name
+        self.key = key
+        self._cr = None             # Cursor whose session holds the advisory lock
+        self._lock = threading.Lock()
+
+    def held(self):
+        """
+        Check whether this process held the lock at its last acquire()
+
+        Returns:
+            bool: True if the lock is held, without checking its connection
+        """
+        with self._lock:
+            return self._cr is not None
+
+    def acquire(self):
+        """
+        Take the lock unless another process holds it
+
+        A lock held already is checked with a cheap query: if its connection was lost,
+        so was the lock, and it is taken again if no other process took it meanwhile.
+
+        Returns:
+            bool: True if this process holds the lock
+        """
+        with self._lock:
+            if self._cr is not None:
+                try:
+                    self._cr.execute("SELECT 1")
+                    self._cr.rollback()
+                    return True
+                except Exception as e:
+                    _logger.warning("Lost the MQTT host lock of %s: %s", self.db_name, e)
+                    self._close(self._cr)
+                    self._cr = None
+            cr = None
+            try:
+                cr = odoo.sql_db.db_connect(self.db_name).cursor()
+                cr.execute("SELECT pg_try_advisory_lock(%s)", [self.key])
+                acquired = cr.fetchone()[0]
+                # The session-level lock outlives the transaction
+                cr.rollback()
+            except Exception as e:
+                _logger.warning("Could not take the MQTT host lock of %s: %s", self.db_name, e)
+                acquired = False
+            if not acquired:
+                if cr is not None:
+                    self._close(cr)
+                return False
+            self._cr = cr
+            return True
+
+    def release(self):
+        """Release the lock, so another process can host the MQTT clients"""
+        with self._lock:
+            cr, self._cr = self._cr, None
+        if cr is None:
+            return
+        try:
+            # Closing only gives the connection back to Odoo's pool, which keeps its session
+            cr.execute("SELECT pg_advisory_unlock(%s)", [self.key])
+            cr.rollback()
+        except Exception as e:
+            _logger.info("Could not release the MQTT host lock of %s: %s", self.db_name, e)
+        self._close(cr)
+
+    @staticmethod
+    def _close(cr):
+        """Close a cursor, ignoring errors of already broken connections"""
+        try:
+            cr.close()
+        except Exception:
+            pass
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+
+class LogThrottle:
+    """
+    Rate limited logging for hot paths such as the publisher
+
+    Each message key is logged at most once per interval; the occurrences in
+    between are only counted and reported with the next emitted message, e.g.
+    "Publish cycle: rooms=120 published=3 ... (59 similar suppressed)". This keeps
+    the log volume constant however many rooms publish and however often.
+    """
+
+    def __init__(self, logger, interval=60.0):
+        """
+        Initialize the throttle
+
+        Args:
+            logger (logging.Logger): Logger the messages are emitted to
+            interval (float): Minimum seconds between two messages with the same key
+        """
+        self.logger = logger
+        self.interval = interval
+        self._last = {}         # key -> monotonic time of the last emitted message
+        self._suppressed = {}   # key -> occurrences since the last emitted message
+        self._totals = {}       # key -> counters added up since the last emitted message
+        self._lock = threading.Lock()
+
+    def log(self, level, key, msg, *args):
+        """
+        Log a message unless a message with the same key was logged recently
+
+        Args:
+            level (int): Logging level, e.g. logging.INFO
+            key (hashable): Identifies similar messages, e.g. 'publish_cycle'
+            msg (str): %-style format string
+            *args: Arguments of the format string
+
+        Returns:
+            bool: True if the message was emitted
+        """
+        if not self.logger.isEnabledFor(level):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            msg += " (%d similar suppressed)"
+            args += (suppressed,)
+        self.logger.log(level, msg, *args)
+        return True
+
+    def log_totals(self, level, key, msg, **counts):
+        """
+        Add up counters and log their totals at most once per interval
+
+        Unlike log(), the values of the suppressed calls are not lost: the emitted
+        message reports the sums of all calls since the previous message.
+
+        Args:
+            level (int): Logging level, e.g. logging.INFO
+            key (hashable): Identifies the counters, e.g. 'publish_cycle'
+            msg (str): Format string with named %-style placeholders, e.g. '%(failed)d'
+            **counts: Values to add to the totals, e.g. failed=2
+
+        Returns:
+            bool: True if the message was emitted
+        """
+        if not self.logger.isEnabledFor(level):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            totals = self._totals.setdefault(key, {})
+            for name, value in counts.items():
+                totals[name] = totals.get(name, 0) + value
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                return False
+            self._last[key] = now
+            totals = self._totals.pop(key)
+        self.logger.log(level, msg, totals)
+        return True
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+import bisect
+import threading
+
+# Default histogram buckets in seconds, from a fast query up to a slow publish cycle
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Histogram buckets of payload sizes in bytes
+BYTE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+
+
+class MetricsRegistry:
+    """
+    Process-wide registry of counters and histograms in the Prometheus text format
+
+    Metrics live in the memory of the Odoo process like the MQTT manager they
+    describe. They are served by the process hosting the MQTT clients, which does
+    the publishing (see metrics_server.MetricsServer).
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labels=()):
+        """
+        Get or create a counter
+
+        Args:
+            name (str): Metric name, e.g. 'room_booker_publish_failures_total'
+            documentation (str): Help text of the metric
+            labels (tuple): Names of the labels of the metric
+
+        Returns:
+            Counter: The counter registered under the name
+        """
+        return self._register(Counter, name, documentation, labels)
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        """
+        Get or create a histogram
+
+        Args:
+            name (str): Metric name, e.g. 'room_booker_publish_cycle_seconds'
+            documentation (str): Help text of the metric
+            labels (tuple): Names of the labels of the metric
+            buckets (tuple): Increasing upper bounds of the buckets (+Inf is added)
+
+        Returns:
+            Histogram: The histogram registered under the name
+        """
+        return self._register(Histogram, name, documentation, labels, buckets)
+
+    def _register(self, cls, name, *args):
+        """Return the metric registered under a name, creating it on first use"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args)
+            return self._metrics[name]
+
+    def render(self):
+        """
+        Render all metrics in the Prometheus text exposition format
+
+        Returns:
+            list: Lines of the exposition (without trailing newlines)
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return lines
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the counter
+
+        Args:
+            amount (float): Amount to add
+            **labels: Value of each label of the metric
+        """
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        """Render the counter in the text exposition format"""
+        lines = header(self)
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{format_labels(self.labels, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets, optionally split by label values"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record an observed value
+
+        Args:
+            value (float): Observed value, e.g. a duration in seconds
+            **labels: Value of each label of the metric
+        """
+        key = tuple(str(labels[label]) for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0] * (len(self.buckets) + 2)
+            values[index] += 1
+            values[-1] += value
+
+    def render(self):
+        """Render the histogram in the text exposition format"""
+        lines = header(self)
+        with self._lock:
+            values = sorted((key, list(counts)) for key, counts in self._values.items())
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = bound if bound == '+Inf' else format_value(bound)
+                lines.append(f"{self.name}_bucket{format_labels(self.labels + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def header(metric):
+    """HELP and TYPE lines of a metric"""
+    return [
+        f"# HELP {metric.name} {metric.documentation}",
+        f"# TYPE {metric.name} {metric.kind}",
+    ]
+
+
+def gauge(name, documentation, values):
+    """
+    Render a gauge sampled at scrape time (e.g. from MqttConnectionManager.worker_stats())
+
+    Args:
+        name (str): Metric name
+        documentation (str): Help text of the metric
+        values (dict or number): Value, or mapping of a (label name, label value) tuple to a value
+
+    Returns:
+        list: Lines of the gauge in the text exposition format
+    """
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    if not isinstance(values, dict):
+        values = {None: values}
+    for label, value in sorted(values.items(), key=lambda item: str(item[0])):
+        labels = format_labels((label[0],), (label[1],)) if label else ''
+        lines.append(f"{name}{labels} {format_value(value)}")
+    return lines
+
+
+def manager_gauges(stats, pools):
+    """
+    Render the gauges sampled from the MQTT connection manager and its cursor pools
+
+    Args:
+        stats (dict): See MqttConnectionManager.worker_stats()
+        pools (dict): See MqttConnectionManager.cursor_pool_stats()
+
+    Returns:
+        list: Lines of the gauges in the text exposition format
+    """
+    scheduler = stats['scheduler']
+    lines = []
+    lines += gauge('room_booker_rooms', 'Rooms attached to an MQTT client', stats['rooms'])
+    lines += gauge('room_booker_mqtt_clients', 'Shared MQTT clients by connection state',
+                   {('state', state): count for state, count in stats['states'].items()})
+    lines += gauge('room_booker_threads', 'Live threads of the Odoo process', stats['threads'])
+    lines += gauge('room_booker_engine_clients', 'MQTT clients served per engine',
+                   {('engine', name): engine['clients'] for name, engine in stats['engines'].items()})
+    lines += gauge('room_booker_scheduler_workers', 'Live publisher worker threads', scheduler['workers'])
+    lines += gauge('room_booker_scheduler_jobs', 'Jobs of the publish scheduler', scheduler['scheduled'])
+    lines += gauge('room_booker_scheduler_inflight', 'Jobs being processed by the publisher workers',
+                   scheduler['inflight'])
+    lines += gauge('room_booker_inbound_queued', 'Messages from the displays waiting to be processed',
+                   stats['inbound'])
+    for name, key, documentation in (
+            ('room_booker_cursor_pool_in_use', 'in_use', 'Cursors of the MQTT cursor pool handed out'),
+            ('room_booker_cursor_pool_idle', 'idle', 'Idle cursors of the MQTT cursor pool'),
+            ('room_booker_cursor_pool_timeouts', 'timeouts', 'Cursor checkouts that gave up waiting (total)'),
+            ('room_booker_cursor_pool_discarded', 'discarded', 'Broken cursors closed by the pool (total)')):
+        lines += gauge(name, documentation, {('db', db_name): pool[key] for db_name, pool in pools.items()})
+    return lines
+
+
+def format_labels(names, values):
+    """Format label names and values as {name="value",...}"""
+    if not names:
+        return ''
+    pairs = ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def format_value(value):
+    """Format a sample value, integers without a decimal point"""
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# Registry of the addon, rendered by the metrics server of the MQTT host process
+REGISTRY = MetricsRegistry()
+
+PUBLISH_CYCLE_SECONDS = REGISTRY.histogram(
+    'room_booker_publish_cycle_seconds',
+    'Duration of a publish cycle (one batch of rooms published by a scheduler worker)')
+PAYLOAD_BUILD_SECONDS = REGISTRY.histogram(
+    'room_booker_payload_build_seconds',
+    'Duration of the room data queries of a publish cycle (divide by room_booker_payload_rooms_total for the time per room)')
+PAYLOAD_ROOMS = REGISTRY.counter(
+    'room_booker_payload_rooms_total',
+    'Rooms whose room data was built')
+PAYLOAD_BYTES = REGISTRY.histogram(
+    'room_booker_payload_bytes',
+    'Size of the published room data messages', ('topic',), BYTE_BUCKETS)
+PUBLISHES = REGISTRY.counter(
+    'room_booker_publishes_total',
+    'Room data publishes by result (published, unchanged, failed)', ('result',))
+RECONNECTS = REGISTRY.counter(
+    'room_booker_reconnects_total',
+    'Connection attempts of shared MQTT clients by result', ('result',))
+CURSOR_WAIT_SECONDS = REGISTRY.histogram(
+    'room_booker_cursor_wait_seconds',
+    'Time spent waiting for a cursor of the MQTT cursor pool')
+INBOUND_MESSAGES = REGISTRY.counter(
+    'room_booker_inbound_messages_total',
+    'Messages received from the displays by subtopic', ('kind',))
+INBOUND_DROPPED = REGISTRY.counter(
+    'room_booker_inbound_dropped_total',
+    'Messages from the displays dropped because the inbound queue was full')
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import hmac
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Get logger instance for this module
+_logger = logging.getLogger(__name__)
+
+
+class MetricsServer:
+    """
+    Prometheus scrape endpoint served by the process hosting the MQTT clients
+
+    The metrics live in the memory of the process publishing the rooms (see
+    MqttConnectionManager.acquire_host()). An Odoo HTTP route would be answered by
+    whichever worker gets the request, which in prefork mode usually holds no MQTT
+    client, and its counters would jump between workers. The host therefore serves
+    them on a port of its own with a small HTTP server thread.
+    """
+
+    def __init__(self, port, token, render, address=''):
+        """
+        Initialize the server (the thread is started by start())
+
+        Args:
+            port (int): TCP port to listen on
+            token (str): Bearer token the scraper must send
+            render (callable): Returns the lines of the exposition
+            address (str): Address to bind, '' for all interfaces
+        """
+        self.port = port
+        self.token = token
+        self.render = render
+        self.address = address
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """
+        Bind the port and start serving
+
+        Returns:
+            bool: True if the server is listening, False if the port could not be bound
+        """
+        try:
+            self._server = ThreadingHTTPServer((self.address, self.port), _MetricsHandler)
+        except OSError as e:
+            _logger.warning("Could not serve the metrics on port %s: %s", self.port, e)
+            return False
+        self._server.daemon_threads = True
+        self._server.metrics = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name='room_booker_metrics')
+        self._thread.daemon = True  # Exit together with the Odoo process
+        self._thread.start()
+        _logger.info("Serving the room booker metrics on port %s", self.port)
+        return True
+
+    def stop(self):
+        """Stop serving and release the port"""
+        server, self._server = self._server, None
+        if server:
+            server.shutdown()
+            server.server_close()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Answers GET /metrics with the exposition of the server's render callable"""
+
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        auth = self.headers.get('Authorization', '')
+        given = auth[7:] if auth.startswith('Bearer ') else ''
+        if not hmac.compare_digest(given.encode(), metrics.token.encode()):
+            _logger.warning("Rejected metrics scrape from %s", self.client_address[0])
+            self.send_error(403)
+            return
+        try:
+            body = ('\n'.join(metrics.render()) + '\n').encode()
+        except Exception as e:
+            _logger.error("Failed to render the metrics: %s", e)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Log the requests at DEBUG instead of writing them to stderr"""
+        _logger.debug("Metrics scrape from %s: " + format, self.client_address[0], *args)
@@ -1,13 +1,72 @@
 # -*- coding: utf-8 -*-
+import collections
+import itertools
+from functools import partial
+import queue
+import random
 import threading
 import time
 import ssl
 import logging
 import paho.mqtt.client as mqtt
+from .change_listener import ChangeListener
+from .cursor_pool import CursorPool
+from .host_lock import HostLock
+from . import metrics
+from .metrics import RECONNECTS
+from .metrics_server import MetricsServer
+from .mqtt_engine import ENGINES, ThreadEngine
+from .publish_scheduler import PublishScheduler
 
 # Get logger instance for this module
 _logger = logging.getLogger(__name__)
 
+# Postgres notification channel announcing committed room changes to all Odoo processes
+CHANGE_CHANNEL = 'room_booker_changes'
+
+# Seconds between two checks of the MQTT clients by the host process, see acquire_host()
+HOST_MONITOR_INTERVAL = 300.0
+
+# Scheduler key of the one-shot job writing the buffered connection states
+STATE_FLUSH_KEY = 'connection_states'
+
+# Scheduler key of the one-shot job processing the queued inbound messages
+INBOUND_KEY = 'inbound_messages'
+# Inbound messages kept until processed, further messages are dropped
+INBOUND_QUEUE_SIZE = 10000
+# Maximum number of inbound messages processed in one transaction
+INBOUND_BATCH_SIZE = 1000
+
+# Seconds without a /status or /ping message after which a display counts as offline
+# (the displays ping every keep-alive / 2 seconds, at least every 10 seconds)
+LIVENESS_TIMEOUT = 180.0
+# Weight of a new sample in the smoothed ping delay (like TCP's smoothed RTT)
+LATENCY_SMOOTHING = 0.125
+
+# Publishes per room awaiting the display's acknowledgement (older ones are dropped unacked)
+LATENCY_PENDING_TRACES = 32
+# Acknowledged publishes per room kept for the latency percentiles
+LATENCY_SAMPLES = 200
+
+# Reconnect backoff of lost clients: the delay doubles per failed attempt between the
+# minimum and maximum and is randomized ("equal jitter"), so clients losing their
+# broker at the same moment do not reconnect in lockstep
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 120.0
+# A connection that lasted this many seconds resets the backoff when it is lost
+RECONNECT_STABLE_AFTER = 60.0
+# After this many failed attempts in a row a client is reported as 'failed' (it keeps
+# retrying at the maximum delay)
+RECONNECT_FAILED_AFTER = 8
+# Largest exponent of the backoff doubling; 2 ** 16 seconds is far beyond the maximum
+# delay already and keeps the float conversion from overflowing in long outages
+RECONNECT_MAX_EXPONENT = 16
+# Seconds a client may stay 'connecting' before the monitor considers the session stale
+CONNECT_TIMEOUT = 60.0
+# Connections established at the same time (blocking DNS, TCP and TLS handshake in
+# the scheduler workers, which also publish the room data)
+MAX_CONCURRENT_RECONNECTS = 2
+
 
 class MqttConnectionManager:
     """
@@ -37,34 +96,969 @@ class MqttConnectionManager:
         """
         Initialize the connection manager instance
 
-        Sets up the connections dictionary and thread lock for safe concurrent access
+        Sets up the connections dictionary, thread lock for safe concurrent access
+        and the shared scheduler that publishes the data of all rooms
         """
-        self._connections = {}
+        self._connections = {}      # connection_id -> shared client and its key
+        self._clients = {}          # client key (broker settings) -> shared client and its rooms
+        self._engines = {}          # engine name -> engine serving the network I/O of clients
+        self._reconnecting = set()  # client keys with a scheduled or running connection attempt
+        self._reconnect_slots = threading.BoundedSemaphore(MAX_CONCURRENT_RECONNECTS)
+        self._inbound = queue.Queue(maxsize=INBOUND_QUEUE_SIZE)  # (connection_id, kind, payload, time, retained)
+        self._inbound_dropped = 0   # Inbound messages dropped since the last drain
         self._lock = threading.RLock()
+        self._scheduler = PublishScheduler(name='mqtt_publisher')
+        self._payload_digests = {}  # connection_id -> digest of the last published payload
+        self._capabilities = {}     # connection_id -> set of payload formats the display decodes
+        self._snapshots = {}        # connection_id -> (seq, room data) last sent to the display
+        # Monotonic sequence number of published payloads. Seeded with the current time in
+        # nanoseconds, so it keeps increasing across restarts and a stale retained message
+        # never carries the sequence number of a new snapshot
+        self._sequence = itertools.count(time.time_ns())
+        self._cursor_pools = {}     # database name -> CursorPool of the MQTT background threads
+        self._listeners = {}        # database name -> ChangeListener of the room changes of other processes
+        self._pending_states = {}   # connection_id -> {'vals': state values, 'transitions': count}
+        self._liveness = {}         # connection_id -> {'online', 'last_seen', 'latency'} of the display
+        self._change_origins = {}   # connection_id -> time of the oldest unpublished booking change
+        self._traces = {}           # connection_id -> OrderedDict seq -> (origin, sent) awaiting an ack
+        self._latency_samples = {}  # connection_id -> deque of acknowledged publish timings
+        self._publishers = {}       # database name -> (registry, publisher callback shared by its rooms)
+        self._hosts = {}            # database name -> {'lock': HostLock, 'sync': callback of sync requests}
+        self._pending_syncs = {}    # database name -> connection ids to sync, None for all rooms
+        self._metrics_server = None # MetricsServer of the host process, see serve_metrics()
 
-    def register(self, connection_id, client, thread=None, publisher_thread=None):
+    def attach_room(self, connection_id, client_key, topic, qos, client_factory, engine='thread'):
         """
-        Register a new MQTT connection with the manager
+        Attach a room to the shared MQTT client of its broker settings
+
+        Rooms with the same broker, port, credentials, TLS setting, keep-alive and client id
+        share one client, i.e. one socket, one TLS session and one network thread. The
+        client is created with `client_factory` when the first room of a broker attaches.
 
         Args:
-             connection_id (str): Unique identifier for this connection
-             client (mqtt.Client): The MQTT client instance
-             thread (threading.Thread, optional): Main connection thread
-             publisher_thread (threading.Thread, optional): Publisher thread for outgoing messages
-                """
+             connection_id (int): Unique identifier of the room connection
+             client_key (tuple): Broker settings identifying the shared client
+             topic (str): Subscription topic of the room, e.g. 'test/room/reception/#'
+             qos (int): Subscription QoS of the room
+             client_factory (callable): Creates a new client for `client_key`, prepared with
+                connect_async()
+             engine (str): Engine connecting and serving a newly created client, see ENGINES
+
+        Returns:
+            tuple: (mqtt.Client, bool) the shared client and whether it was just created
+        """
         with self._lock:
+            shared = self._clients.get(client_key)
+            created = shared is None
+            if created:
+                client = client_factory()
+                shared = self._clients[client_key] = {
+                    'client': client,
+                    'engine': self._get_engine(engine),
+                    'rooms': {},            # connection_id -> (topic, qos)
+                    'attempts': 0,          # Failed connection attempts, drives the backoff
+                    'state': None,          # connecting, connected, backoff or failed
+                    'state_since': None,    # Time of the last state change
+                    'retry_at': None,       # Time of the next scheduled connection attempt
+                    'timestamp': time.time(),
+                }
+                shared['engine'].start(client)
+                # First connection attempt right away
+                self._schedule_reconnect(client_key, 0)
+            shared['rooms'][connection_id] = (topic, qos)
             # Store connection details with timestamp for tracking
             self._connections[connection_id] = {
-                'client': client,
-                'thread': thread,
-                'publisher_thread': publisher_thread,
+                'client': shared['client'],
+                'client_key': client_key,
                 'timestamp': time.time() # Track when connection was registered
             }
+            return shared['client'], created
+
+    def _get_engine(self, name):
+        """
+        Get the engine of the given name, creating it on first use (caller must hold the lock)
+
+        Args:
+            name (str): Engine name, unknown names fall back to the thread engine
+
+        Returns:
+            ThreadEngine or AsyncioEngine: Engine instance shared by all clients using it
+        """
+        if name not in ENGINES:
+            _logger.warning("Unknown MQTT engine %r, using %r", name, ThreadEngine.name)
+            name = ThreadEngine.name
+        engine = self._engines.get(name)
+        if engine is None:
+            engine = self._engines[name] = ENGINES[name]()
+        return engine
+
+    def client_connected(self, client_key, client):
+        """
+        Record that a shared client was accepted by its broker
+
+        Args:
+            client_key (tuple): Broker settings identifying the shared client
+            client (mqtt.Client): Client that connected
+        """
+        with self._lock:
+            shared = self._clients.get(client_key)
+            if shared and shared['client'] is client:
+                self._set_state(shared, 'connected')
+
+    def client_lost(self, client_key, client):
+        """
+        Schedule the reconnection of a shared client after an unexpected disconnection
+
+        Args:
+            client_key (tuple): Broker settings identifying the shared client
+            client (mqtt.Client): Client that lost its connection
+        """
+        with self._lock:
+            shared = self._clients.get(client_key)
+            if not shared or shared['client'] is not client:
+                return
+            if shared['state'] == 'connected' and time.time() - shared['state_since'] >= RECONNECT_STABLE_AFTER:
+                shared['attempts'] = 0
+            self._schedule_reconnect(client_key, self._backoff(shared))
+
+    def request_reconnect(self, connection_id):
+        """
+        Reconnect the shared client of a room unless it is connected or already reconnecting
+
+        Args:
+            connection_id (int): Unique identifier of the room connection
+
+        Returns:
+            bool: True if a connection attempt was scheduled
+        """
+        with self._lock:
+            conn = self._connections.get(connection_id)
+            shared = conn and self._clients.get(conn['client_key'])
+            if not shared or conn['client_key'] in self._reconnecting or shared['client'].is_connected():
+                return False
+            return self._schedule_reconnect(conn['client_key'], self._backoff(shared))
+
+    def _backoff(self, shared):
+        """
+        Compute the delay of the next connection attempt of a shared client (caller must hold the lock)
+
+        Returns:
+            float: Seconds until the next attempt
+        """
+        delay = min(RECONNECT_MAX_DELAY, RECONNECT_MIN_DELAY * 2 ** min(shared['attempts'], RECONNECT_MAX_EXPONENT))
+        shared['attempts'] += 1
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _schedule_reconnect(self, client_key, delay):
+        """
+        Schedule a connection attempt of a shared client (caller must hold the lock)
+
+        Attempts are deduplicated: while one is scheduled or running for the client,
+        further requests (lost connection, cron monitor) are ignored.
+
+        Returns:
+            bool: True if the attempt was scheduled, False if one is already pending
+        """
+        if client_key in self._reconnecting:
+            return False
+        shared = self._clients[client_key]
+        if not delay:
+            self._set_state(shared, 'connecting')
+        else:
+            self._set_state(shared, 'failed' if shared['attempts'] >= RECONNECT_FAILED_AFTER else 'backoff')
+        shared['retry_at'] = time.time() + delay
+        self._reconnecting.add(client_key)
+        self._scheduler.schedule(('reconnect', client_key), self._reconnect_clients, None, delay=delay)
+        return True
+
+    def _reconnect_clients(self, keys):
+        """
+        Connect the shared clients of due reconnect jobs (runs in a scheduler worker)
+
+        Args:
+            keys (list): Scheduler keys ('reconnect', client key)
+        """
+        for _job, client_key in keys:
+            with self._lock:
+                shared = self._clients.get(client_key)
+                if not shared:
+                    self._reconnecting.discard(client_key)
+                    continue
+                if not self._reconnect_slots.acquire(blocking=False):
+                    # Enough connections are being established already, retry shortly
+                    self._reconnecting.discard(client_key)
+                    self._schedule_reconnect(client_key, random.uniform(0.5, 2.0))
+                    continue
+                self._set_state(shared, 'connecting')
+
+            client, engine = shared['client'], shared['engine']
+            try:
+                engine.reconnect(client)
+                connected = True
+            except Exception as e:
+                _logger.info("Connecting MQTT client %s failed: %s", client_key[:2], e)
+                connected = False
+            finally:
+                self._reconnect_slots.release()
+            RECONNECTS.inc(result='success' if connected else 'failure')
+
+            with self._lock:
+                self._reconnecting.discard(client_key)
+                stale = self._clients.get(client_key) is not shared
+                if not stale and not connected:
+                    self._schedule_reconnect(client_key, self._backoff(shared))
+            if stale:
+                # The last room detached while connecting
+                engine.stop(client)
+
+    @staticmethod
+    def _set_state(shared, state):
+        """Move a shared client to a new state of its connection state machine (caller must hold the lock)"""
+        if shared['state'] != state:
+            shared['state'] = state
+            shared['state_since'] = time.time()
+
+    def connection_state(self, connection_id):
+        """
+        Get the state of the shared client of a room
+
+        Args:
+            connection_id (int): Unique identifier of the room connection
+
+        Returns:
+            dict or None: 'state' (connecting, connected, backoff or failed), 'since' (time of
+            the last state change), 'attempts' (failed attempts in a row) and 'retry_at'
+            (time of the next attempt), None if the room is not attached
+        """
+        with self._lock:
+            conn = self._connections.get(connection_id)
+            shared = conn and self._clients.get(conn['client_key'])
+            if not shared:
+                return None
+            return {
+                'state': shared['state'],
+                'since': shared['state_since'],
+                'attempts': shared['attempts'],
+                'retry_at': shared['retry_at'],
+            }
+
+    def check_connections(self, connection_ids):
+        """
+        Check the sessions of all shared clients and recover stale ones
+
+        Sessions that are healthy or have a connection attempt on its way are left alone.
+        Stale sessions get a new connection attempt:
+            - 'connected' clients whose connection is gone without a disconnect callback
+            - 'connecting' clients without CONNACK for longer than CONNECT_TIMEOUT
+            - 'backoff'/'failed' clients whose next attempt is overdue
+
+        Args:
+            connection_ids (iterable): Rooms that should be connected
+
+        Returns:
+            list: Rooms without a client, which have to be attached (again)
+        """
+        now = time.time()
+        with self._lock:
+            missing = [connection_id for connection_id in connection_ids
+                       if connection_id not in self._connections]
+            for client_key, shared in self._clients.items():
+                state = shared['state']
+                if client_key in self._reconnecting:
+                    overdue = shared['retry_at'] and now - shared['retry_at'] > CONNECT_TIMEOUT
+                    if state in ('backoff', 'failed') and overdue:
+                        # The scheduled attempt never ran, schedule it again
+                        self._reconnecting.discard(client_key)
+                    else:
+                        continue
+                elif state == 'connected' and shared['client'].is_connected():
+                    continue
+                elif state == 'connecting' and now - shared['state_since'] <= CONNECT_TIMEOUT:
+                    continue
+                _logger.info("Stale MQTT session %s (%s since %s), reconnecting",
+                             client_key[:2], state, time.ctime(shared['state_since']))
+                self._schedule_reconnect(client_key, self._backoff(shared))
+        return missing
+
+    def client_rooms(self, client_key, client):
+        """
+        Get the rooms multiplexed over a shared client
+
+        Args:
+            client_key (tuple): Broker settings identifying the shared client
+            client (mqtt.Client): Client calling back, callbacks of replaced clients get no rooms
+
+        Returns:
+            dict: Mapping of connection_id -> (topic, qos) of the attached rooms
+        """
+        with self._lock:
+            shared = self._clients.get(client_key)
+            if not shared or shared['client'] is not client:
+                return {}
+            return dict(shared['rooms'])
+
+    def route_topic(self, client_key, topic):
+        """
+        Find the room an inbound message of a shared client belongs to
+
+        Args:
+            client_key (tuple): Broker settings identifying the shared client
+            topic (str): Topic of the message, e.g. 'test/room/reception/status'
+
+        Returns:
+            tuple: (connection_id, subtopic) e.g. (7, 'status'), (None, None) if no
+            room is subscribed to the topic
+        """
+        with self._lock:
+            shared = self._clients.get(client_key)
+            if not shared:
+                return None, None
+            bases = {room_topic[:-1]: connection_id  # Strip the '#' wildcard
+                     for connection_id, (room_topic, _qos) in shared['rooms'].items()}
+        parts = topic.split('/')
+        # The most specific subscription wins
+        for i in range(len(parts) - 1, 0, -1):
+            connection_id = bases.get('/'.join(parts[:i]) + '/')
+            if connection_id:
+                return connection_id, '/'.join(parts[i:])
+        return None, None
+
+    def enqueue_inbound(self, connection_id, kind, payload, retained, process_callback, delay):
+        """
+        Queue an inbound message for batched processing
+
+        Called from the network threads, so it never blocks: when the queue is full
+        the message is dropped and counted. The first queued message schedules a
+        one-shot job processing the queue in `delay` seconds.
+
+        Args:
+            connection_id (int): Room the message belongs to
+            kind (str): First level of the subtopic, e.g. 'status' or 'ping'
+            payload (bytes): Raw message payload
+            retained (bool): True for a retained message the broker delivered on subscribe
+            process_callback (callable): Called with a list of keys to process the queue
+            delay (float): Seconds messages are collected before they are processed
+        """
+        try:
+            self._inbound.put_nowait((connection_id, kind, payload, time.time(), retained))
+        except queue.Full:
+            with self._lock:
+                self._inbound_dropped += 1
+            return
+        if not self._scheduler.is_scheduled(INBOUND_KEY):
+            self._scheduler.schedule(INBOUND_KEY, process_callback, None, delay=delay)
+
+    def drain_inbound(self, process_callback):
+        """
+        Take the next batch of queued inbound messages
+
+        If more messages are waiting than fit in a batch, the next batch is
+        scheduled right away.
+
+        Args:
+            process_callback (callable): Job processing the queue, for the next batch
+
+        Returns:
+            tuple: (list of (connection_id, kind, payload, time, retained), number of messages
+            dropped because the queue was full since the last drain)
+        """
+        messages = []
+        try:
+            while len(messages) < INBOUND_BATCH_SIZE:
+                messages.append(self._inbound.get_nowait())
+        except queue.Empty:
+            pass
+        else:
+            self._scheduler.schedule(INBOUND_KEY, process_callback, None)
+        with self._lock:
+            dropped, self._inbound_dropped = self._inbound_dropped, 0
+        return messages, dropped
+
+    def cursor_pool(self, registry):
+        """
+        Get the background cursor pool of a database, creating it on first use
+
+        Args:
+            registry (odoo.modules.registry.Registry): Registry of the database
+
+        Returns:
+            CursorPool: Pool shared by all MQTT callbacks and publishers of the database
+        """
+        with self._lock:
+            pool = self._cursor_pools.get(registry.db_name)
+            if pool is None:
+                pool = self._cursor_pools[registry.db_name] = CursorPool(registry)
+            return pool
+
+    def cursor_pool_stats(self):
+        """
+        Get the usage statistics of all background cursor pools
+
+        Returns:
+            dict: Mapping of database name -> statistics (see CursorPool.stats())
+        """
+        with self._lock:
+            pools = dict(self._cursor_pools)
+        return {db_name: pool.stats() for db_name, pool in pools.items()}
+
+    def buffer_connection_state(self, connection_id, vals, flush_callback, delay):
+        """
+        Buffer a connection state change until the next batched flush
+
+        Changes of the same connection are merged, so a connection that flaps several
+        times between two flushes is only written once, with its latest state. The
+        first buffered change schedules a one-shot flush in `delay` seconds.
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            vals (dict): State values to write, e.g. {'mqtt_connection_state': 'error'}
+            flush_callback (callable): Called with a list of keys to write the buffered states
+            delay (float): Seconds until the buffered states are flushed
+        """
+        with self._lock:
+            pending = self._pending_states.setdefault(connection_id, {'vals': {}, 'transitions': 0})
+            pending['vals'].update(vals)
+            pending['transitions'] += 1
+        if not self._scheduler.is_scheduled(STATE_FLUSH_KEY):
+            self._scheduler.schedule(STATE_FLUSH_KEY, flush_callback, None, delay=delay)
+
+    def pop_connection_states(self):
+        """
+        Take all buffered connection state changes
+
+        Returns:
+            dict: Mapping of connection_id -> {'vals': state values, 'transitions': count}
+        """
+        with self._lock:
+            pending, self._pending_states = self._pending_states, {}
+            return pending
+
+    def discard_connection_state(self, connection_id):
+        """
+        Drop the buffered state changes of a connection (e.g. when it is written directly)
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+        """
+        with self._lock:
+            self._pending_states.pop(connection_id, None)
+
+    def publisher_callback(self, registry, callback):
+        """
+        Return the publisher callback shared by all rooms of a database
+
+        The scheduler batches the due rooms per callback. Bound methods are only equal
+        when bound to the very same object, so a new bound method per room would put
+        every room in a batch of its own. The first callback of a registry is kept and
+        replaced once the registry is reloaded (e.g. after a module update).
+
+        Args:
+            registry (odoo.modules.registry.Registry): Registry of the database
+            callback (callable): Callback stored if the registry has none yet
+
+        Returns:
+            callable: Callback to pass to schedule_publisher()
+        """
+        with self._lock:
+            stored = self._publishers.get(registry.db_name)
+            if not stored or stored[0] is not registry:
+                stored = self._publishers[registry.db_name] = (registry, callback)
+            return stored[1]
+
+    def schedule_publisher(self, connection_id, callback, interval):
+        """
+        Add a connection to the shared publisher schedule
+
+        All rooms are published by the same scheduler thread and worker pool, so
+        adding rooms does not add threads or database cursors. The first periodic
+        publish happens after one interval, earlier publishes are requested through
+        trigger_publish() (e.g. once the client is connected).
+
+        Args:
+            connection_id (int): Unique identifier of the connection to publish
+            callback (callable): Called with a list of due connection ids, the same
+                object for all rooms (see publisher_callback())
+            interval (float): Seconds between two publishes of this connection
+        """
+        self._scheduler.schedule(connection_id, callback, interval, delay=interval)
+
+    def trigger_publish(self, connection_ids, origin=None):
+        """
+        Publish the data of the given connections as soon as possible
+
+        Args:
+            connection_ids (iterable): Connections whose room data changed
+            origin (float): Epoch seconds of the booking change causing the publish,
+                the start of its booking-to-display latency (see pop_change_origin())
+        """
+        if origin is not None:
+            with self._lock:
+                for connection_id in connection_ids:
+                    previous = self._change_origins.get(connection_id)
+                    if previous is None or origin < previous:
+                        self._change_origins[connection_id] = origin
+        self._scheduler.trigger(connection_ids)
+
+    def acquire_host(self, db_name, sync_callback, monitor_callback):
+        """
+        Make this process the host of the MQTT clients of a database, unless another process is
+
+        Only the host attaches rooms to MQTT clients (see HostLock). A process becoming
+        the host listens to the room changes and sync requests of the other processes
+        and checks its clients every HOST_MONITOR_INTERVAL seconds, so the clients are
+        monitored even if the host is not the process running the cron jobs.
+
+        Args:
+            db_name (str): Name of the database
+            sync_callback (callable): Called with the connection ids (None for all rooms)
+                other processes asked to connect or disconnect, see request_sync()
+            monitor_callback (callable): Called with a list of scheduler keys to check the clients
+
+        Returns:
+            bool: True if this process is the host
+        """
+        with self._lock:
+            host = self._hosts.setdefault(db_name, {'lock': HostLock(db_name), 'sync': None})
+        lock = host['lock']
+        held = lock.held()
+        # Outside of the manager lock, this talks to the database
+        if not lock.acquire():
+            if held:
+                # The lock went with its connection, another process hosts the clients now
+                with self._lock:
+                    host['sync'] = None
+                self._scheduler.cancel(('monitor', db_name))
+            return False
+        if not held:
+            with self._lock:
+                current = self._hosts.setdefault(db_name, host)
+                if current is host:
+                    host['sync'] = sync_callback
+            if current is not host:
+                # Stopped and taken again by another thread meanwhile (see _stop_when_unused())
+                lock.release()
+                return current['lock'].held()
+            self.listen_changes(db_name)
+            self._scheduler.schedule(('monitor', db_name), monitor_callback, HOST_MONITOR_INTERVAL,
+                                     delay=HOST_MONITOR_INTERVAL)
+            _logger.info("This process hosts the MQTT clients of %s", db_name)
+        return True
+
+    def serve_metrics(self, port, token):
+        """
+        Serve the Prometheus metrics of this process, which hosts the MQTT clients
+
+        Called whenever the host role is confirmed, so changed settings take effect.
+        The server is stopped once the process stops hosting (see _stop_when_unused()).
+
+        Args:
+            port (int): TCP port of the metrics server, 0 to disable it
+            token (str): Bearer token the scraper must send, the server is disabled without
+        """
+        with self._lock:
+            server = self._metrics_server
+            if server and port and token and server.port == port:
+                server.token = token
+                return
+            self._metrics_server = None
+            if port and token:
+                new_server = MetricsServer(port, token, self.render_metrics)
+                if new_server.start():
+                    self._metrics_server = new_server
+        if server:
+            server.stop()
+
+    def render_metrics(self):
+        """
+        Render the counters and histograms of the process with the gauges of the manager
+
+        Returns:
+            list: Lines of the Prometheus text exposition
+        """
+        return metrics.REGISTRY.render() + metrics.manager_gauges(self.worker_stats(), self.cursor_pool_stats())
+
+    def is_host(self, db_name):
+        """
+        Check whether this process hosts the MQTT clients of a database (without a query)
+
+        Args:
+            db_name (str): Name of the database
+
+        Returns:
+            bool: True if this process held the host lock at its last check
+        """
+        with self._lock:
+            host = self._hosts.get(db_name)
+        return bool(host) and host['lock'].held()
+
+    def unregister_all(self):
+        """
+        Detach all rooms of this process, e.g. once another process became the host
+
+        Returns:
+            list: Ids of the detached connections
+        """
+        with self._lock:
+            connection_ids = list(self._connections)
+        for connection_id in connection_ids:
+            self.unregister(connection_id)
+        return connection_ids
+
+    def listen_changes(self, db_name):
+        """
+        Receive the room changes committed by other Odoo processes of a database
+
+        Bookings may be saved by a worker that holds no MQTT client; its notification
+        triggers the publish of the changed rooms in this process. Started once per
+        database, when this process becomes the host of its MQTT clients.
+
+        Args:
+            db_name (str): Name of the database
+        """
+        with self._lock:
+            if db_name in self._listeners:
+                return
+            listener = self._listeners[db_name] = ChangeListener(
+                db_name, CHANGE_CHANNEL, partial(self._rooms_changed, db_name))
+        listener.start()
+
+    def _rooms_changed(self, db_name, connection_ids, origin=None, sync=False):
+        """
+        Publish the rooms of a change notification that are attached in this process
+
+        Sync requests (rooms another process connected or disconnected, see
+        request_sync()) are handed to the sync callback of the host in a one-shot job.
+
+        Args:
+            db_name (str): Database the notification was sent in
+            connection_ids (list or None): Changed connections, None for all of them
+            origin (float): Epoch seconds of the booking change, see trigger_publish()
+            sync (bool): True for a sync request instead of a data change
+        """
+        if sync:
+            with self._lock:
+                if db_name not in self._hosts or not self._hosts[db_name]['sync']:
+                    return
+                pending = self._pending_syncs.get(db_name, set())
+                if connection_ids is None or pending is None:
+                    self._pending_syncs[db_name] = None
+                else:
+                    self._pending_syncs[db_name] = pending | set(connection_ids)
+            self._scheduler.schedule(('sync', db_name), self._run_syncs, None)
+            return
+        with self._lock:
+            if connection_ids is None:
+                local = list(self._connections)
+            else:
+                local = [connection_id for connection_id in connection_ids if connection_id in self._connections]
+        if local:
+            self.trigger_publish(local, origin)
+
+    def _run_syncs(self, keys):
+        """Hand the pending sync requests of the databases in `keys` to their host's sync callback"""
+        for _sync, db_name in keys:
+            with self._lock:
+                if db_name not in self._pending_syncs or db_name not in self._hosts:
+                    continue
+                connection_ids = self._pending_syncs.pop(db_name)
+                sync_callback = self._hosts[db_name]['sync']
+            try:
+                sync_callback(None if connection_ids is None else sorted(connection_ids))
+            except Exception as e:
+                _logger.error("Failed to sync the MQTT clients of %s: %s", db_name, e)
+
+    def pop_change_origin(self, connection_id):
+        """
+        Take the time of the oldest booking change not yet published for a connection
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+
+        Returns:
+            float or None: Epoch seconds of the change, None for publishes that were
+            not caused by a booking change (reconciliation, reconnect, ...)
+        """
+        with self._lock:
+            return self._change_origins.pop(connection_id, None)
+
+    def start_trace(self, connection_id, seq, origin, sent):
+        """
+        Remember a publish until the display acknowledges that it is shown
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            seq (int): Sequence number of the published payload
+            origin (float or None): Epoch seconds of the booking change, see pop_change_origin()
+            sent (float): Epoch seconds the payload was published
+        """
+        with self._lock:
+            traces = self._traces.setdefault(connection_id, collections.OrderedDict())
+            traces[seq] = (origin, sent)
+            while len(traces) > LATENCY_PENDING_TRACES:
+                traces.popitem(last=False)
+
+    def record_ack(self, connection_id, ack, seen):
+        """
+        Record the acknowledgement of a display that it shows a published payload
+
+        The display acknowledges the latest payload it rendered, so payloads that
+        were superseded before they were shown are acknowledged with it.
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            ack (dict): Ack of the display with 'seq', 'received' (epoch seconds),
+                'render_ms' (drawing the screen) and 'display_ms' (e-paper refresh)
+            seen (float): Epoch seconds the ack was received
+
+        Returns:
+            bool: True if the ack matched a pending publish
+        """
+        with self._lock:
+            traces = self._traces.get(connection_id)
+            if not traces or ack.get('seq') not in traces:
+                return False
+            # Acknowledge the publish and all older ones still pending
+            origins = []
+            while traces:
+                seq, (origin, sent) = traces.popitem(last=False)
+                origins.append(origin)
+                if seq == ack['seq']:
+                    break
+            changes = [origin for origin in origins if origin is not None]
+            render_ms, display_ms = ack.get('render_ms'), ack.get('display_ms')
+            sample = {
+                'booking_ms': (seen - min(changes)) * 1000 if changes else None,
+                'publish_ms': (seen - sent) * 1000,
+                'render_ms': render_ms,
+                'display_ms': display_ms,
+                # Summed per sample, percentiles of the parts do not add up
+                'refresh_ms': render_ms + display_ms
+                if isinstance(render_ms, (int, float)) and isinstance(display_ms, (int, float)) else None,
+            }
+            self._latency_samples.setdefault(
+                connection_id, collections.deque(maxlen=LATENCY_SAMPLES)).append(sample)
+            return True
+
+    def latency_percentiles(self, connection_id, metric, percentiles=(50, 95, 99)):
+        """
+        Compute percentiles of a latency metric over the recent acks of a display
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            metric (str): 'booking_ms' (booking saved until shown), 'publish_ms'
+                (published until shown), 'render_ms', 'display_ms' or 'refresh_ms'
+                (render_ms + display_ms)
+            percentiles (tuple): Percentiles to compute
+
+        Returns:
+            tuple: (number of samples, dict percentile -> milliseconds), the dict is
+            empty without samples
+        """
+        with self._lock:
+            values = sorted(sample[metric] for sample in self._latency_samples.get(connection_id, ())
+                            if sample.get(metric) is not None)
+        if not values:
+            return 0, {}
+        # Nearest-rank percentiles
+        return len(values), {
+            percentile: values[max(0, -(-percentile * len(values) // 100) - 1)]
+            for percentile in percentiles
+        }
+
+    def schedule_publish_in(self, connection_id, delay):
+        """
+        Make sure the data of a connection is published again within `delay` seconds
+
+        Used to republish exactly when a meeting starts or ends, independent of the
+        (slow) periodic reconciliation interval.
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            delay (float): Maximum number of seconds until the next publish
+        """
+        self._scheduler.run_in([connection_id], delay)
+
+    def payload_changed(self, connection_id, digest):
+        """
+        Check a payload digest against the last published one and remember it
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            digest (str): Content digest of the payload about to be published
+
+        Returns:
+            bool: True if the payload differs from the last published one
+        """
+        with self._lock:
+            if self._payload_digests.get(connection_id) == digest:
+                return False
+            self._payload_digests[connection_id] = digest
+            return True
+
+    def forget_payload(self, connection_id):
+        """
+        Forget the last published payload so the next publish is always a full snapshot
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+        """
+        with self._lock:
+            self._payload_digests.pop(connection_id, None)
+            self._snapshots.pop(connection_id, None)
+
+    def next_sequence(self):
+        """
+        Get the next sequence number for a published payload
+
+        Returns:
+            int: Sequence number, increasing over all connections
+        """
+        with self._lock:
+            return next(self._sequence)
+
+    def last_snapshot(self, connection_id):
+        """
+        Get the room data the display of a connection currently has
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+
+        Returns:
+            tuple or None: (seq, room data, deltas since the last full snapshot) of the
+            last publish, None if unknown
+        """
+        with self._lock:
+            return self._snapshots.get(connection_id)
+
+    def store_snapshot(self, connection_id, seq, room_data, deltas=0):
+        """
+        Remember the room data sent to the display of a connection
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            seq (int): Sequence number of the snapshot or delta that was sent
+            room_data (dict): Full room data the display has after applying it
+            deltas (int): Number of deltas sent since the last full snapshot
+        """
+        with self._lock:
+            self._snapshots[connection_id] = (seq, room_data, deltas)
+
+    def set_display_capabilities(self, connection_id, capabilities):
+        """
+        Store the payload formats a display announced on its capabilities topic
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            capabilities (iterable): Announced formats, e.g. {'compact/1'}
+        """
+        with self._lock:
+            self._capabilities[connection_id] = set(capabilities)
+
+    def display_supports(self, connection_id, capability):
+        """
+        Check whether the display of a connection announced a payload format
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            capability (str): Payload format, e.g. 'compact/1'
+
+        Returns:
+            bool: True if the display can decode the format
+        """
+        with self._lock:
+            return capability in self._capabilities.get(connection_id, ())
+
+    def record_display_status(self, connection_id, online, seen):
+        """
+        Record a status message ('online'/'offline') of a display
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            online (bool): True if the display announced itself online
+            seen (float): Epoch seconds the message was received
+
+        Returns:
+            bool: True if the online flag of the display changed
+        """
+        return self._update_liveness(connection_id, online, seen)
+
+    def record_display_ping(self, connection_id, sent, seen):
+        """
+        Record a ping of a display, which also means the display is online
+
+        The ping carries the time the display sent it, so the difference to the
+        receive time estimates the delay from the display to Odoo. It includes the
+        clock offset between the two, so it is only meaningful with synced clocks.
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+            sent (float or None): Epoch seconds the display sent the ping
+            seen (float): Epoch seconds the ping was received
+
+        Returns:
+            bool: True if the display was not online before
+        """
+        delay = seen - sent if sent is not None and sent <= seen else None
+        return self._update_liveness(connection_id, True, seen, delay)
+
+    def _update_liveness(self, connection_id, online, seen, delay=None):
+        """Update the liveness entry of a display, returns True on a transition of the online flag"""
+        with self._lock:
+            entry = self._liveness.setdefault(
+                connection_id, {'online': None, 'last_seen': None, 'latency': None})
+            # Messages of one batch may be processed out of order
+            if entry['last_seen'] and seen < entry['last_seen']:
+                return False
+            changed = entry['online'] is not online
+            entry['online'] = online
+            entry['last_seen'] = seen
+            if delay is not None:
+                latency = entry['latency']
+                entry['latency'] = delay if latency is None else latency + LATENCY_SMOOTHING * (delay - latency)
+            return changed
+
+    def expire_liveness(self, timeout=LIVENESS_TIMEOUT):
+        """
+        Mark displays offline that were not heard of for `timeout` seconds
+
+        Args:
+            timeout (float): Seconds without a status or ping message
+
+        Returns:
+            list: Connection ids of the displays that went offline
+        """
+        deadline = time.time() - timeout
+        expired = []
+        with self._lock:
+            for connection_id, entry in self._liveness.items():
+                if entry['online'] and entry['last_seen'] < deadline:
+                    entry['online'] = False
+                    expired.append(connection_id)
+        return expired
+
+    def display_liveness(self, connection_id):
+        """
+        Get the liveness of a display as far as it was seen since the server started
+
+        Args:
+            connection_id (int): Unique identifier of the connection
+
+        Returns:
+            dict or None: 'online' (bool), 'last_seen' (epoch seconds) and 'latency'
+            (smoothed ping delay in seconds or None), None if nothing was received
+        """
+        with self._lock:
+            entry = self._liveness.get(connection_id)
+            return dict(entry) if entry else None
 
     def unregister(self, connection_id):
         """
         Unregister and cleanup an MQTT connection
 
+        The room is detached from its shared client. The client itself is only
+        disconnected once no room uses it anymore, the scheduler and listener threads
+        are stopped once no client is left.
+
         Args:
             connection_id (str): Unique identifier of the connection to remove
 
@@ -73,28 +1067,126 @@ class MqttConnectionManager:
         """
         with self._lock:
             # Check if connection exists
-            if connection_id in self._connections:
-                # Remove connection from registry
-                conn = self._connections.pop(connection_id)
-                # Get the MQTT client
-                client = conn.get('client')
-                if client:
-                    try:
-                        # Disconnect client if still connected
-                        if client.is_connected():
-                            client.disconnect()
-                        # Stop the client's network loop
-                        client.loop_stop()
-                    except Exception as e:
-                        _logger.error("Error disconnecting client: %s", e)
-                # Stop publisher thread if it exists and is running
-                pub_thread = conn.get('publisher_thread')
-                if pub_thread and pub_thread.is_alive():
-                    # Signal thread to stop (assumes thread checks do_run flag)
-                    pub_thread.do_run = False
-
-                return True
-        return False
+            if connection_id not in self._connections:
+                return False
+            # Remove connection from registry
+            conn = self._connections.pop(connection_id)
+            shared = self._clients.get(conn['client_key'])
+            topic = last_room = engine = None
+            if shared:
+                engine = shared['engine']
+                topic, _qos = shared['rooms'].pop(connection_id, (None, None))
+                last_room = not shared['rooms']
+                if last_room:
+                    del self._clients[conn['client_key']]
+            # Remove the connection from the publisher schedule
+            self._scheduler.cancel(connection_id)
+            self._payload_digests.pop(connection_id, None)
+            self._capabilities.pop(connection_id, None)
+            self._snapshots.pop(connection_id, None)
+            self._liveness.pop(connection_id, None)
+            self._change_origins.pop(connection_id, None)
+            self._traces.pop(connection_id, None)
+
+        # Outside of the lock: stopping the network loop waits for running callbacks,
+        # which use the manager themselves
+        client = conn.get('client')
+        if client:
+            try:
+                if last_room:
+                    # Disconnect the client and stop serving its network I/O
+                    engine.stop(client)
+                elif topic and client.is_connected():
+                    # Other rooms still use the client, only drop this room's subscription
+                    client.unsubscribe(topic)
+            except Exception as e:
+                _logger.error("Error disconnecting client: %s", e)
+        if last_room:
+            self._defer_stop_when_unused()
+        return True
+
+    def _defer_stop_when_unused(self):
+        """
+        Run _stop_when_unused() in a short-lived thread of its own
+
+        unregister() is also called by the publisher, i.e. from a scheduler worker that
+        still holds a pooled cursor. Stopping the scheduler and closing the cursor pools
+        must not happen inside that job.
+        """
+        thread = threading.Thread(target=self._stop_when_unused, name='mqtt_manager_stop')
+        thread.daemon = True  # Exit together with the Odoo process
+        thread.start()
+
+    def _stop_when_unused(self):
+        """
+        Stop the background threads of the manager once no MQTT client is left
+
+        The publisher scheduler and its worker pool are stopped, the change listeners
+        are told to exit, the background cursor pools are closed, the host locks
+        are released (another process may host the next rooms) and the metrics
+        server is stopped, so a process
+        without rooms holds no threads or database connections. Cursors still in use
+        by a finishing job are closed when it releases them. Everything starts again
+        lazily when the next room is attached (see PublishScheduler.schedule(),
+        cursor_pool() and listen_changes()).
+
+        The lock is held throughout, so a room attaching meanwhile waits for the stop
+        instead of being stopped with it.
+
+        Returns:
+            bool: True if the manager was stopped, False if clients are still attached
+        """
+        with self._lock:
+            if self._clients:
+                return False
+            listeners, self._listeners = list(self._listeners.values()), {}
+            pools, self._cursor_pools = list(self._cursor_pools.values()), {}
+            self._publishers = {}
+            hosts, self._hosts = list(self._hosts.items()), {}
+            self._pending_syncs = {}
+            for db_name, _host in hosts:
+                self._scheduler.cancel(('monitor', db_name))
+                self._scheduler.cancel(('sync', db_name))
+            for listener in listeners:
+                # Exits on its next poll, nothing waits for it
+                listener.stop(timeout=0)
+            self._scheduler.stop()
+            for pool in pools:
+                pool.close()
+            for _db_name, host in hosts:
+                host['lock'].release()
+            metrics_server, self._metrics_server = self._metrics_server, None
+        if metrics_server:
+            metrics_server.stop()
+        _logger.info("No MQTT clients left, stopped the publisher scheduler and change listeners")
+        return True
+
+    def worker_stats(self):
+        """
+        Report the threads, clients and jobs of the manager, e.g. for leak detection
+
+        The number of threads should stay constant while rooms reconnect; a growing
+        'threads' count with constant 'clients' points to a leak.
+
+        Returns:
+            dict: 'rooms', 'clients' (shared MQTT clients), 'threads' (live threads of
+            the process), 'scheduler' (see PublishScheduler.worker_stats()) and
+            'engines' (engine name -> stats of the engine), 'inbound' (queued inbound
+            messages) and 'states' (clients per connection state)
+        """
+        with self._lock:
+            rooms, clients = len(self._connections), len(self._clients)
+            engines = dict(self._engines)
+            states = collections.Counter(shared['state'] for shared in self._clients.values())
+        return {
+            'rooms': rooms,
+            'clients': clients,
+            'threads': threading.active_count(),
+            'scheduler': self._scheduler.worker_stats(),
+            'engines': {name: engine.stats() for name, engine in engines.items()},
+            'inbound': self._inbound.qsize(),
+            'states': dict(states),
+        }
 
     def get_client(self, connection_id):
         """
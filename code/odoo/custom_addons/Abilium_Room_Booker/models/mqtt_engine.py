@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import threading
+import paho.mqtt.client as mqtt
+
+# Get logger instance for this module
+_logger = logging.getLogger(__name__)
+
+
+class ThreadEngine:
+    """
+    Default engine: every shared client runs its own paho network loop thread
+
+    Connecting is driven by the connection manager (see MqttConnectionManager.client_lost()),
+    the clients are created with reconnect_on_failure=False so the network loop thread ends
+    when the connection is lost instead of reconnecting on its own.
+    """
+    name = 'thread'
+
+    def __init__(self):
+        """Initialize the engine"""
+        self._clients = set()
+        self._lock = threading.Lock()
+
+    def start(self, client):
+        """
+        Start serving a client prepared with connect_async(), it is connected by reconnect()
+
+        Args:
+            client (mqtt.Client): Configured client
+        """
+        with self._lock:
+            self._clients.add(client)
+
+    def reconnect(self, client):
+        """
+        Connect a client (blocking) and start its network loop thread
+
+        Args:
+            client (mqtt.Client): Client started by this engine
+
+        Raises:
+            OSError: If the connection to the broker could not be established
+        """
+        # Reap the loop thread of the lost connection
+        client.loop_stop()
+        client.reconnect()
+        client.loop_start()
+
+    def stop(self, client):
+        """
+        Disconnect a client and stop its network loop
+
+        Args:
+            client (mqtt.Client): Client started by this engine
+        """
+        with self._lock:
+            self._clients.discard(client)
+        if client.is_connected():
+            client.disconnect()
+        client.loop_stop()
+
+    def stats(self):
+        """
+        Report the clients served by the engine
+
+        Returns:
+            dict: 'clients' (served clients, each with one network loop thread while connected)
+        """
+        with self._lock:
+            return {'clients': len(self._clients)}
+
+
+class AsyncioEngine:
+    """
+    Engine serving the network I/O of all shared clients from one asyncio event loop thread
+
+    The sockets of the clients are watched by the event loop through paho's socket
+    callbacks (on_socket_open, on_socket_register_write, ...), so the number of threads
+    does not grow with the number of brokers. Only establishing a connection (DNS lookup,
+    TCP and TLS handshake) blocks, it runs in the thread calling reconnect().
+    """
+    name = 'asyncio'
+
+    def __init__(self, stop_timeout=5.0):
+        """
+        Initialize the engine (the event loop thread is started lazily)
+
+        Args:
+            stop_timeout (float): Seconds stop() waits for the event loop to disconnect a client
+        """
+        self.stop_timeout = stop_timeout
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        # client -> keep-alive task of its connection, only accessed in the event loop thread
+        self._clients = {}
+
+    def start(self, client):
+        """
+        Start serving a client prepared with connect_async(), it is connected by reconnect()
+
+        Args:
+            client (mqtt.Client): Configured client
+        """
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+        self._ensure_loop().call_soon_threadsafe(self._clients.setdefault, client, None)
+
+    def reconnect(self, client):
+        """
+        Connect a client (blocking), its socket is then served by the event loop
+
+        Must not be called from the event loop thread.
+
+        Args:
+            client (mqtt.Client): Client started by this engine
+
+        Raises:
+            OSError: If the connection to the broker could not be established
+        """
+        client.reconnect()
+
+    def stop(self, client):
+        """
+        Disconnect a client and stop serving it
+
+        Args:
+            client (mqtt.Client): Client started by this engine
+        """
+        if self._loop is None:
+            return
+        done = threading.Event()
+
+        def stop():
+            self._remove(client)
+            done.set()
+
+        self._call(stop)
+        if not done.wait(self.stop_timeout):
+            _logger.warning("Timed out stopping MQTT client %s", client)
+
+    def stats(self):
+        """
+        Report the clients served by the engine
+
+        Returns:
+            dict: 'clients' (served clients) and 'running' (event loop thread alive)
+        """
+        return {
+            'clients': len(self._clients),
+            'running': bool(self._thread and self._thread.is_alive()),
+        }
+
+    def _ensure_loop(self):
+        """Start the event loop thread if needed"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='mqtt_asyncio')
+                self._thread.daemon = True  # Exit together with the Odoo process
+                self._thread.start()
+            return self._loop
+
+    def _call(self, callback, *args):
+        """Run a callback in the event loop thread, directly if already running there"""
+        if threading.current_thread() is self._thread:
+            callback(*args)
+        else:
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    # --- Event loop thread ---
+
+    def _remove(self, client):
+        """Stop serving a client, disconnecting it and closing its socket"""
+        misc = self._clients.pop(client, None)
+        if misc:
+            misc.cancel()
+        self._drop_socket(client)
+
+    def _watch(self, client, sock):
+        """Watch the socket of a newly connected client for incoming data"""
+        if client not in self._clients:
+            # Stopped while connecting
+            self._drop_socket(client)
+            return
+        self._loop.add_reader(sock.fileno(), self._read, client, sock)
+        if self._clients[client]:
+            self._clients[client].cancel()
+        self._clients[client] = self._loop.create_task(self._misc_loop(client))
+
+    def _unwatch(self, client, fd):
+        """Stop watching a closed socket (the connection manager schedules the reconnect)"""
+        self._loop.remove_reader(fd)
+        self._loop.remove_writer(fd)
+        misc = self._clients.get(client)
+        if misc:
+            misc.cancel()
+            self._clients[client] = None
+
+    def _read(self, client, sock):
+        """Read incoming data of a client whose socket became readable"""
+        client.loop_read()
+        # TLS sockets can hold decrypted data without the socket being readable again
+        while client.socket() is sock and getattr(sock, 'pending', lambda: 0)():
+            client.loop_read()
+
+    async def _misc_loop(self, client):
+        """Send keep-alive pings and detect timeouts of a connected client"""
+        while client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+    def _drop_socket(self, client):
+        """Disconnect a client and make sure its socket is no longer watched"""
+        if client.is_connected():
+            client.disconnect()
+            # Send the DISCONNECT right away, paho closes the socket once it is written
+            client.loop_write()
+        sock = client.socket()
+        if sock is not None:
+            # Still waiting for its CONNACK, or the DISCONNECT could not be written at once
+            fd = sock.fileno()
+            self._loop.remove_reader(fd)
+            self._loop.remove_writer(fd)
+            sock.close()
+
+    # --- paho socket callbacks, called from any thread ---
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._call(self._watch, client, sock)
+
+    def _on_socket_close(self, client, userdata, sock):
+        # The socket is closed right after this callback, keep its descriptor number
+        self._call(self._unwatch, client, sock.fileno())
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._call(self._loop.add_writer, sock.fileno(), client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._call(self._loop.remove_writer, sock.fileno())
+
+
+# Engines selectable with the ir.config_parameter abilium_room_booker.mqtt_engine
+ENGINES = {
+    ThreadEngine.name: ThreadEngine,
+    AsyncioEngine.name: AsyncioEngine,
+}
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Get logger instance for this module
+_logger = logging.getLogger(__name__)
+
+
+class PublishScheduler:
+    """
+    Heap-based scheduler that drives the periodic jobs of all rooms from one thread
+
+    Every scheduled key (a rasproom.connection id) has a callback and an interval. On each
+    tick the scheduler pops every key that is due, groups the keys by callback and hands
+    each group in batches to a bounded worker pool. The number of threads therefore stays
+    constant no matter how many rooms are registered. Periodic runs are aligned to a grid of
+    their interval, so all rooms sharing an interval are handled in the same tick.
+    """
+
+    def __init__(self, max_workers=4, batch_size=50, name='mqtt_scheduler'):
+        """
+        Initialize the scheduler (the thread and the worker pool are started lazily)
+
+        Args:
+            max_workers (int): Maximum number of worker threads executing callbacks
+            batch_size (int): Maximum number of keys handed to one callback invocation
+            name (str): Name of the scheduler thread, also used as worker thread prefix
+        """
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.name = name
+        self._heap = []                     # (due, tie breaker, key, entry)
+        self._entries = {}                  # key -> entry dict
+        self._inflight = set()              # Keys currently processed by a worker
+        self._rerun = set()                 # In-flight keys that became due again
+        self._counter = itertools.count()   # Tie breaker so entries never get compared
+        self._cond = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._stop_event = None             # Set when the current scheduler thread must exit
+        self._generation = 0                # Incremented on every start and stop
+        self._stale_batches = 0             # Batches dropped because their generation ended
+
+    def schedule(self, key, callback, interval, delay=0):
+        """
+        Add a key to the schedule, replacing any existing entry for the same key
+
+        Args:
+            key: Hashable identifier, usually the connection id
+            callback (callable): Called with a list of due keys
+            interval (float or None): Seconds between two runs of this key, None to run
+                the key only once
+            delay (float): Seconds until the first run
+        """
+        with self._cond:
+            entry = {
+                'callback': callback,
+                'interval': interval,
+                'due': time.monotonic() + delay,
+            }
+            self._entries[key] = entry
+            self._push(key, entry)
+            self._ensure_started()
+            self._cond.notify()
+
+    def cancel(self, key):
+        """
+        Remove a key from the schedule
+
+        Returns:
+            bool: True if the key was scheduled, False otherwise
+        """
+        with self._cond:
+            # Stale heap items are skipped lazily when they are popped
+            return self._entries.pop(key, None) is not None
+
+    def trigger(self, keys):
+        """
+        Run the given keys as soon as possible, outside of their regular interval
+
+        Keys that are currently being processed are run again right after the running
+        job finishes, so changes made while a job is running are never lost.
+
+        Args:
+            keys (iterable): Keys to run, keys without schedule entry are ignored
+        """
+        self.run_in(keys, 0)
+
+    def run_in(self, keys, delay):
+        """
+        Make sure the given keys run within `delay` seconds
+
+        The regular schedule of a key is only brought forward, never postponed.
+
+        Args:
+            keys (iterable): Keys to run, keys without schedule entry are ignored
+            delay (float): Maximum number of seconds until the next run
+        """
+        with self._cond:
+            due = time.monotonic() + max(delay, 0)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry and due < entry['due']:
+                    entry['due'] = due
+                    self._push(key, entry)
+            self._cond.notify()
+
+    def is_scheduled(self, key):
+        """Check whether a key currently has a schedule entry"""
+        with self._cond:
+            return key in self._entries
+
+    def stop(self, timeout=5.0):
+        """
+        Stop the scheduler thread and the worker pool
+
+        Batches that were submitted but have not started yet are not executed by the
+        old pool anymore, running callbacks finish on their own. Schedule entries are
+        kept, so the next schedule() call starts a fresh thread and pool that continue
+        with them.
+
+        Args:
+            timeout (float): Seconds to wait for the scheduler thread to exit
+
+        Returns:
+            bool: True if the scheduler thread exited within the timeout
+        """
+        with self._cond:
+            thread, executor = self._thread, self._executor
+            if self._stop_event:
+                self._stop_event.set()
+            # Ends the generation: stale threads and batches terminate on their next check
+            self._generation += 1
+            self._thread = None
+            self._executor = None
+            self._inflight.clear()
+            self._rerun.clear()
+            self._cond.notify_all()
+        if executor:
+            executor.shutdown(wait=False)
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout)
+            if thread.is_alive():
+                _logger.warning("Scheduler thread %s did not stop within %ss", thread.name, timeout)
+                return False
+        return True
+
+    def worker_stats(self):
+        """
+        Report the threads and jobs of the scheduler, e.g. for leak detection
+
+        Returns:
+            dict: 'running' (scheduler thread alive), 'generation', 'workers' (live worker
+            threads), 'max_workers', 'scheduled' (keys), 'inflight' (keys being processed)
+            and 'stale_batches' (batches dropped after a stop)
+        """
+        prefix = f"{self.name}_worker"
+        with self._cond:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'generation': self._generation,
+                'workers': sum(1 for t in threading.enumerate() if t.name.startswith(prefix)),
+                'max_workers': self.max_workers,
+                'scheduled': len(self._entries),
+                'inflight': len(self._inflight),
+                'stale_batches': self._stale_batches,
+            }
+
+    def _push(self, key, entry):
+        """Push an entry onto the heap (caller must hold the lock)"""
+        heapq.heappush(self._heap, (entry['due'], next(self._counter), key, entry))
+
+    def _ensure_started(self):
+        """Start the scheduler thread and worker pool if needed (caller must hold the lock)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._generation += 1
+        self._stop_event = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"{self.name}_worker",
+        )
+        self._thread = threading.Thread(
+            target=self._run, args=(self._generation, self._stop_event), name=self.name,
+        )
+        self._thread.daemon = True  # Exit together with the Odoo process
+        self._thread.start()
+
+    def _pop_due(self, now):
+        """
+        Pop all due keys from the heap and reschedule them (caller must hold the lock)
+
+        Returns:
+            dict: Mapping of callback -> list of due keys
+        """
+        due = {}
+        while self._heap and self._heap[0][0] <= now:
+            when, _tie, key, entry = heapq.heappop(self._heap)
+            # Skip items that were cancelled or replaced since they were pushed
+            if self._entries.get(key) is not entry or entry['due'] != when:
+                continue
+            interval = entry['interval']
+            if interval:
+                # Align the next run to a grid of the interval, so rooms sharing an interval
+                # are processed together in one pass and a slow cycle never causes catch-up bursts
+                entry['due'] = (math.floor(now / interval) + 1) * interval
+                self._push(key, entry)
+            elif key not in self._inflight:
+                # One-shot entries are removed once they run (in-flight ones rerun first)
+                del self._entries[key]
+            if key in self._inflight:
+                # Previous run for this key has not finished yet, run again once it is done
+                self._rerun.add(key)
+                continue
+            self._inflight.add(key)
+            due.setdefault(entry['callback'], []).append(key)
+        return due
+
+    def _run(self, generation, stop_event):
+        """Main loop of the scheduler thread: wait for the next due key and dispatch"""
+        while True:
+            with self._cond:
+                if stop_event.is_set() or generation != self._generation:
+                    return
+                now = time.monotonic()
+                due = self._pop_due(now)
+                if not due:
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    self._cond.wait(timeout)
+                    continue
+                executor = self._executor
+
+            # Dispatch outside the lock so scheduling calls are never blocked by submissions
+            for callback, keys in due.items():
+                for i in range(0, len(keys), self.batch_size):
+                    batch = keys[i:i + self.batch_size]
+                    try:
+                        executor.submit(self._run_batch, generation, callback, batch)
+                    except RuntimeError:
+                        # Pool was shut down by stop() in the meantime, which also
+                        # cleared the in-flight keys
+                        break
+
+    def _run_batch(self, generation, callback, keys):
+        """Execute a callback for a batch of keys inside a worker thread"""
+        with self._cond:
+            if generation != self._generation:
+                # Submitted before a stop(): leave the keys to the current generation
+                self._stale_batches += 1
+                for key in keys:
+                    if key not in self._entries:
+                        # One-shot jobs are removed when popped, restore them
+                        self._entries[key] = {'callback': callback, 'interval': None, 'due': time.monotonic()}
+                        self._push(key, self._entries[key])
+                return
+        try:
+            callback(keys)
+        except Exception as e:
+            _logger.error("Scheduled job %s failed for %s: %s", callback, keys, e)
+        finally:
+            with self._cond:
+                if generation == self._generation:
+                    self._finish_batch(keys)
+
+    def _finish_batch(self, keys):
+        """Release the keys of a finished batch (caller must hold the lock)"""
+        self._inflight.difference_update(keys)
+        # Keys that became due while running are run again immediately
+        rerun = self._rerun.intersection(keys)
+        self._rerun.difference_update(rerun)
+        now = time.monotonic()
+        for key in rerun:
+            entry = self._entries.get(key)
+            if entry:
+                entry['due'] = now
+                self._push(key, entry)
+        if rerun:
+            self._cond.notify()
@@ -0,0 +1,172 @@
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+from datetime import timedelta
+from .room_slots import SLOT, SLOT_MINUTES, align_to_slot, earliest_free_slots, slot_range
+
+# Longest search window in days (the bitmaps then have 14 * 96 slots per room)
+MAX_SEARCH_DAYS = 14
+# Number of rooms suggested by one search
+MAX_SUGGESTIONS = 10
+
+
+class RoomFinder(models.TransientModel):
+    """
+    "Find me a room" wizard: suggests the rooms that are free for the requested
+    duration within a time window, best capacity fit first.
+    """
+    _name = 'rasproom.room.finder'
+    _description = 'Room Finder'
+
+    event_id = fields.Many2one('calendar.event', string='Meeting')
+    search_from = fields.Datetime(string='From', required=True, default=fields.Datetime.now)
+    search_to = fields.Datetime(string='Until', required=True,
+                                default=lambda self: fields.Datetime.now() + timedelta(days=1))
+    duration = fields.Float(string='Duration', required=True, default=1.0, help="Duration in hours")
+    min_capacity = fields.Integer(string='Attendees', default=1)
+    city = fields.Char(string='City')
+    floor = fields.Char(string='Floor')
+    line_ids = fields.One2many('rasproom.room.finder.line', 'finder_id', string='Suggestions')
+
+    @api.model
+    def default_get(self, fields_list):
+        """
+        Takes the time, duration and number of attendees of the meeting the
+        finder was opened from.
+        """
+        values = super().default_get(fields_list)
+        event = self.env['calendar.event'].browse(values.get('event_id'))
+        if event.exists() and event.start:
+            values.update({
+                'search_from': event.start,
+                'search_to': event.start + timedelta(days=1),
+                'duration': event.duration or 1.0,
+                'min_capacity': len(event.partner_ids.filtered(lambda p: not p.is_room)) or 1,
+            })
+        return values
+
+    @api.constrains('search_from', 'search_to', 'duration')
+    def _check_search_window(self):
+        """
+        raises error if the search window is empty, too long or
+        shorter than the meeting
+        """
+        for finder in self:
+            if finder.duration <= 0:
+                raise ValidationError("The duration must be positive.")
+            if finder.search_to - finder.search_from > timedelta(days=MAX_SEARCH_DAYS):
+                raise ValidationError(f"The search window cannot be longer than {MAX_SEARCH_DAYS} days.")
+            if finder.search_to - finder.search_from < timedelta(hours=finder.duration):
+                raise ValidationError("The search window is shorter than the meeting.")
+
+    def action_search(self):
+        """
+        Replaces the suggestions with the result of a new search and shows
+        the wizard again.
+        """
+        self.ensure_one()
+        self.line_ids = [(5, 0, 0)] + [(0, 0, vals) for vals in self._find_rooms()]
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def _find_rooms(self):
+        """
+        Searches all matching rooms at once on occupancy bitmaps of 15 minute slots.
+
+        The rooms and their bookings within the window are fetched with one query,
+        turned into busy slot ranges and searched together for the earliest run of
+        free slots long enough for the meeting (see room_slots.earliest_free_slots()).
+        Free rooms are ranked by capacity fit (fewest spare seats), then by the
+        earliest start.
+
+        Returns:
+            list: Values of the suggestion lines
+        """
+        self.ensure_one()
+        window_start = align_to_slot(self.search_from)
+        slots = max(int((self.search_to - window_start) // SLOT), 0)
+        length = -int(-self.duration * 60 // SLOT_MINUTES)  # Round up to whole slots
+
+        self.env.cr.execute("""
+            SELECT conn.partner_id, conn.capacity, event.start, event.stop
+              FROM rasproom_connection conn
+         LEFT JOIN calendar_event event
+                ON event.meeting_room = conn.partner_id
+               AND event.active
+               AND event.id != %(event_id)s
+               AND event.start < %(stop)s
+               AND event.stop > %(start)s
+             WHERE conn.active
+               AND conn.partner_id IS NOT NULL
+               AND COALESCE(conn.capacity, 0) >= %(min_capacity)s
+               AND (%(city)s IS NULL OR lower(conn.city) = %(city)s)
+               AND (%(floor)s IS NULL OR lower(conn.floor) = %(floor)s)
+        """, {
+            'event_id': self.event_id.id or 0,
+            'start': window_start,
+            'stop': self.search_to,
+            'min_capacity': self.min_capacity or 0,
+            'city': (self.city or '').strip().lower() or None,
+            'floor': (self.floor or '').strip().lower() or None,
+        })
+
+        rooms = {}
+        for partner_id, capacity, start, stop in self.env.cr.fetchall():
+            room = rooms.setdefault(partner_id, {'capacity': capacity or 0, 'busy': []})
+            if start is not None:
+                room['busy'].append(slot_range(window_start, slots, start, stop))
+
+        partner_ids = list(rooms)
+        first_slots = earliest_free_slots([rooms[partner_id]['busy'] for partner_id in partner_ids], slots, length)
+        candidates = sorted(
+            (rooms[partner_id]['capacity'] - (self.min_capacity or 0), first_slot, partner_id)
+            for partner_id, first_slot in zip(partner_ids, first_slots)
+            if first_slot is not None
+        )
+        return [{
+            'partner_id': partner_id,
+            'capacity': rooms[partner_id]['capacity'],
+            'spare_seats': spare_seats,
+            'start': window_start + first_slot * SLOT,
+            'stop': window_start + first_slot * SLOT + timedelta(hours=self.duration),
+        } for spare_seats, first_slot, partner_id in candidates[:MAX_SUGGESTIONS]]
+
+
+class RoomFinderLine(models.TransientModel):
+    """
+    One room suggested by the room finder, with the earliest time it is free
+    """
+    _name = 'rasproom.room.finder.line'
+    _description = 'Room Finder Suggestion'
+    _order = 'spare_seats, start, id'
+
+    finder_id = fields.Many2one('rasproom.room.finder', required=True, ondelete='cascade')
+    partner_id = fields.Many2one('res.partner', string='Room', readonly=True)
+    capacity = fields.Integer(string='Capacity', readonly=True)
+    spare_seats = fields.Integer(string='Spare Seats', readonly=True)
+    start = fields.Datetime(string='Free From', readonly=True)
+    stop = fields.Datetime(string='Until', readonly=True)
+
+    def action_book(self):
+        """
+        Books the suggested room and time for the meeting the finder was opened
+        from, replacing rooms booked before. The meeting keeps its duration, the
+        search only rounds it up to whole slots to find a free room.
+        """
+        self.ensure_one()
+        event = self.finder_id.event_id
+        if not event:
+            raise ValidationError("Open the room finder from a meeting to book a room.")
+        commands = [(3, room.id) for room in event.partner_ids.filtered('is_room') if room != self.partner_id]
+        commands.append((4, self.partner_id.id))
+        event.write({
+            'partner_ids': commands,
+            'meeting_room': self.partner_id.id,
+            'start': self.start,
+            'stop': self.start + timedelta(hours=event.duration),
+        })
+        return {'type': 'ir.actions.act_window_close'}
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import bisect
+from itertools import accumulate
+
+
+class RoomIntervals:
+    """
+    Bookings of one room as arrays sorted by start, answering overlap queries with bisect
+
+    Besides the start and stop times, the running maximum of the stops is kept: no booking
+    at or before position i ends later than max_stops[i]. An overlap query bisects the
+    bookings starting before the end of the queried interval and walks back only while
+    an earlier booking can still end after its start, so a query touches the overlapping
+    bookings (plus long bookings spanning them) instead of the whole history.
+    """
+
+    def __init__(self, bookings):
+        """
+        Build the arrays of a room
+
+        Args:
+            bookings (iterable): (start, stop, event id) tuples in any order
+        """
+        bookings = sorted(bookings)
+        self.starts = [start for start, _stop, _event_id in bookings]
+        self.stops = [stop for _start, stop, _event_id in bookings]
+        self.event_ids = [event_id for _start, _stop, event_id in bookings]
+        self.max_stops = list(accumulate(self.stops, max))
+
+    def overlapping(self, start, stop, exclude_id=None):
+        """
+        Find the bookings overlapping the interval [start, stop)
+
+        Args:
+            start (datetime): Start of the interval
+            stop (datetime): End of the interval
+            exclude_id (int): Event to ignore, e.g. the event being edited
+
+        Returns:
+            list: Ids of the overlapping events
+        """
+        found = []
+        # Bookings starting before the end of the interval are candidates
+        i = bisect.bisect_left(self.starts, stop) - 1
+        while i >= 0 and self.max_stops[i] > start:
+            if self.stops[i] > start and self.event_ids[i] != exclude_id:
+                found.append(self.event_ids[i])
+            i -= 1
+        return found
+
+    def is_busy(self, start, stop, exclude_id=None):
+        """
+        Check whether the room has a booking overlapping [start, stop)
+
+        Args:
+            start (datetime): Start of the interval
+            stop (datetime): End of the interval
+            exclude_id (int): Event to ignore, e.g. the event being edited
+
+        Returns:
+            bool: True if at least one booking overlaps
+        """
+        i = bisect.bisect_left(self.starts, stop) - 1
+        while i >= 0 and self.max_stops[i] > start:
+            if self.stops[i] > start and self.event_ids[i] != exclude_id:
+                return True
+            i -= 1
+        return False
+
+
+class RoomIntervalIndex:
+    """
+    Bookings of all rooms from `since` on, see calendar.event _room_interval_index()
+    """
+
+    def __init__(self, since, rows):
+        """
+        Build the index
+
+        Args:
+            since (datetime): Bookings ending before this time are not indexed
+            rows (iterable): (room partner id, start, stop, event id) tuples
+        """
+        self.since = since
+        bookings = {}
+        for room_id, start, stop, event_id in rows:
+            bookings.setdefault(room_id, []).append((start, stop, event_id))
+        self.rooms = {room_id: RoomIntervals(room_bookings) for room_id, room_bookings in bookings.items()}
+
+    def covers(self, start):
+        """
+        Check whether queries starting at `start` can be answered by the index
+
+        Args:
+            start (datetime): Start of the queried interval
+
+        Returns:
+            bool: False if bookings ending before the indexed range could overlap
+        """
+        return start >= self.since
+
+    def busy_rooms(self, start, stop, exclude_id=None):
+        """
+        Find the rooms with a booking overlapping [start, stop)
+
+        Args:
+            start (datetime): Start of the interval
+            stop (datetime): End of the interval
+            exclude_id (int): Event to ignore, e.g. the event being edited
+
+        Returns:
+            list: Partner ids of the busy rooms
+        """
+        return [room_id for room_id, intervals in self.rooms.items()
+                if intervals.is_busy(start, stop, exclude_id)]
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import calendar
+import hashlib
+import json
+import struct
+from datetime import datetime
+
+# Payload keys that change on every publish and are ignored when comparing payloads
+VOLATILE_KEYS = ('timestamp', 'seq', 'sent')
+
+# Compact binary room data layout (all integers big-endian, datetimes as UTC epoch seconds):
+#   header: magic (B), version (B), flags (B), seq (Q), timestamp (I), capacity (H), event count (B),
+#           page count (B)
+#   strings: room, raspberry
+#   per event: id (I), start (I), stop (I), flags (B), strings: name, organizer
+# Strings are encoded as UTF-8 with a one byte length prefix (at most 255 bytes).
+# Flags: bit 0 = room occupied / event is current
+# Version history: 1 = initial layout, 2 = sequence number and event ids for delta updates,
+# 3 = page count for paged event lists, 4 = 64 bit sequence number (time based, see
+# MqttConnectionManager)
+COMPACT_MAGIC = 0xA7
+COMPACT_VERSION = 4
+COMPACT_CAPABILITY = f'compact/{COMPACT_VERSION}'  # Announced by displays that can decode it
+_COMPACT_HEADER = struct.Struct('>BBBQIHBB')
+_COMPACT_EVENT = struct.Struct('>IIIB')
+
+# Delta updates on the /delta topic, announced by displays that can apply them
+DELTA_CAPABILITY = 'delta/1'
+_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def payload_digest(room_data):
+    """
+    Compute a stable content hash of a room data payload
+
+    Volatile keys such as the publish timestamp are left out, so two payloads
+    describing the same room state have the same digest.
+
+    Args:
+        room_data (dict): Room data as built by rasproom.connection
+
+    Returns:
+        str: Hex digest of the payload content
+    """
+    content = {key: value for key, value in room_data.items() if key not in VOLATILE_KEYS}
+    serialized = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+
+def encode_compact(room_data):
+    """
+    Encode a room data payload into the compact binary layout
+
+    The encoding drops the repeated JSON keys, sends datetimes as epoch seconds and
+    derives duration and current event on the display, which keeps the message small
+    and cheap to decode on a Raspberry Pi Zero.
+
+    Args:
+        room_data (dict): Room data as built by rasproom.connection
+
+    Returns:
+        bytes: Encoded payload
+    """
+    events = room_data.get('events', [])[:255]
+    parts = [_COMPACT_HEADER.pack(
+        COMPACT_MAGIC,
+        COMPACT_VERSION,
+        1 if room_data.get('is_occupied') else 0,
+        room_data.get('seq') or 0,
+        _to_epoch(room_data.get('timestamp')),
+        min(max(room_data.get('capacity') or 0, 0), 0xFFFF),
+        len(events),
+        min(room_data.get('pages') or 1, 255),
+    )]
+    parts.append(_pack_string(room_data.get('room')))
+    parts.append(_pack_string(room_data.get('raspberry')))
+    for event in events:
+        parts.append(_COMPACT_EVENT.pack(
+            event.get('id') or 0,
+            _to_epoch(event.get('start')),
+            _to_epoch(event.get('stop')),
+            1 if event.get('is_current') else 0,
+        ))
+        parts.append(_pack_string(event.get('name')))
+        parts.append(_pack_string(event.get('organizer')))
+    return b''.join(parts)
+
+
+def diff_payloads(old, new):
+    """
+    Compute the delta between two room data payloads
+
+    Top-level keys are compared as a whole, events are compared by their id. The
+    returned delta does not depend on the number of unchanged events, so its size
+    stays constant however many events a payload contains.
+
+    Args:
+        old (dict): Previously published room data
+        new (dict): Current room data
+
+    Returns:
+        dict: Delta with the keys 'set' (changed top-level values), 'unset' (removed
+        top-level keys), 'added' and 'changed' (event dicts) and 'removed' (event ids)
+    """
+    skip = ('events', 'seq', 'sent')
+    delta = {
+        'set': {key: value for key, value in new.items() if key not in skip and old.get(key) != value},
+        'unset': [key for key in old if key not in skip and key not in new],
+        'added': [],
+        'changed': [],
+        'removed': [],
+    }
+    old_events = {event['id']: event for event in old.get('events', [])}
+    new_events = {event['id']: event for event in new.get('events', [])}
+    for event_id, event in new_events.items():
+        if event_id not in old_events:
+            delta['added'].append(event)
+        elif old_events[event_id] != event:
+            delta['changed'].append(event)
+    delta['removed'] = [event_id for event_id in old_events if event_id not in new_events]
+    return delta
+
+
+def _to_epoch(value):
+    """Convert a naive UTC datetime (or its server string format) to epoch seconds"""
+    if not value:
+        return 0
+    if isinstance(value, str):
+        value = datetime.strptime(value, _DATETIME_FORMAT)
+    return calendar.timegm(value.timetuple())
+
+
+def _pack_string(value):
+    """Encode a string with a one byte length prefix, truncating it to 255 bytes"""
+    data = (value or '').encode('utf-8')[:255]
+    # Do not cut a multi-byte character in half
+    data = data.decode('utf-8', errors='ignore').encode('utf-8')
+    return bytes([len(data)]) + data
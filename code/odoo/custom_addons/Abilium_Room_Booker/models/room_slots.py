@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import logging
+from datetime import timedelta
+
+# Get logger instance for this module
+_logger = logging.getLogger(__name__)
+
+# Optional NumPy import, the search falls back to Python integers as bitmaps
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+    _logger.info("numpy not installed, the room finder uses integer bitmaps")
+
+# Length of one slot of the occupancy bitmaps in minutes
+SLOT_MINUTES = 15
+SLOT = timedelta(minutes=SLOT_MINUTES)
+
+
+def align_to_slot(value):
+    """
+    Round a datetime up to the next slot boundary
+
+    Args:
+        value (datetime): Naive UTC datetime
+
+    Returns:
+        datetime: value itself if it is on a boundary, otherwise the next boundary
+    """
+    aligned = value.replace(minute=value.minute - value.minute % SLOT_MINUTES, second=0, microsecond=0)
+    return aligned if aligned == value else aligned + SLOT
+
+
+def slot_range(window_start, slots, start, stop):
+    """
+    Slots of the window touched by an interval, partially covered slots included
+
+    Args:
+        window_start (datetime): Start of the first slot
+        slots (int): Number of slots of the window
+        start (datetime): Start of the interval
+        stop (datetime): End of the interval
+
+    Returns:
+        tuple: (first slot, slot after the last one), clipped to the window
+    """
+    first = int((start - window_start) // SLOT)
+    last = -int(-(stop - window_start) // SLOT)  # Round up
+    return max(first, 0), min(last, slots)
+
+
+def earliest_free_slots(busy, slots, length):
+    """
+    Find the first start slot of each room with `length` consecutive free slots
+
+    All rooms are searched at once: with NumPy the occupancy is a rooms x slots
+    matrix and a run of free slots is found by comparing its cumulative sums
+    `length` slots apart; without NumPy every room is a bitmap (Python integer)
+    and the free runs are found with shifts and ANDs.
+
+    Args:
+        busy (list): Per room a list of (first slot, slot after the last one) ranges
+        slots (int): Number of slots of the window
+        length (int): Number of consecutive free slots needed, at least 1
+
+    Returns:
+        list: Per room the first possible start slot, or None if the room has no
+        free run of the requested length
+    """
+    if not busy:
+        return []
+    # An empty run would slice the whole matrix away (cumulative[:, :-0])
+    length = max(int(length), 1)
+    if length > slots:
+        return [None] * len(busy)
+    if HAS_NUMPY:
+        return _earliest_free_numpy(busy, slots, length)
+    return _earliest_free_bitmap(busy, slots, length)
+
+
+def _earliest_free_numpy(busy, slots, length):
+    """Vectorized search over a rooms x slots occupancy matrix"""
+    occupied = np.zeros((len(busy), slots), dtype=np.int32)
+    for room, ranges in enumerate(busy):
+        for first, last in ranges:
+            occupied[room, first:last] = 1
+    # cumulative[:, i] = occupied slots before slot i, a window is free if no slot is occupied
+    cumulative = np.zeros((len(busy), slots + 1), dtype=np.int32)
+    np.cumsum(occupied, axis=1, out=cumulative[:, 1:])
+    free = (cumulative[:, length:] - cumulative[:, :-length]) == 0
+    has_free = free.any(axis=1)
+    first_free = free.argmax(axis=1)
+    return [int(first) if found else None for first, found in zip(first_free, has_free)]
+
+
+def _earliest_free_bitmap(busy, slots, length):
+    """Search with one integer bitmap per room (bit i set = slot i free)"""
+    full = (1 << slots) - 1
+    result = []
+    for ranges in busy:
+        free = full
+        for first, last in ranges:
+            free &= ~(((1 << (last - first)) - 1) << first)
+        # Bit i stays set if slots i .. i + length - 1 are free, runs are doubled per step
+        runs, covered = free, 1
+        while covered < length:
+            shift = min(covered, length - covered)
+            runs &= runs >> shift
+            covered += shift
+        result.append((runs & -runs).bit_length() - 1 if runs else None)
+    return result
@@ -23,9 +23,10 @@ import argparse
 import traceback
 import threading
 import queue
+import struct
 from PIL import Image, ImageDraw, ImageFont
 import pytz
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
 from functools import wraps
 from contextlib import contextmanager
 
@@ -55,6 +56,121 @@ except ImportError as e:
     logger.error(f"Required library not found: {e}")
     sys.exit(1)
 
+# ===== COMPACT PAYLOAD FORMAT =====
+# Binary room data layout published by Odoo (see room_payload.py in the Odoo addon).
+# All integers are big-endian, datetimes are UTC epoch seconds:
+#   header: magic (B), version (B), flags (B), seq (Q), timestamp (I), capacity (H), event count (B),
+#           page count (B)
+#   strings: room, raspberry
+#   per event: id (I), start (I), stop (I), flags (B), strings: name, organizer
+# Strings are UTF-8 with a one byte length prefix. Flags: bit 0 = occupied / current
+COMPACT_MAGIC = 0xA7
+COMPACT_VERSION = 4
+# Payload formats announced to Odoo on connect: compact binary data and delta updates
+COMPACT_CAPABILITIES = f"compact/{COMPACT_VERSION},delta/1"
+COMPACT_HEADER = struct.Struct('>BBBQIHBB')
+EVENTS_PER_SCREEN = 4  # Events shown at once on the events screen (2x2 grid)
+COMPACT_EVENT = struct.Struct('>IIIB')
+
+def decode_room_data(raw):
+    """
+    Decode a room data payload, either JSON or the compact binary format.
+
+    Args:
+        raw (bytes): Payload as received from the broker
+
+    Returns:
+        dict: Room data in the same structure as the JSON payload
+    """
+    if not raw or raw[0] != COMPACT_MAGIC:
+        return json.loads(raw.decode('utf-8'))
+
+    magic, version, flags, seq, timestamp, capacity, count, pages = COMPACT_HEADER.unpack_from(raw, 0)
+    if version != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact payload version {version}")
+    offset = COMPACT_HEADER.size
+
+    def read_string():
+        nonlocal offset
+        length = raw[offset]
+        value = raw[offset + 1:offset + 1 + length].decode('utf-8')
+        offset += 1 + length
+        return value
+
+    def to_string(epoch):
+        # Same format as the JSON payload (naive UTC)
+        return datetime.fromtimestamp(epoch, dt_timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    data = {
+        'room': read_string(),
+        'raspberry': read_string(),
+        'timestamp': to_string(timestamp),
+        'capacity': capacity,
+        'is_occupied': bool(flags & 1),
+        'seq': seq,
+        'pages': pages,
+    }
+    events = []
+    for _ in range(count):
+        event_id, start, stop, event_flags = COMPACT_EVENT.unpack_from(raw, offset)
+        offset += COMPACT_EVENT.size
+        event = {
+            'id': event_id,
+            'name': read_string(),
+            'organizer': read_string(),
+            'start': to_string(start),
+            'stop': to_string(stop),
+            'duration': (stop - start) / 3600.0,
+            'is_current': bool(event_flags & 1),
+        }
+        if event['is_current']:
+            data['current_event'] = event
+        events.append(event)
+    if events:
+        data['events'] = events
+    return data
+
+def merge_events(events, more_events):
+    """
+    Merge two event lists (e.g. additional pages of room data) by event id.
+
+    Returns:
+        list: Events of both lists sorted by start time
+    """
+    merged = {event.get('id'): event for event in events}
+    merged.update((event.get('id'), event) for event in more_events)
+    return sorted(merged.values(), key=lambda event: event.get('start', ''))
+
+def apply_room_delta(data, delta):
+    """
+    Apply a delta update from the /delta topic to room data.
+
+    Args:
+        data (dict): Current room data (not modified)
+        delta (dict): Delta with 'set', 'unset', 'added', 'changed', 'removed' and 'seq'
+
+    Returns:
+        dict: New room data
+    """
+    data = dict(data)
+    data.update(delta.get('set', {}))
+    for key in delta.get('unset', []):
+        data.pop(key, None)
+
+    # Events are identified by their Odoo id
+    events = {event['id']: event for event in data.get('events', [])}
+    for event_id in delta.get('removed', []):
+        events.pop(event_id, None)
+    for event in delta.get('added', []) + delta.get('changed', []):
+        events[event['id']] = event
+    if events:
+        data['events'] = sorted(events.values(), key=lambda event: event.get('start', ''))
+    else:
+        data.pop('events', None)
+
+    data['seq'] = delta['seq']
+    return data
+
 def error_handler(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -92,7 +208,7 @@ class MQTTDisplay:
     """
     
     def __init__(self, broker, port, rasp_name, topic_prefix, username=None, 
-                 password=None, use_tls=True, timezone=None, keepalive=30):
+                 password=None, use_tls=True, timezone=None, keepalive=30, data_timeout=900):
         """
         Initialize the MQTT Display controller.
 
@@ -106,6 +222,7 @@ class MQTTDisplay:
         use_tls (bool): Whether to use TLS encryption
         timezone (str, optional): Timezone for display timestamps
         keepalive (int): MQTT keepalive interval in seconds
+        data_timeout (int): Seconds without room data before returning to the setup screen
         """
         # MQTT parameters
         self.broker = broker
@@ -128,6 +245,7 @@ class MQTTDisplay:
         self.current_screen_type = 'data'   # Track current screen ('data', 'events', 'setup')
         self.screen_rotation_timer = None   # Timer for automatic screen rotation
         self.rotation_active = False        # Flag to track if rotation is running
+        self.events_page = 0                # Page of the events screen currently shown
         
         # Display parameters
         self.epd = None                         # E-paper display object
@@ -135,10 +253,13 @@ class MQTTDisplay:
         self.setup_screen_displayed = False     # Track if setup screen has been shown
         self.last_display_update = 0            # Timestamp of last display update (for rate limiting)
         self.display_queue = queue.Queue()      # Queue for display update requests
+        self.pending_pages = {}                 # Event pages received before their room data
+        self.pending_ack = None                 # Room data received but not yet shown (latency tracing)
+        self.last_refresh_ms = 0                # Duration of the last e-paper refresh
 
         # Data timeout handling - returns to setup screen if no data received
         self.last_data_time = 0     # Track when we last received data
-        self.data_timeout = 60      # 60 seconds timeout
+        self.data_timeout = data_timeout    # Must exceed the Odoo reconciliation interval (300s)
         self.timeout_timer = None   # Timer for data timeout handling
         
         # Thread management
@@ -255,6 +376,10 @@ class MQTTDisplay:
             client.subscribe(topic, 1) # Subscribe with QoS 1
             logger.info(f"Subscribed to topic: {topic}")
             
+            # Announce the payload formats we can decode (retained, read by Odoo)
+            capabilities_topic = f"{self.topic_prefix}{self.rasp_name}/capabilities"
+            client.publish(capabilities_topic, COMPACT_CAPABILITIES, qos=1, retain=True)
+
             # Publish online status with retain flag
             status_topic = f"{self.topic_prefix}{self.rasp_name}/status"
             client.publish(status_topic, "online", qos=1, retain=True)
@@ -364,83 +489,68 @@ class MQTTDisplay:
         """
         try:
             topic = message.topic
-            payload = message.payload.decode('utf-8')
-            logger.info(f"Received message: {topic} - {payload}")
+            # Room data may be binary, only decode text payloads here
+            payload = message.payload.decode('utf-8', errors='replace')
+            logger.info(f"Received message: {topic} - {len(message.payload)} bytes")
 
             # Handle test messages (ignore them)
             if topic.endswith('/test'):
                 pass
 
+            # Handle heartbeats - Odoo is alive but the room data did not change
+            elif topic.endswith('/heartbeat'):
+                try:
+                    heartbeat = json.loads(payload)
+                except ValueError:
+                    heartbeat = None  # Older Odoo versions send the bare timestamp
+                heartbeat_seq = heartbeat.get('seq') if isinstance(heartbeat, dict) else None
+                with self.data_lock:
+                    have_seq = self.last_data.get('seq') if self.last_data else None
+                if heartbeat_seq is not None and heartbeat_seq != have_seq:
+                    # An update was lost (QoS 0) - the display would stay stale until the next change
+                    logger.warning(f"Heartbeat sequence {heartbeat_seq} differs from ours ({have_seq}) - requesting snapshot")
+                    self.request_snapshot(have_seq)
+                elif self.last_data:
+                    self.reset_timeout_timer()
+
             # Handle room data messages
             elif topic.endswith('/data'):
+                if not message.payload:
+                    # Empty retained message - the room was removed in Odoo
+                    return
                 try:
-                    data = json.loads(payload)
-                    data['timestamp'] = self.get_current_time().isoformat()
-                    
-                    # RESET TIMEOUT TIMER WHEN DATA IS RECEIVED
-                    # This prevents timeout while we're actively receiving data
-                    self.reset_timeout_timer()
-                    
-                    # Use thread-safe data access
-                    with self.data_lock:
-                        # Check for significant changes that warrant immediate update
-                        immediate_update_needed = False
-                        
-                        if not self.last_data:
-                            # First data received - start rotation system
-                            immediate_update_needed = True
-                            logger.info("First data received - starting display system")
-                            
-                            # Stop any existing rotation and start fresh
-                            if self.rotation_active:
-                                self.stop_screen_rotation()
-                            
-                            # Update stored data first
-                            self.last_data = data.copy()  # Use copy() for safety
-                            
-                            # Force immediate display of data screen
-                            self.current_screen_type = 'data'
-                            self.force_display_update('data', data.copy())
-                            
-                            # Start rotation after a short delay
-                            def delayed_rotation_start():
-                                time.sleep(3)  # Give time for first display
-                                if self.running:
-                                    self.start_screen_rotation()
-                            
-                            rotation_thread = threading.Thread(target=delayed_rotation_start)
-                            rotation_thread.daemon = True
-                            rotation_thread.start()
-                            
-                            return  # Exit early to avoid duplicate processing
-                        else:
-                            # Check for room occupancy changes
-                            old_occupied = self.last_data.get('is_occupied', False)
-                            new_occupied = data.get('is_occupied', False)
-                            if old_occupied != new_occupied:
-                                immediate_update_needed = True
-                                logger.info(f"Room occupancy changed: {old_occupied} -> {new_occupied}")
-                            
-                            # Check for current event changes
-                            old_current = self.last_data.get('current_event')
-                            new_current = data.get('current_event')
-                            if old_current != new_current:
-                                immediate_update_needed = True
-                                logger.info("Current event changed - immediate update")
-                        
-                        # Update stored data
-                        self.last_data = data.copy()  # Use copy() for safety
-                        
-                        if immediate_update_needed:
-                            # Force immediate update of current screen with new data
-                            self.force_display_update(self.current_screen_type, data.copy())
-                        else:
-                            # Just update the current screen content (will be picked up by next rotation)
-                            logger.info("Data updated - will be shown on next screen refresh")
-                            
-                except json.JSONDecodeError:
-                    logger.error(f"Invalid JSON payload: {payload}")
+                    self.handle_room_data(decode_room_data(message.payload))
+
+                except (ValueError, struct.error, IndexError):
+                    logger.error(f"Invalid room data payload: {message.payload[:64]!r}")
+
+            # Handle delta updates - only the changes since the last room data
+            elif topic.endswith('/delta'):
+                try:
+                    delta = json.loads(payload)
+                except ValueError:
+                    logger.error(f"Invalid delta payload: {payload}")
+                    return
+                with self.data_lock:
+                    base_seq = self.last_data.get('seq') if self.last_data else None
+                if base_seq is None or delta.get('base') != base_seq:
+                    # Missed an update (or no data yet) - ask Odoo for the full room data
+                    logger.warning(f"Delta sequence gap (have {base_seq}, delta base {delta.get('base')}) - requesting snapshot")
+                    self.request_snapshot(base_seq)
+                    return
+                with self.data_lock:
+                    data = apply_room_delta(self.last_data, delta)
+                self.handle_room_data(data)
                     
+            # Handle additional pages of events belonging to the room data
+            elif '/events/' in topic:
+                if not message.payload:
+                    return
+                try:
+                    self.handle_event_page(json.loads(payload))
+                except (ValueError, KeyError):
+                    logger.error(f"Invalid event page payload: {payload}")
+
             elif topic.endswith('/clear'):
                 if payload.lower() == 'true':
                     logger.info("Clear command received")
@@ -456,6 +566,122 @@ class MQTTDisplay:
             logger.error(f"Message processing error: {e}")
             logger.error(traceback.format_exc())
                         
+    def request_snapshot(self, have_seq):
+        """
+        Ask Odoo for the full room data after a missed update.
+
+        Args:
+            have_seq (int): Sequence number of the room data we have (None if none)
+        """
+        snapshot_topic = f"{self.topic_prefix}{self.rasp_name}/snapshot"
+        self.client.publish(snapshot_topic, str(have_seq or 0), qos=1)
+
+    def handle_room_data(self, data):
+        """
+        Store new room data and update the display if something important changed.
+
+        Args:
+            data (dict): Complete room data (decoded snapshot or snapshot with applied delta)
+        """
+        data['timestamp'] = self.get_current_time().isoformat()
+
+        # Acknowledged to Odoo once the data is on the screen, see send_display_ack()
+        with self.data_lock:
+            self.pending_ack = {'seq': data.get('seq'), 'sent': data.get('sent'), 'received': time.time()}
+
+        # Merge event pages of this snapshot that arrived before the room data
+        with self.data_lock:
+            for page in self.pending_pages.values():
+                if page.get('seq') == data.get('seq'):
+                    data['events'] = merge_events(data.get('events', []), page['events'])
+            self.pending_pages = {}
+
+        # RESET TIMEOUT TIMER WHEN DATA IS RECEIVED
+        # This prevents timeout while we're actively receiving data
+        self.reset_timeout_timer()
+
+        # Use thread-safe data access
+        with self.data_lock:
+            # Check for significant changes that warrant immediate update
+            immediate_update_needed = False
+
+            if not self.last_data:
+                # First data received - start rotation system
+                immediate_update_needed = True
+                logger.info("First data received - starting display system")
+
+                # Stop any existing rotation and start fresh
+                if self.rotation_active:
+                    self.stop_screen_rotation()
+
+                # Update stored data first
+                self.last_data = data.copy()  # Use copy() for safety
+
+                # Force immediate display of data screen
+                self.current_screen_type = 'data'
+                self.force_display_update('data', data.copy())
+
+                # Start rotation after a short delay
+                def delayed_rotation_start():
+                    time.sleep(3)  # Give time for first display
+                    if self.running:
+                        self.start_screen_rotation()
+
+                rotation_thread = threading.Thread(target=delayed_rotation_start)
+                rotation_thread.daemon = True
+                rotation_thread.start()
+
+                return  # Exit early to avoid duplicate processing
+            else:
+                # Check for room occupancy changes
+                old_occupied = self.last_data.get('is_occupied', False)
+                new_occupied = data.get('is_occupied', False)
+                if old_occupied != new_occupied:
+                    immediate_update_needed = True
+                    logger.info(f"Room occupancy changed: {old_occupied} -> {new_occupied}")
+
+                # Check for current event changes
+                old_current = self.last_data.get('current_event')
+                new_current = data.get('current_event')
+                if old_current != new_current:
+                    immediate_update_needed = True
+                    logger.info("Current event changed - immediate update")
+
+            # Update stored data
+            self.last_data = data.copy()  # Use copy() for safety
+
+            if immediate_update_needed:
+                # Force immediate update of current screen with new data
+                content = data.copy()
+                content['events_page'] = self.events_page
+                self.force_display_update(self.current_screen_type, content)
+            else:
+                # Just update the current screen content (will be picked up by next rotation)
+                logger.info("Data updated - will be shown on next screen refresh")
+
+    def handle_event_page(self, page):
+        """
+        Add an additional page of events to the room data.
+
+        Pages belong to the room data snapshot with the same sequence number. Pages
+        arriving before their snapshot are kept until the snapshot arrives, pages of
+        older snapshots (e.g. stale retained messages) are ignored.
+
+        Args:
+            page (dict): Page with 'seq', 'page', 'pages' and 'events'
+        """
+        with self.data_lock:
+            if self.last_data and self.last_data.get('seq') == page['seq']:
+                self.last_data['events'] = merge_events(self.last_data.get('events', []), page['events'])
+                logger.info(f"Added event page {page['page']}/{page['pages']}")
+            elif not self.last_data or page['seq'] > (self.last_data.get('seq') or 0):
+                self.pending_pages[page['page']] = page
+
+    def _event_page_count(self):
+        """Number of pages the events screen rotates through for the current data"""
+        upcoming = [event for event in self.last_data.get('events', []) if not event.get('is_current')]
+        return max(1, -(-len(upcoming) // EVENTS_PER_SCREEN))
+
     @error_handler
     def stagger_worker(self):
         """Simplified worker that only handles rate limiting for forced updates"""
@@ -475,19 +701,53 @@ class MQTTDisplay:
         while self.running:
             try:
                 message_type, content = self.display_queue.get(timeout=1.0)
+                started = time.time()
                 
                 if message_type == 'setup':
                     self.display_setup_screen()
                 elif message_type == 'data':
                     self.display_room_data(content)
+                    self.send_display_ack(started)
                 elif message_type == 'events':
                     self.display_events_screen(content)
+                    self.send_display_ack(started)
                     
                 self.display_queue.task_done()
                 
             except queue.Empty:
                 continue
     
+    def send_display_ack(self, started):
+        """
+        Tell Odoo that the latest room data is shown, for its booking-to-display latency.
+
+        Screens always render the latest room data, so the first screen drawn after
+        new data arrived acknowledges it, whether it was forced or came with the rotation.
+
+        Args:
+            started (float): Time the screen update was taken from the display queue
+        """
+        with self.data_lock:
+            ack, self.pending_ack = self.pending_ack, None
+        if not ack or ack['seq'] is None or not self.connected:
+            return
+        total_ms = (time.time() - started) * 1000
+        ack.update({
+            'render_ms': round(max(total_ms - self.last_refresh_ms, 0), 1),
+            'display_ms': round(self.last_refresh_ms, 1),
+            'shown': time.time(),
+        })
+        try:
+            self.client.publish(f"{self.topic_prefix}{self.rasp_name}/ack", json.dumps(ack), qos=0)
+        except Exception as e:
+            logger.warning(f"Failed to send display ack: {e}")
+
+    def refresh_epd(self, image):
+        """Show a rendered image on the e-paper and remember how long the refresh took"""
+        started = time.time()
+        self.epd.display(self.epd.getbuffer(image))
+        self.last_refresh_ms = (time.time() - started) * 1000
+
     @error_handler
     def periodic_refresh(self):
         """Periodic refresh to update timestamps and ensure display stays current"""
@@ -521,10 +781,14 @@ class MQTTDisplay:
             
             # Determine next screen based on available content
             if self.last_data.get('events') and len(self.last_data['events']) > 0:
-                # Switch between data and events screens
+                # Switch between data and events screens, showing every page of events
                 if self.current_screen_type == 'data':
                     self.current_screen_type = 'events'
+                    self.events_page = 0
                     logger.info("Rotating to events screen")
+                elif self.events_page + 1 < self._event_page_count():
+                    self.events_page += 1
+                    logger.info(f"Rotating to events page {self.events_page + 1}")
                 else:
                     self.current_screen_type = 'data'
                     logger.info("Rotating to data screen")
@@ -534,7 +798,9 @@ class MQTTDisplay:
                 logger.info("No events available, showing data screen")
             
             # Update the display with current data
-            self.display_queue.put((self.current_screen_type, self.last_data.copy()))
+            content = self.last_data.copy()
+            content['events_page'] = self.events_page
+            self.display_queue.put((self.current_screen_type, content))
             
             # Schedule next rotation
             if self.running:
@@ -814,11 +1080,11 @@ class MQTTDisplay:
                 #No events at all
                 draw.text((5, content_top + 10), "No upcoming meetings", font=fonts['text'], fill=0)
             # Update the e-paper display with the rendered image
-            self.epd.display(self.epd.getbuffer(image))
+            self.refresh_epd(image)
             logger.info("Room data displayed on e-paper")
 
     def display_events_screen(self, data):
-        """Display detailed upcoming events in a 2x2 grid layout"""
+        """Display detailed upcoming events in a 2x2 grid layout, one page at a time"""
         if not self.epd and not self.setup_display():
             return
             
@@ -903,11 +1169,17 @@ class MQTTDisplay:
                 # No upcoming events to display
                 draw.text((5, content_top + 10), "No upcoming events", font=fonts['text'], fill=0)
             else:
-                # Sort events by start time and limit to 4 events
+                # Sort events by start time and show one page of 4 events
                 valid_events.sort(key=lambda x: x.get('start', ''))
                 # Show maximum 4 events in 2x2 layout
-                max_events = min(4, len(valid_events))
-                events_to_show = valid_events[:max_events]
+                page_count = -(-len(valid_events) // EVENTS_PER_SCREEN)
+                page = min(data.get('events_page', 0), page_count - 1)
+                events_to_show = valid_events[page * EVENTS_PER_SCREEN:(page + 1) * EVENTS_PER_SCREEN]
+                if page_count > 1:
+                    # Show the page number in the bottom right corner
+                    page_text = f"{page + 1}/{page_count}"
+                    page_width = draw.textbbox((0, 0), page_text, font=fonts['small'])[2]
+                    draw.text((width - page_width - 2, height - 13), page_text, font=fonts['small'], fill=0)
                 
                 # Calculate layout dimensions for 2x2 grid
                 available_height = height - content_top - 10  # Leave some bottom margin
@@ -977,7 +1249,7 @@ class MQTTDisplay:
                     draw.line([(5, separator_y), (width - 5, separator_y)], fill=0, width=1)
 
             # Update the e-paper display with the events screen
-            self.epd.display(self.epd.getbuffer(image))
+            self.refresh_epd(image)
             logger.info("Events screen displayed on e-paper")
 
     def _format_event_time(self, iso_time_str):
@@ -1146,6 +1418,8 @@ def parse_arguments():
                         help='Optional timezone for displaying dates (default: system time)')
     parser.add_argument('--keepalive', type=int, default=30,
                         help='MQTT keepalive interval in seconds (default: 30)')
+    parser.add_argument('--data-timeout', type=int, default=900,
+                        help='Seconds without room data before showing the setup screen (default: 900)')
                         
     return parser.parse_args()
 
@@ -1162,7 +1436,8 @@ def main():
         password=args.password,
         use_tls=not args.no_tls,
         timezone=args.timezone,
-        keepalive=args.keepalive
+        keepalive=args.keepalive,
+        data_timeout=args.data_timeout
     )
     # Start the controller and run until interrupted
     if controller.start():
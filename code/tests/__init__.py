@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests of the modules that depend neither on Odoo nor on the display hardware
+
+Run from the code directory with: python -m unittest discover -s tests -t .
+
+The helper modules of the addon are imported directly from its models directory,
+because importing the addon package requires a running Odoo.
+"""
+import importlib.util
+import logging
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(CODE_DIR, 'odoo', 'custom_addons', 'Abilium_Room_Booker', 'models')
+DISPLAY_SCRIPT = os.path.join(CODE_DIR, 'raspberry', 'event_display_script.py')
+
+if MODELS_DIR not in sys.path:
+    sys.path.append(MODELS_DIR)
+
+_display_script = None
+
+
+def load_display_script():
+    """
+    Import the Raspberry Pi display script without a display attached
+
+    The e-paper driver only exists on the Pi and is replaced by an empty module; the
+    tests using the script are skipped if Pillow or pytz are not installed.
+
+    Returns:
+        module: The imported event_display_script
+    """
+    global _display_script
+    if _display_script is not None:
+        return _display_script
+    for name in ('PIL', 'pytz', 'paho'):
+        if importlib.util.find_spec(name) is None:
+            raise unittest.SkipTest(f"{name} is not installed")
+    if importlib.util.find_spec('waveshare_epd') is None:
+        driver = types.ModuleType('waveshare_epd')
+        driver.epd2in13_V4 = types.ModuleType('waveshare_epd.epd2in13_V4')
+        sys.modules.setdefault('waveshare_epd', driver)
+        sys.modules.setdefault('waveshare_epd.epd2in13_V4', driver.epd2in13_V4)
+
+    # The script logs to mqtt_display.log in the working directory; the file handler is
+    # replaced and a configured root logger turns its basicConfig() into a no-op
+    root = logging.getLogger()
+    guard = logging.NullHandler()
+    root.addHandler(guard)
+    try:
+        with mock.patch('logging.FileHandler', lambda *args, **kwargs: logging.NullHandler()):
+            spec = importlib.util.spec_from_file_location('event_display_script', DISPLAY_SCRIPT)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+    finally:
+        root.removeHandler(guard)
+    _display_script = module
+    return module
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+
+from publish_scheduler import PublishScheduler
+
+# Seconds to wait for the scheduler thread before failing a test
+WAIT = 5.0
+
+
+class Recorder:
+    """Callback recording the batches it is called with"""
+
+    def __init__(self, expected_calls=1):
+        self.batches = []
+        self.done = threading.Event()
+        self.expected_calls = expected_calls
+        self._lock = threading.Lock()
+
+    def __call__(self, keys):
+        with self._lock:
+            self.batches.append(sorted(keys))
+            if len(self.batches) >= self.expected_calls:
+                self.done.set()
+
+
+class TestPublishScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = PublishScheduler(max_workers=2, batch_size=50, name='test_scheduler')
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_keys_of_one_callback_run_in_one_batch(self):
+        recorder = Recorder()
+        for key in range(10):
+            self.scheduler.schedule(key, recorder, None, delay=3600)
+        self.scheduler.trigger(range(10))
+
+        self.assertTrue(recorder.done.wait(WAIT))
+        self.assertEqual(recorder.batches, [list(range(10))])
+
+    def test_batches_are_split_by_batch_size(self):
+        self.scheduler.batch_size = 4
+        recorder = Recorder(expected_calls=3)
+        for key in range(10):
+            self.scheduler.schedule(key, recorder, None, delay=3600)
+        self.scheduler.trigger(range(10))
+
+        self.assertTrue(recorder.done.wait(WAIT))
+        self.assertEqual(sorted(len(batch) for batch in recorder.batches), [2, 4, 4])
+        self.assertEqual(sorted(key for batch in recorder.batches for key in batch), list(range(10)))
+
+    def test_distinct_callbacks_run_in_separate_batches(self):
+        first, second = Recorder(), Recorder()
+        for key in range(3):
+            self.scheduler.schedule(key, first, None, delay=3600)
+        for key in range(3, 6):
+            self.scheduler.schedule(key, second, None, delay=3600)
+        self.scheduler.trigger(range(6))
+
+        self.assertTrue(first.done.wait(WAIT))
+        self.assertTrue(second.done.wait(WAIT))
+        self.assertEqual(first.batches, [[0, 1, 2]])
+        self.assertEqual(second.batches, [[3, 4, 5]])
+
+    def test_key_triggered_while_running_is_run_again(self):
+        started, release = threading.Event(), threading.Event()
+        recorder = Recorder(expected_calls=2)
+
+        def callback(keys):
+            recorder(keys)
+            started.set()
+            release.wait(WAIT)
+
+        self.scheduler.schedule(1, callback, 3600, delay=3600)
+        self.scheduler.trigger([1])
+        self.assertTrue(started.wait(WAIT))
+        # Changed while the first run is still in flight
+        self.scheduler.trigger([1])
+        self.assertEqual(self.scheduler.worker_stats()['inflight'], 1)
+        release.set()
+
+        self.assertTrue(recorder.done.wait(WAIT))
+        self.assertEqual(recorder.batches, [[1], [1]])
+
+    def test_cancelled_key_is_not_run(self):
+        recorder = Recorder()
+        self.scheduler.schedule(1, recorder, None, delay=3600)
+        self.scheduler.schedule(2, recorder, None, delay=3600)
+        self.assertTrue(self.scheduler.cancel(1))
+        self.assertFalse(self.scheduler.is_scheduled(1))
+        self.scheduler.trigger([1, 2])
+
+        self.assertTrue(recorder.done.wait(WAIT))
+        self.assertEqual(recorder.batches, [[2]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from room_intervals import RoomIntervalIndex, RoomIntervals
+
+DAY = datetime(2024, 5, 6)
+
+
+def at(hour, minute=0):
+    return DAY + timedelta(hours=hour, minutes=minute)
+
+
+class TestRoomIntervals(unittest.TestCase):
+
+    def setUp(self):
+        self.intervals = RoomIntervals([
+            (at(9), at(10), 1),
+            (at(7), at(17), 2),     # Long booking spanning the others
+            (at(10), at(11), 3),
+            (at(13), at(14), 4),
+        ])
+
+    def test_overlapping(self):
+        self.assertEqual(sorted(self.intervals.overlapping(at(9, 30), at(10, 30))), [1, 2, 3])
+        self.assertEqual(sorted(self.intervals.overlapping(at(13, 59), at(15))), [2, 4])
+        self.assertEqual(self.intervals.overlapping(at(17), at(18)), [])
+        self.assertEqual(self.intervals.overlapping(at(6), at(7)), [])
+
+    def test_touching_bookings_do_not_overlap(self):
+        self.assertEqual(sorted(self.intervals.overlapping(at(10), at(10, 30))), [2, 3])
+        self.assertEqual(sorted(self.intervals.overlapping(at(8), at(9))), [2])
+
+    def test_exclude_id(self):
+        self.assertEqual(sorted(self.intervals.overlapping(at(9), at(10), exclude_id=2)), [1])
+        self.assertFalse(self.intervals.is_busy(at(12), at(13), exclude_id=2))
+        self.assertTrue(self.intervals.is_busy(at(12), at(13)))
+
+    def test_matches_a_linear_scan(self):
+        rng = random.Random(7)
+        bookings = []
+        for event_id in range(300):
+            start = at(0) + timedelta(minutes=15 * rng.randrange(2000))
+            bookings.append((start, start + timedelta(minutes=15 * rng.randint(1, 40)), event_id))
+        intervals = RoomIntervals(bookings)
+        for _ in range(200):
+            start = at(0) + timedelta(minutes=5 * rng.randrange(6000))
+            stop = start + timedelta(minutes=5 * rng.randint(1, 100))
+            exclude_id = rng.choice([None, rng.randrange(300)])
+            expected = sorted(event_id for booking_start, booking_stop, event_id in bookings
+                              if booking_start < stop and booking_stop > start and event_id != exclude_id)
+            self.assertEqual(sorted(intervals.overlapping(start, stop, exclude_id)), expected)
+            self.assertEqual(intervals.is_busy(start, stop, exclude_id), bool(expected))
+
+
+class TestRoomIntervalIndex(unittest.TestCase):
+
+    def test_busy_rooms_and_covers(self):
+        index = RoomIntervalIndex(at(0), [
+            (10, at(9), at(10), 1),
+            (11, at(12), at(13), 2),
+        ])
+        self.assertTrue(index.covers(at(8)))
+        self.assertFalse(index.covers(at(0) - timedelta(minutes=1)))
+        self.assertEqual(index.busy_rooms(at(9, 30), at(12, 30)), [10, 11])
+        self.assertEqual(index.busy_rooms(at(9, 30), at(10), exclude_id=1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+import room_payload
+from room_payload import diff_payloads, encode_compact, payload_digest
+
+from . import load_display_script
+
+
+def make_event(event_id, start, stop, name='Meeting', organizer='Alice', is_current=False):
+    return {
+        'id': event_id,
+        'name': name,
+        'organizer': organizer,
+        'start': start,
+        'stop': stop,
+        'duration': 1.0,
+        'is_current': is_current,
+    }
+
+
+def make_room_data(events, **values):
+    data = {
+        'room': 'Sitzungszimmer 1',
+        'raspberry': 'pi-01',
+        'timestamp': '2024-05-06 08:00:00',
+        'capacity': 12,
+        'is_occupied': False,
+        'seq': time.time_ns(),
+        'pages': 1,
+        'events': events,
+    }
+    data.update(values)
+    return data
+
+
+class TestPayloadDigest(unittest.TestCase):
+
+    def test_volatile_keys_are_ignored(self):
+        events = [make_event(1, '2024-05-06 09:00:00', '2024-05-06 10:00:00')]
+        first = make_room_data(events, seq=1, timestamp='2024-05-06 08:00:00')
+        second = make_room_data(events, seq=2, timestamp='2024-05-06 08:00:30')
+        self.assertEqual(payload_digest(first), payload_digest(second))
+
+    def test_content_changes_the_digest(self):
+        events = [make_event(1, '2024-05-06 09:00:00', '2024-05-06 10:00:00')]
+        self.assertNotEqual(payload_digest(make_room_data(events)),
+                            payload_digest(make_room_data(events, capacity=8)))
+
+
+class TestCompactRoundTrip(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.script = load_display_script()
+
+    def test_header_layout(self):
+        data = make_room_data([], seq=2 ** 40 + 5, is_occupied=True, pages=3)
+        raw = encode_compact(data)
+        magic, version, flags, seq, _timestamp, capacity, count, pages = \
+            room_payload._COMPACT_HEADER.unpack_from(raw, 0)
+        self.assertEqual((magic, version), (room_payload.COMPACT_MAGIC, 4))
+        self.assertEqual((flags, seq, capacity, count, pages), (1, 2 ** 40 + 5, 12, 0, 3))
+        # Both sides agree on the layout
+        self.assertEqual(self.script.COMPACT_VERSION, room_payload.COMPACT_VERSION)
+        self.assertEqual(self.script.COMPACT_HEADER.format, room_payload._COMPACT_HEADER.format)
+
+    def test_round_trip(self):
+        events = [
+            make_event(7, '2024-05-06 08:30:00', '2024-05-06 09:30:00', is_current=True),
+            make_event(2 ** 31, '2024-05-06 13:00:00', '2024-05-06 14:30:00', name='Zürich ✓', organizer=''),
+        ]
+        data = make_room_data(events, is_occupied=True)
+        decoded = self.script.decode_room_data(encode_compact(data))
+
+        for key in ('room', 'raspberry', 'timestamp', 'capacity', 'is_occupied', 'seq', 'pages'):
+            self.assertEqual(decoded[key], data[key], key)
+        self.assertEqual(len(decoded['events']), 2)
+        for event, expected in zip(decoded['events'], events):
+            for key in ('id', 'name', 'organizer', 'start', 'stop', 'is_current'):
+                self.assertEqual(event[key], expected[key], key)
+        self.assertEqual(decoded['events'][1]['duration'], 1.5)
+        self.assertEqual(decoded['current_event']['id'], 7)
+
+    def test_time_based_sequence_fits(self):
+        seq = time.time_ns()
+        self.assertGreater(seq, 2 ** 32)
+        decoded = self.script.decode_room_data(encode_compact(make_room_data([], seq=seq)))
+        self.assertEqual(decoded['seq'], seq)
+        self.assertNotIn('events', decoded)
+
+    def test_long_string_is_truncated_on_a_character_boundary(self):
+        decoded = self.script.decode_room_data(encode_compact(make_room_data([], room='ä' * 200)))
+        self.assertEqual(decoded['room'], 'ä' * 127)
+
+    def test_json_payload_is_still_decoded(self):
+        raw = b'{"room": "Sitzungszimmer 1", "seq": 3}'
+        self.assertEqual(self.script.decode_room_data(raw), {'room': 'Sitzungszimmer 1', 'seq': 3})
+
+
+class TestDelta(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.script = load_display_script()
+
+    def apply(self, old, new):
+        delta = dict(diff_payloads(old, new), seq=new['seq'])
+        return self.script.apply_room_delta(old, delta)
+
+    def test_diff_lists_only_changes(self):
+        kept = make_event(1, '2024-05-06 09:00:00', '2024-05-06 10:00:00')
+        moved = make_event(2, '2024-05-06 11:00:00', '2024-05-06 12:00:00')
+        removed = make_event(3, '2024-05-06 15:00:00', '2024-05-06 16:00:00')
+        added = make_event(4, '2024-05-06 17:00:00', '2024-05-06 18:00:00')
+        old = make_room_data([kept, moved, removed], seq=1)
+        new = make_room_data([kept, dict(moved, stop='2024-05-06 12:30:00'), added], seq=2, capacity=10)
+
+        delta = diff_payloads(old, new)
+        self.assertEqual(delta['set'], {'capacity': 10})
+        self.assertEqual(delta['unset'], [])
+        self.assertEqual([event['id'] for event in delta['added']], [4])
+        self.assertEqual([event['id'] for event in delta['changed']], [2])
+        self.assertEqual(delta['removed'], [3])
+
+    def test_applied_delta_reproduces_the_new_payload(self):
+        old = make_room_data([
+            make_event(1, '2024-05-06 09:00:00', '2024-05-06 10:00:00'),
+            make_event(2, '2024-05-06 11:00:00', '2024-05-06 12:00:00'),
+        ], seq=1, current_event={'id': 1})
+        new = make_room_data([
+            make_event(3, '2024-05-06 08:00:00', '2024-05-06 08:30:00', is_current=True),
+            make_event(2, '2024-05-06 11:00:00', '2024-05-06 12:15:00', name='Moved'),
+        ], seq=2, is_occupied=True, timestamp='2024-05-06 08:05:00')
+        new['events'].sort(key=lambda event: event['start'])
+
+        self.assertEqual(self.apply(old, new), new)
+
+    def test_removing_all_events_drops_the_list(self):
+        old = make_room_data([make_event(1, '2024-05-06 09:00:00', '2024-05-06 10:00:00')], seq=1)
+        new = make_room_data([], seq=2)
+        del new['events']
+
+        self.assertEqual(self.apply(old, new), new)
+
+    def test_old_payload_is_not_modified(self):
+        old = make_room_data([make_event(1, '2024-05-06 09:00:00', '2024-05-06 10:00:00')], seq=1)
+        snapshot = dict(old, events=list(old['events']))
+        self.apply(old, make_room_data([], seq=2, capacity=4))
+        self.assertEqual(old, snapshot)
+
+
+if __name__ == '__main__':
+    unittest.main()
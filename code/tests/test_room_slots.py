@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import random
+import unittest
+from datetime import datetime
+
+import room_slots
+from room_slots import align_to_slot, earliest_free_slots, slot_range
+
+
+class TestSlotHelpers(unittest.TestCase):
+
+    def test_align_to_slot(self):
+        self.assertEqual(align_to_slot(datetime(2024, 5, 6, 9, 0)), datetime(2024, 5, 6, 9, 0))
+        self.assertEqual(align_to_slot(datetime(2024, 5, 6, 9, 0, 1)), datetime(2024, 5, 6, 9, 15))
+        self.assertEqual(align_to_slot(datetime(2024, 5, 6, 9, 50)), datetime(2024, 5, 6, 10, 0))
+
+    def test_slot_range_includes_partial_slots_and_clips(self):
+        start = datetime(2024, 5, 6, 8, 0)
+        self.assertEqual(slot_range(start, 8, datetime(2024, 5, 6, 8, 20), datetime(2024, 5, 6, 8, 40)), (1, 3))
+        self.assertEqual(slot_range(start, 8, datetime(2024, 5, 6, 7, 0), datetime(2024, 5, 6, 11, 0)), (0, 8))
+
+
+class TestEarliestFreeSlots(unittest.TestCase):
+
+    def search_both(self, busy, slots, length):
+        """Run the bitmap search and, if available, the NumPy search and compare them"""
+        bitmap = room_slots._earliest_free_bitmap(busy, slots, length)
+        if room_slots.HAS_NUMPY:
+            self.assertEqual(room_slots._earliest_free_numpy(busy, slots, length), bitmap,
+                             (busy, slots, length))
+        return bitmap
+
+    def test_first_free_run_per_room(self):
+        busy = [
+            [],                 # Free all day
+            [(0, 2)],           # Free from slot 2
+            [(0, 2), (3, 5)],   # Gap at slot 2 is too short for two slots
+            [(0, 8)],           # Fully booked
+        ]
+        self.assertEqual(self.search_both(busy, 8, 2), [0, 2, 5, None])
+
+    def test_run_at_the_end_of_the_window(self):
+        self.assertEqual(self.search_both([[(0, 5)]], 8, 3), [5])
+        self.assertEqual(self.search_both([[(0, 6)]], 8, 3), [None])
+
+    def test_paths_agree_on_random_occupancy(self):
+        rng = random.Random(4)
+        for _ in range(200):
+            slots = rng.randint(1, 96)
+            busy = []
+            for _room in range(rng.randint(1, 6)):
+                ranges = []
+                for _booking in range(rng.randint(0, 6)):
+                    first = rng.randrange(slots)
+                    ranges.append((first, min(first + rng.randint(1, 12), slots)))
+                busy.append(ranges)
+            self.search_both(busy, slots, rng.randint(1, slots))
+
+    def test_length_is_at_least_one_slot(self):
+        busy = [[(0, 1)], [(0, 4)]]
+        self.assertEqual(earliest_free_slots(busy, 4, 0), [1, None])
+        self.assertEqual(earliest_free_slots(busy, 4, 0), earliest_free_slots(busy, 4, 1))
+
+    def test_length_longer_than_window(self):
+        self.assertEqual(earliest_free_slots([[], []], 4, 5), [None, None])
+
+    def test_no_rooms(self):
+        self.assertEqual(earliest_free_slots([], 4, 1), [])
+
+    def test_bitmap_fallback_is_used_without_numpy(self):
+        busy = [[(1, 3)], []]
+        has_numpy = room_slots.HAS_NUMPY
+        room_slots.HAS_NUMPY = False
+        try:
+            self.assertEqual(earliest_free_slots(busy, 8, 2), [3, 0])
+        finally:
+            room_slots.HAS_NUMPY = has_numpy
+
+
+if __name__ == '__main__':
+    unittest.main()